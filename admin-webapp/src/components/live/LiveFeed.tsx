@@ -1,10 +1,11 @@
-import { useEffect, useCallback } from 'react'
+import { useEffect, useCallback, useState } from 'react'
 import { useLiveFeedStore, useUIStore, useCurrencyStore } from '@/store'
 import { useSSE } from '@/hooks/useSSE'
 import { useScrollPreservation } from '@/hooks/useScrollPreservation'
 import { api } from '@/services/api'
 import { format } from 'date-fns'
 import { ru } from 'date-fns/locale'
+import type { RecentLog } from '@/types'
 import styles from './LiveFeed.module.css'
 
 export function LiveFeed() {
@@ -33,6 +34,27 @@ export function LiveFeed() {
 
   const toRub = (usd: number) => (usd * usdRate).toFixed(2)
 
+  // /logs/recent отдаёт только превью текста — полный лог догружаем по клику
+  const [fullTexts, setFullTexts] = useState<
+    Record<number, { user_message: string; bot_response: string }>
+  >({})
+
+  const isTruncated = (log: RecentLog) =>
+    (log.user_message_len ?? 0) > log.user_message.length ||
+    (log.bot_response_len ?? 0) > log.bot_response.length
+
+  const loadFullLog = useCallback(async (logId: number) => {
+    try {
+      const fullLog = await api.getLog(logId)
+      setFullTexts((prev) => ({
+        ...prev,
+        [logId]: { user_message: fullLog.user_message, bot_response: fullLog.bot_response },
+      }))
+    } catch (error) {
+      console.error('[LiveFeed] Failed to load full log:', error)
+    }
+  }, [])
+
   // SSE connection
   const handleSSEMessage = useCallback(
     (event: MessageEvent) => {
@@ -127,18 +149,28 @@ export function LiveFeed() {
 
               <div className={styles.question}>
                 <span className={styles.label}>Q:</span>
-                <span className={styles.text}>{log.user_message}</span>
+                <span className={styles.text}>
+                  {fullTexts[log.id]?.user_message ?? log.user_message}
+                </span>
               </div>
 
               <div className={styles.answer}>
                 <span className={styles.label}>A:</span>
                 <span className={styles.text}>
-                  {log.bot_response.length > 200
-                    ? log.bot_response.substring(0, 200) + '...'
-                    : log.bot_response}
+                  {fullTexts[log.id]
+                    ? fullTexts[log.id].bot_response
+                    : log.bot_response.length > 200 || isTruncated(log)
+                      ? log.bot_response.substring(0, 200) + '...'
+                      : log.bot_response}
                 </span>
               </div>
 
+              {!fullTexts[log.id] && isTruncated(log) && (
+                <button className={styles.expand} onClick={() => loadFullLog(log.id)}>
+                  Показать полностью
+                </button>
+              )}
+
               {log.created_at && (
                 <div className={styles.timestamp}>
                   {format(new Date(log.created_at), 'd MMM, HH:mm:ss', { locale: ru })}
@@ -4,6 +4,7 @@ import type {
   UsersResponse,
   Topic,
   TopicLogsResponse,
+  ConsultationLog,
   RecentLog,
   Stats,
   EmbeddingStats,
@@ -78,6 +79,10 @@ export const api = {
     return fetchApi<RecentLog[]>(`/logs/recent${query ? `?${query}` : ''}`)
   },
 
+  async getLog(logId: number): Promise<ConsultationLog> {
+    return fetchApi<ConsultationLog>(`/logs/${logId}`)
+  },
+
   // Stats
   async getStats(period?: 'day' | 'week' | 'month' | 'all'): Promise<Stats> {
     const query = period ? `?period=${period}` : ''
@@ -103,8 +103,10 @@ export interface RecentLog {
   id: number
   user_id: number
   topic_id: number | null
-  user_message: string
-  bot_response: string
+  user_message: string              // Превью (первые 200 символов) для /logs/recent
+  bot_response: string              // Превью (первые 200 символов) для /logs/recent
+  user_message_len?: number         // Полная длина вопроса (нет в SSE new_log)
+  bot_response_len?: number         // Полная длина ответа (нет в SSE new_log)
   prompt_tokens: number
   completion_tokens: number
   total_tokens: number
@@ -0,0 +1,56 @@
+-- schema_15_users_stats.sql
+-- Агрегированная статистика консультаций по пользователям (rollup-таблица).
+-- Заменяет LEFT JOIN consultation_logs + GROUP BY в get_users_with_stats:
+-- админка читает готовые суммы вместо агрегации всего лога на каждый запрос.
+-- Применять после schema_09_consultation_logs.sql
+
+CREATE TABLE IF NOT EXISTS users_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    total_consultations BIGINT NOT NULL DEFAULT 0,
+    total_tokens BIGINT NOT NULL DEFAULT 0,
+    total_cost_usd NUMERIC(14, 6) NOT NULL DEFAULT 0,
+    last_consultation_at TIMESTAMP
+);
+
+-- Сортировка списка пользователей по последней консультации
+CREATE INDEX IF NOT EXISTS idx_users_stats_last_consultation
+    ON users_stats(last_consultation_at DESC NULLS LAST);
+
+-- Инкрементальное обновление при каждой новой записи в consultation_logs
+CREATE OR REPLACE FUNCTION users_stats_on_log_insert() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO users_stats (user_id, total_consultations, total_tokens, total_cost_usd, last_consultation_at)
+    VALUES (NEW.user_id, 1, COALESCE(NEW.total_tokens, 0), COALESCE(NEW.cost_usd, 0), NEW.created_at)
+    ON CONFLICT (user_id) DO UPDATE
+    SET total_consultations = users_stats.total_consultations + 1,
+        total_tokens = users_stats.total_tokens + EXCLUDED.total_tokens,
+        total_cost_usd = users_stats.total_cost_usd + EXCLUDED.total_cost_usd,
+        last_consultation_at = GREATEST(users_stats.last_consultation_at, EXCLUDED.last_consultation_at);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_stats_on_log_insert ON consultation_logs;
+CREATE TRIGGER trg_users_stats_on_log_insert
+    AFTER INSERT ON consultation_logs
+    FOR EACH ROW EXECUTE FUNCTION users_stats_on_log_insert();
+
+-- Первичное заполнение из существующих логов
+INSERT INTO users_stats (user_id, total_consultations, total_tokens, total_cost_usd, last_consultation_at)
+SELECT
+    user_id,
+    COUNT(*),
+    COALESCE(SUM(total_tokens), 0),
+    COALESCE(SUM(cost_usd), 0),
+    MAX(created_at)
+FROM consultation_logs
+GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE
+SET total_consultations = EXCLUDED.total_consultations,
+    total_tokens = EXCLUDED.total_tokens,
+    total_cost_usd = EXCLUDED.total_cost_usd,
+    last_consultation_at = EXCLUDED.last_consultation_at;
+
+-- Комментарии
+COMMENT ON TABLE users_stats IS 'Агрегаты consultation_logs по пользователю, поддерживаются триггером trg_users_stats_on_log_insert';
+COMMENT ON COLUMN users_stats.last_consultation_at IS 'Время последней консультации пользователя';
@@ -0,0 +1,67 @@
+-- schema_16_consultation_totals.sql
+-- Дневные итоги консультаций для дашборда админки (get_stats_summary).
+-- Обзор и "сегодня" суммируют несколько строк этой таблицы вместо
+-- полного сканирования consultation_logs.
+-- Применять после schema_09_consultation_logs.sql
+
+CREATE TABLE IF NOT EXISTS consultation_totals (
+    bucket DATE PRIMARY KEY,                  -- день (created_at::date)
+    consultations BIGINT NOT NULL DEFAULT 0,
+    tokens BIGINT NOT NULL DEFAULT 0,
+    cost_usd NUMERIC(14, 6) NOT NULL DEFAULT 0,
+    latency_ms_sum BIGINT NOT NULL DEFAULT 0,
+    latency_ms_count BIGINT NOT NULL DEFAULT 0  -- для AVG(latency_ms) без учёта NULL
+);
+
+-- Инкрементальное обновление при каждой новой записи в consultation_logs
+CREATE OR REPLACE FUNCTION consultation_totals_on_log_insert() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO consultation_totals (bucket, consultations, tokens, cost_usd, latency_ms_sum, latency_ms_count)
+    VALUES (
+        NEW.created_at::date,
+        1,
+        COALESCE(NEW.total_tokens, 0),
+        COALESCE(NEW.cost_usd, 0),
+        COALESCE(NEW.latency_ms, 0),
+        CASE WHEN NEW.latency_ms IS NULL THEN 0 ELSE 1 END
+    )
+    ON CONFLICT (bucket) DO UPDATE
+    SET consultations = consultation_totals.consultations + 1,
+        tokens = consultation_totals.tokens + EXCLUDED.tokens,
+        cost_usd = consultation_totals.cost_usd + EXCLUDED.cost_usd,
+        latency_ms_sum = consultation_totals.latency_ms_sum + EXCLUDED.latency_ms_sum,
+        latency_ms_count = consultation_totals.latency_ms_count + EXCLUDED.latency_ms_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_consultation_totals_on_log_insert ON consultation_logs;
+CREATE TRIGGER trg_consultation_totals_on_log_insert
+    AFTER INSERT ON consultation_logs
+    FOR EACH ROW EXECUTE FUNCTION consultation_totals_on_log_insert();
+
+-- Первичное заполнение из существующих логов
+INSERT INTO consultation_totals (bucket, consultations, tokens, cost_usd, latency_ms_sum, latency_ms_count)
+SELECT
+    created_at::date,
+    COUNT(*),
+    COALESCE(SUM(total_tokens), 0),
+    COALESCE(SUM(cost_usd), 0),
+    COALESCE(SUM(latency_ms), 0),
+    COUNT(latency_ms)
+FROM consultation_logs
+GROUP BY created_at::date
+ON CONFLICT (bucket) DO UPDATE
+SET consultations = EXCLUDED.consultations,
+    tokens = EXCLUDED.tokens,
+    cost_usd = EXCLUDED.cost_usd,
+    latency_ms_sum = EXCLUDED.latency_ms_sum,
+    latency_ms_count = EXCLUDED.latency_ms_count;
+
+-- BRIN индекс для выборок по диапазону времени (топ культур/категорий за период):
+-- логи пишутся в порядке created_at, поэтому индекс крошечный и эффективный
+CREATE INDEX IF NOT EXISTS idx_consultation_logs_created_brin
+    ON consultation_logs USING BRIN (created_at);
+
+-- Комментарии
+COMMENT ON TABLE consultation_totals IS 'Дневные итоги consultation_logs, поддерживаются триггером trg_consultation_totals_on_log_insert';
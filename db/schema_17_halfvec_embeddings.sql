@@ -0,0 +1,27 @@
+-- schema_17_halfvec_embeddings.sql
+-- FP16 копия эмбеддингов (pgvector halfvec) для векторного поиска.
+-- halfvec вдвое меньше vector: запрос уходит 3 КБ вместо 6 КБ,
+-- HNSW индекс и расчёт расстояния читают вдвое меньше памяти.
+-- Для косинусной близости эмбеддингов точности FP16 достаточно.
+-- Требуется pgvector >= 0.7.0. Применять после schema_documents.sql.
+-- Поиск по новым колонкам включается настройкой RAG_HALFVEC_SEARCH=True.
+
+-- Колонки вычисляемые: заполняются из embedding при INSERT/UPDATE (и для существующих строк)
+ALTER TABLE knowledge_base
+    ADD COLUMN IF NOT EXISTS embedding_half halfvec(1536)
+    GENERATED ALWAYS AS (embedding::halfvec(1536)) STORED;
+
+ALTER TABLE document_chunks
+    ADD COLUMN IF NOT EXISTS embedding_half halfvec(1536)
+    GENERATED ALWAYS AS (embedding::halfvec(1536)) STORED;
+
+-- Векторные индексы по FP16 колонкам
+CREATE INDEX IF NOT EXISTS idx_kb_embedding_half ON knowledge_base
+    USING hnsw (embedding_half halfvec_cosine_ops);
+
+CREATE INDEX IF NOT EXISTS idx_chunks_embedding_half ON document_chunks
+    USING hnsw (embedding_half halfvec_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- Комментарии
+COMMENT ON COLUMN knowledge_base.embedding_half IS 'FP16 копия embedding для поиска (halfvec)';
+COMMENT ON COLUMN document_chunks.embedding_half IS 'FP16 копия embedding для поиска (halfvec)';
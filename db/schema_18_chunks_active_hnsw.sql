@@ -0,0 +1,76 @@
+-- schema_18_chunks_active_hnsw.sql
+-- Частичные HNSW индексы для поиска по document_chunks.
+--
+-- Поиск (chunks_search / chunks_search_priority) берёт только активные чанки
+-- активных документов. Раньше для этого нужен был JOIN documents, и при
+-- жёстком фильтре планировщик pgvector мог уйти в полный перебор с точным
+-- kNN. Флаг активности документа денормализуется в document_chunks,
+-- а индексы строятся только по строкам, которые реально участвуют в поиске:
+-- план всегда «HNSW + постфильтр», без JOIN в горячем пути.
+-- Применять после schema_documents.sql и schema_17_halfvec_embeddings.sql.
+
+-- Денормализованный флаг documents.is_active
+ALTER TABLE document_chunks
+    ADD COLUMN IF NOT EXISTS document_active BOOLEAN NOT NULL DEFAULT TRUE;
+
+UPDATE document_chunks c
+SET document_active = d.is_active
+FROM documents d
+WHERE d.id = c.document_id
+  AND c.document_active IS DISTINCT FROM d.is_active;
+
+-- Новые чанки получают флаг своего документа (в т.ч. при COPY)
+CREATE OR REPLACE FUNCTION document_chunks_set_document_active() RETURNS TRIGGER AS $$
+BEGIN
+    SELECT COALESCE(d.is_active, TRUE) INTO NEW.document_active
+    FROM documents d
+    WHERE d.id = NEW.document_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_document_chunks_set_document_active ON document_chunks;
+CREATE TRIGGER trg_document_chunks_set_document_active
+    BEFORE INSERT ON document_chunks
+    FOR EACH ROW EXECUTE FUNCTION document_chunks_set_document_active();
+
+-- Включение/выключение документа переносится на его чанки
+CREATE OR REPLACE FUNCTION documents_sync_chunks_active() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE document_chunks
+    SET document_active = COALESCE(NEW.is_active, TRUE)
+    WHERE document_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_documents_sync_chunks_active ON documents;
+CREATE TRIGGER trg_documents_sync_chunks_active
+    AFTER UPDATE OF is_active ON documents
+    FOR EACH ROW
+    WHEN (OLD.is_active IS DISTINCT FROM NEW.is_active)
+    EXECUTE FUNCTION documents_sync_chunks_active();
+
+-- Частичные индексы: все активные чанки и приоритетные документы
+CREATE INDEX IF NOT EXISTS idx_chunks_embedding_active ON document_chunks
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)
+    WHERE is_active = TRUE AND document_active = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_chunks_embedding_priority ON document_chunks
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)
+    WHERE is_active = TRUE AND document_active = TRUE AND subcategory = 'приоритет';
+
+CREATE INDEX IF NOT EXISTS idx_chunks_embedding_half_active ON document_chunks
+    USING hnsw (embedding_half halfvec_cosine_ops) WITH (m = 16, ef_construction = 64)
+    WHERE is_active = TRUE AND document_active = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_chunks_embedding_half_priority ON document_chunks
+    USING hnsw (embedding_half halfvec_cosine_ops) WITH (m = 16, ef_construction = 64)
+    WHERE is_active = TRUE AND document_active = TRUE AND subcategory = 'приоритет';
+
+-- Полные индексы заменены частичными (поиск не читает неактивные чанки)
+DROP INDEX IF EXISTS idx_chunks_embedding;
+DROP INDEX IF EXISTS idx_chunks_embedding_half;
+
+-- Комментарии
+COMMENT ON COLUMN document_chunks.document_active IS 'Копия documents.is_active, поддерживается триггерами trg_document_chunks_set_document_active и trg_documents_sync_chunks_active';
@@ -0,0 +1,16 @@
+-- schema_19_moderation_pending_idx.sql
+-- Частичный индекс очереди модерации для moderation_get_next_pending.
+--
+-- Следующий кандидат — самая старая запись со статусом 'pending'.
+-- idx_moderation_status / idx_moderation_created по отдельности заставляют
+-- PostgreSQL либо фильтровать весь индекс по дате, либо сортировать все
+-- pending-записи. Частичный индекс содержит только ожидающие записи
+-- в нужном порядке: ORDER BY created_at LIMIT 1 читает одну строку индекса.
+-- Применять после schema.sql
+
+CREATE INDEX IF NOT EXISTS idx_moderation_pending_created
+    ON moderation_queue(created_at)
+    WHERE status = 'pending';
+
+-- Комментарии
+COMMENT ON INDEX idx_moderation_pending_created IS 'Очередь pending-кандидатов по времени создания (moderation_get_next_pending)';
@@ -0,0 +1,25 @@
+-- schema_20_documents_list_idx.sql
+-- Индексы для списка документов в админке (GET /api/admin/documents,
+-- document_list_by_category).
+--
+-- Список выбирается как WHERE subcategory = $1 ORDER BY created_at DESC LIMIT N
+-- (или без фильтра). С индексом только по subcategory PostgreSQL читает все
+-- документы культуры и сортирует их; составной индекс отдаёт первые N строк
+-- сразу в нужном порядке, сортировка не нужна.
+-- Колонка category не используется (см. schema_documents.sql), поэтому
+-- индекс строится по культуре.
+-- Применять после schema_documents.sql
+
+CREATE INDEX IF NOT EXISTS idx_documents_subcategory_created
+    ON documents(subcategory, created_at DESC);
+
+-- Список без фильтра по культуре
+CREATE INDEX IF NOT EXISTS idx_documents_created
+    ON documents(created_at DESC);
+
+-- Поиск по subcategory обслуживает префикс составного индекса
+DROP INDEX IF EXISTS idx_documents_subcategory;
+
+-- Комментарии
+COMMENT ON INDEX idx_documents_subcategory_created IS 'Список документов культуры, новые первыми';
+COMMENT ON INDEX idx_documents_created IS 'Список всех документов, новые первыми';
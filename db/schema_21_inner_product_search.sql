@@ -0,0 +1,50 @@
+-- schema_21_inner_product_search.sql
+-- Векторный поиск по скалярному произведению (<#>) вместо косинусного расстояния (<=>).
+--
+-- Эмбеддинги хранятся нормированными (длина 1, см. normalize_vector в
+-- src/services/db/vector_codec.py), а для единичных векторов
+-- косинусное расстояние = 1 - скалярное произведение. Оператор <#> не считает
+-- две нормы по 1536 измерений на каждую строку-кандидата.
+-- Поиск возвращает то же значение distance (1 + (a <#> b)), поэтому пороги
+-- RAG_* не меняются.
+-- Требуется pgvector >= 0.7.0 (l2_normalize). Применять после schema_18_chunks_active_hnsw.sql.
+
+-- Нормируем уже сохранённые эмбеддинги (embedding_half пересчитывается автоматически)
+UPDATE knowledge_base
+SET embedding = l2_normalize(embedding)
+WHERE embedding IS NOT NULL;
+
+UPDATE document_chunks
+SET embedding = l2_normalize(embedding)
+WHERE embedding IS NOT NULL;
+
+-- HNSW индексы по скалярному произведению
+CREATE INDEX IF NOT EXISTS idx_kb_embedding_ip ON knowledge_base
+    USING hnsw (embedding vector_ip_ops);
+
+CREATE INDEX IF NOT EXISTS idx_kb_embedding_half_ip ON knowledge_base
+    USING hnsw (embedding_half halfvec_ip_ops);
+
+CREATE INDEX IF NOT EXISTS idx_chunks_embedding_active_ip ON document_chunks
+    USING hnsw (embedding vector_ip_ops) WITH (m = 16, ef_construction = 64)
+    WHERE is_active = TRUE AND document_active = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_chunks_embedding_priority_ip ON document_chunks
+    USING hnsw (embedding vector_ip_ops) WITH (m = 16, ef_construction = 64)
+    WHERE is_active = TRUE AND document_active = TRUE AND subcategory = 'приоритет';
+
+CREATE INDEX IF NOT EXISTS idx_chunks_embedding_half_active_ip ON document_chunks
+    USING hnsw (embedding_half halfvec_ip_ops) WITH (m = 16, ef_construction = 64)
+    WHERE is_active = TRUE AND document_active = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_chunks_embedding_half_priority_ip ON document_chunks
+    USING hnsw (embedding_half halfvec_ip_ops) WITH (m = 16, ef_construction = 64)
+    WHERE is_active = TRUE AND document_active = TRUE AND subcategory = 'приоритет';
+
+-- Косинусные индексы поиском больше не используются
+DROP INDEX IF EXISTS idx_kb_embedding;
+DROP INDEX IF EXISTS idx_kb_embedding_half;
+DROP INDEX IF EXISTS idx_chunks_embedding_active;
+DROP INDEX IF EXISTS idx_chunks_embedding_priority;
+DROP INDEX IF EXISTS idx_chunks_embedding_half_active;
+DROP INDEX IF EXISTS idx_chunks_embedding_half_priority;
@@ -0,0 +1,18 @@
+-- schema_22_topics_open_idx.sql
+-- Частичный индекс открытых тем для get_or_create_open_topic.
+--
+-- Поиск открытой темы выполняется на каждом сообщении пользователя:
+-- WHERE user_id = $1 AND status = 'open' ORDER BY created_at DESC LIMIT 1.
+-- idx_topics_user_status находит все открытые темы пользователя, но их
+-- приходится читать из таблицы и сортировать по created_at. Частичный индекс
+-- содержит только открытые темы в нужном порядке: LIMIT 1 читает одну
+-- строку индекса. Условие status = 'open' в запросе должно совпадать
+-- с условием индекса, иначе планировщик его не использует.
+-- Применять после schema_topics.sql
+
+CREATE INDEX IF NOT EXISTS idx_topics_user_open_created
+    ON topics(user_id, created_at DESC)
+    WHERE status = 'open';
+
+-- Комментарии
+COMMENT ON INDEX idx_topics_user_open_created IS 'Открытые темы пользователя по времени создания (get_or_create_open_topic)';
@@ -0,0 +1,57 @@
+-- schema_23_consultation_totals_shards.sql
+-- Шардирование дневных итогов consultation_totals и триггер на уровне оператора.
+--
+-- В schema_16 триггер FOR EACH ROW обновлял одну строку на день: все
+-- параллельные INSERT в consultation_logs ждали друг друга на блокировке
+-- этой строки, и каждая запись лога оставляла мёртвую версию строки итогов.
+--
+-- Теперь у каждого дня до 16 строк (bucket, shard), шард выбирается по
+-- pg_backend_pid(): соединения пула пишут в разные строки и не блокируют друг
+-- друга. Триггер FOR EACH STATEMENT с таблицей переходов агрегирует все
+-- вставленные оператором строки (многострочный INSERT буфера логов) и делает
+-- один upsert на день вместо одного на строку. Читатели суммируют шарды
+-- (get_stats_summary).
+-- Применять после schema_16_consultation_totals.sql
+
+-- Одной транзакцией: между сменой ключа и заменой триггера старый триггер
+-- (ON CONFLICT (bucket)) не должен срабатывать на новых логах
+BEGIN;
+
+ALTER TABLE consultation_totals ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0;
+
+ALTER TABLE consultation_totals DROP CONSTRAINT IF EXISTS consultation_totals_pkey;
+ALTER TABLE consultation_totals ADD CONSTRAINT consultation_totals_pkey PRIMARY KEY (bucket, shard);
+
+CREATE OR REPLACE FUNCTION consultation_totals_on_log_insert() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO consultation_totals (bucket, shard, consultations, tokens, cost_usd, latency_ms_sum, latency_ms_count)
+    SELECT
+        created_at::date,
+        pg_backend_pid() % 16,
+        COUNT(*),
+        COALESCE(SUM(total_tokens), 0),
+        COALESCE(SUM(cost_usd), 0),
+        COALESCE(SUM(latency_ms), 0),
+        COUNT(latency_ms)
+    FROM new_logs
+    GROUP BY created_at::date
+    ON CONFLICT (bucket, shard) DO UPDATE
+    SET consultations = consultation_totals.consultations + EXCLUDED.consultations,
+        tokens = consultation_totals.tokens + EXCLUDED.tokens,
+        cost_usd = consultation_totals.cost_usd + EXCLUDED.cost_usd,
+        latency_ms_sum = consultation_totals.latency_ms_sum + EXCLUDED.latency_ms_sum,
+        latency_ms_count = consultation_totals.latency_ms_count + EXCLUDED.latency_ms_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_consultation_totals_on_log_insert ON consultation_logs;
+CREATE TRIGGER trg_consultation_totals_on_log_insert
+    AFTER INSERT ON consultation_logs
+    REFERENCING NEW TABLE AS new_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION consultation_totals_on_log_insert();
+
+COMMIT;
+
+-- Комментарии
+COMMENT ON COLUMN consultation_totals.shard IS 'Шард строки итогов дня (pg_backend_pid() % 16) — параллельные записи не блокируют друг друга';
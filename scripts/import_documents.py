@@ -30,7 +30,8 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from src.services.db.pool import init_db_pool, close_db_pool
-from src.services.documents.processor import process_pdf_document
+from src.services.db.documents_repo import documents_exist_by_hashes
+from src.services.documents.processor import compute_file_hash, process_pdf_document
 
 
 # Базовая директория для документов
@@ -141,9 +142,13 @@ async def import_document(
     file_path: Path,
     subcategory: str,
     force_update: bool = False,
+    file_hash: Optional[str] = None,
 ) -> Dict:
     """
     Импортирует один документ.
+
+    file_hash — SHA256 файла, если уже посчитан при проверке дубликатов
+    (тогда файл не читается повторно ради хеша).
     """
     print(f"\n{'='*80}")
     print(f"Обработка: {file_path.name}")
@@ -155,6 +160,7 @@ async def import_document(
         category="общая_информация",  # Дефолтное значение для совместимости
         subcategory=subcategory,
         force_update=force_update,
+        file_hash=file_hash,
     )
 
     if result["success"]:
@@ -220,6 +226,39 @@ async def main():
 
     print(f"✅ Найдено документов: {len(documents)}\n")
 
+    # Хеши всех файлов — для проверки дубликатов одним запросом и чтобы
+    # process_pdf_document не читал файл повторно
+    hashes = {}
+    for doc_info in documents:
+        try:
+            hashes[doc_info["file_path"]] = compute_file_hash(str(doc_info["file_path"]))
+        except Exception:
+            # Ошибку чтения файла покажет process_pdf_document
+            pass
+
+    existing = {}
+    if not args.force_update:
+        existing = await documents_exist_by_hashes(list(set(hashes.values())))
+
+    skipped_count = 0
+    seen_hashes = {}
+    new_documents = []
+    for doc_info in documents:
+        file_hash = hashes.get(doc_info["file_path"])
+        existing_doc = existing.get(file_hash)
+        if existing_doc:
+            print(f"⏭️  Уже в базе: {doc_info['file_path'].name} (ID: {existing_doc['id']})")
+            skipped_count += 1
+        elif file_hash is not None and file_hash in seen_hashes:
+            # Файл с тем же содержимым уже есть в этом импорте
+            print(f"⏭️  Дубликат: {doc_info['file_path'].name} (совпадает с {seen_hashes[file_hash].name})")
+            skipped_count += 1
+        else:
+            if file_hash is not None:
+                seen_hashes[file_hash] = doc_info["file_path"]
+            new_documents.append(doc_info)
+    documents = new_documents
+
     # Обработка каждого документа
     success_count = 0
     error_count = 0
@@ -231,6 +270,7 @@ async def main():
             file_path=doc_info["file_path"],
             subcategory=doc_info["subcategory"],
             force_update=args.force_update,
+            file_hash=hashes.get(doc_info["file_path"]),
         )
 
         if result["success"]:
@@ -245,7 +285,8 @@ async def main():
     print("\n" + "="*80)
     print("ИТОГИ ИМПОРТА")
     print("="*80)
-    print(f"Всего документов: {len(documents)}")
+    print(f"Всего документов: {len(documents) + skipped_count}")
+    print(f"⏭️  Пропущено (уже в базе или дубликаты): {skipped_count}")
     print(f"✅ Успешно: {success_count}")
     print(f"❌ Ошибок: {error_count}")
     print("="*80 + "\n")
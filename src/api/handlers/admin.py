@@ -3,13 +3,31 @@
 API handlers для админ-панели мониторинга консультаций.
 """
 
+import json
 import logging
+from typing import Any, Dict
+
 from aiohttp import web
 
 from src.services.db import consultation_logs_repo
 
 logger = logging.getLogger(__name__)
 
+# JSONB поля логов, которые репозиторий отдаёт готовым JSON-текстом
+_RAW_JSON_LOG_FIELDS = ("rag_snippets", "llm_params")
+
+
+def _dump_topic_log(log: Dict[str, Any]) -> str:
+    """
+    Сериализует один лог из iter_topic_logs(raw_json=True) в JSON.
+
+    rag_snippets/llm_params уже являются JSON-текстом из PostgreSQL и
+    вставляются в ответ как есть, без json.loads + json.dumps.
+    """
+    plain = {k: v for k, v in log.items() if k not in _RAW_JSON_LOG_FIELDS}
+    raw = ", ".join(f'"{k}": {log[k]}' for k in _RAW_JSON_LOG_FIELDS)
+    return json.dumps(plain, ensure_ascii=False)[:-1] + ", " + raw + "}"
+
 
 async def get_users_list(request: web.Request) -> web.Response:
     """
@@ -71,27 +89,59 @@ async def get_user_topics(request: web.Request) -> web.Response:
         raise web.HTTPInternalServerError(text="Database error")
 
 
-async def get_topic_logs(request: web.Request) -> web.Response:
+async def get_topic_logs(request: web.Request) -> web.StreamResponse:
     """
     GET /api/admin/topics/{id}/logs
     Получить полный лог консультации по топику.
 
+    Ответ — тот же JSON {"topic", "logs", "messages"}, но он пишется клиенту
+    страницами, без сборки всего топика в памяти. Соединение пула занято
+    только на время выборки страницы, а не пока клиент читает ответ.
+
     Path params:
         id: int (topic_id)
     """
     try:
         topic_id = int(request.match_info["id"])
-
-        result = await consultation_logs_repo.get_logs_by_topic(topic_id)
-
-        return web.json_response(result)
-
     except ValueError:
         raise web.HTTPBadRequest(text="Invalid topic ID")
+
+    try:
+        topic = await consultation_logs_repo.get_topic_info(topic_id)
     except Exception as e:
         logger.error(f"Error getting topic logs: {e}")
         raise web.HTTPInternalServerError(text="Database error")
 
+    if topic is None:
+        return web.json_response({"topic": None, "logs": []})
+
+    response = web.StreamResponse()
+    response.content_type = "application/json"
+    await response.prepare(request)
+
+    try:
+        await response.write(
+            ('{"topic": ' + json.dumps(topic, ensure_ascii=False) + ', "logs": [').encode("utf-8")
+        )
+        separator = ""
+        async for log in consultation_logs_repo.iter_topic_logs(topic_id, raw_json=True):
+            await response.write((separator + _dump_topic_log(log)).encode("utf-8"))
+            separator = ", "
+
+        await response.write(b'], "messages": [')
+        separator = ""
+        async for message in consultation_logs_repo.iter_topic_messages(topic_id):
+            await response.write((separator + json.dumps(message, ensure_ascii=False)).encode("utf-8"))
+            separator = ", "
+
+        await response.write(b"]}")
+    except Exception as e:
+        # Заголовки уже отправлены — 500 вернуть нельзя, просто обрываем ответ
+        logger.error(f"Error streaming topic logs: {e}")
+
+    await response.write_eof()
+    return response
+
 
 async def get_recent_logs(request: web.Request) -> web.Response:
     """
@@ -107,12 +157,13 @@ async def get_recent_logs(request: web.Request) -> web.Response:
         since_id_str = request.query.get("since_id")
         since_id = int(since_id_str) if since_id_str else None
 
-        logs = await consultation_logs_repo.get_recent_logs(
+        # Репозиторий возвращает готовый JSON-массив — отдаём его как есть
+        logs_json = await consultation_logs_repo.get_recent_logs(
             limit=limit,
             since_id=since_id,
         )
 
-        return web.json_response(logs)
+        return web.Response(text=logs_json, content_type="application/json")
 
     except ValueError:
         raise web.HTTPBadRequest(text="Invalid parameter")
@@ -121,6 +172,31 @@ async def get_recent_logs(request: web.Request) -> web.Response:
         raise web.HTTPInternalServerError(text="Database error")
 
 
+async def get_log(request: web.Request) -> web.Response:
+    """
+    GET /api/admin/logs/{id}
+    Получить полный лог консультации (live feed отдаёт только превью текста).
+
+    Path params:
+        id: int (log_id)
+    """
+    try:
+        log_id = int(request.match_info["id"])
+
+        log = await consultation_logs_repo.get_log_by_id(log_id)
+
+    except ValueError:
+        raise web.HTTPBadRequest(text="Invalid log ID")
+    except Exception as e:
+        logger.error(f"Error getting log: {e}")
+        raise web.HTTPInternalServerError(text="Database error")
+
+    if log is None:
+        raise web.HTTPNotFound(text="Log not found")
+
+    return web.json_response(log)
+
+
 async def get_stats(request: web.Request) -> web.Response:
     """
     GET /api/admin/stats
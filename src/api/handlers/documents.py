@@ -4,6 +4,7 @@ API handlers для загрузки и управления документа
 """
 
 import asyncio
+import hashlib
 import logging
 import os
 import shutil
@@ -47,6 +48,7 @@ async def process_document_background(
     subcategory: str,
     temp_dir: str,
     document_id: Optional[int] = None,
+    file_hash: Optional[str] = None,
 ) -> None:
     """
     Фоновая обработка документа.
@@ -58,6 +60,7 @@ async def process_document_background(
             category="общая_информация",
             subcategory=subcategory,
             force_update=False,
+            file_hash=file_hash,
         )
         if not result["success"]:
             logger.error(f"Document processing failed: {result['error']}")
@@ -134,12 +137,17 @@ async def upload_document(request: web.Request) -> web.Response:
 
         logger.info(f"Uploaded file saved: {file_path} ({len(file_data)} bytes)")
 
+        # Хеш считаем по байтам, которые уже в памяти, — обработке
+        # не нужно перечитывать файл ради проверки дубликата
+        file_hash = (await asyncio.to_thread(hashlib.sha256, file_data)).hexdigest()
+
         # Запускаем обработку в фоне
         asyncio.create_task(
             process_document_background(
                 file_path=file_path,
                 subcategory=subcategory,
                 temp_dir=temp_dir,
+                file_hash=file_hash,
             )
         )
 
@@ -288,8 +296,8 @@ async def delete_document(request: web.Request) -> web.Response:
     try:
         document_id = int(request.match_info["id"])
 
-        # Проверяем существование
-        doc = await documents_repo.document_get_by_id(document_id)
+        # Проверяем существование (нужно только имя файла для ответа)
+        doc = await documents_repo.document_get_summary_by_id(document_id)
         if not doc:
             raise web.HTTPNotFound(text="Document not found")
 
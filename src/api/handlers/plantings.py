@@ -55,8 +55,9 @@ async def get_plantings(request: web.Request) -> web.Response:
         raise web.HTTPUnauthorized(text="Not authenticated")
 
     try:
-        plantings = await user_plantings_repo.get_plantings_by_user(user_id)
-        return web.json_response(plantings)
+        # Репозиторий возвращает готовый JSON-массив — отдаём его как есть
+        plantings_json = await user_plantings_repo.get_plantings_json_by_user(user_id)
+        return web.Response(text=plantings_json, content_type="application/json")
     except Exception as e:
         logger.error(f"Error getting plantings: {e}")
         raise web.HTTPInternalServerError(text="Database error")
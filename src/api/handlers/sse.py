@@ -15,7 +15,7 @@ from typing import Any, Optional
 
 from aiohttp import web
 
-from src.api.sse_manager import sse_manager
+from src.api.sse_manager import format_sse_frame, sse_manager
 from src.services.db.consultation_logs_repo import get_logs_since_id
 
 logger = logging.getLogger(__name__)
@@ -41,15 +41,20 @@ async def send_sse_event(
         data: Данные события (будут сериализованы в JSON)
         event_id: ID события (опционально)
     """
-    message = f"event: {event_type}\n"
+    payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    await send_sse_frame(response, format_sse_frame(event_type, payload, event_id))
 
-    if event_id is not None:
-        message += f"id: {event_id}\n"
 
-    message += f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+async def send_sse_frame(response: web.StreamResponse, frame: bytes) -> None:
+    """
+    Пишет клиенту готовый SSE кадр (сериализован один раз в SSEManager.broadcast).
 
+    Args:
+        response: StreamResponse для записи
+        frame: Байты SSE кадра
+    """
     try:
-        await response.write(message.encode('utf-8'))
+        await response.write(frame)
         await response.drain()
     except Exception as e:
         logger.error(f"Error sending SSE event: {e}")
@@ -144,12 +149,7 @@ async def live_feed_stream(request: web.Request) -> web.StreamResponse:
                 break
 
             # Отправляем событие клиенту
-            await send_sse_event(
-                response,
-                event['type'],
-                event['data'],
-                event.get('id')
-            )
+            await send_sse_frame(response, event['frame'])
 
     except asyncio.CancelledError:
         logger.info(f"SSE client {client_id} cancelled")
@@ -267,12 +267,7 @@ async def topic_logs_stream(request: web.Request) -> web.StreamResponse:
                 logger.info(f"Received shutdown signal for {client_id}")
                 break
 
-            await send_sse_event(
-                response,
-                event['type'],
-                event['data'],
-                event.get('id')
-            )
+            await send_sse_frame(response, event['frame'])
 
     except asyncio.CancelledError:
         logger.info(f"SSE client {client_id} cancelled")
@@ -352,12 +347,7 @@ async def document_status_stream(request: web.Request) -> web.StreamResponse:
                 logger.info(f"Received shutdown signal for {client_id}")
                 break
 
-            await send_sse_event(
-                response,
-                event['type'],
-                event['data'],
-                event.get('id')
-            )
+            await send_sse_frame(response, event['frame'])
 
     except asyncio.CancelledError:
         logger.info(f"SSE client {client_id} cancelled")
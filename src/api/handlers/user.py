@@ -31,6 +31,28 @@ async def get_region(request: web.Request) -> web.Response:
         raise web.HTTPInternalServerError(text="Database error")
 
 
+async def get_garden(request: web.Request) -> web.Response:
+    """
+    GET /api/user/garden
+    Получить регион и посадки пользователя одним запросом.
+    """
+    user_id = request.get("db_user_id")
+    if not user_id:
+        raise web.HTTPUnauthorized(text="Not authenticated")
+
+    try:
+        garden_json = await user_plantings_repo.get_user_garden_json(user_id)
+    except Exception as e:
+        logger.error(f"Error getting user garden: {e}")
+        raise web.HTTPInternalServerError(text="Database error")
+
+    if garden_json is None:
+        return web.json_response({"region": None, "plantings": []})
+
+    # Репозиторий возвращает готовый JSON — отдаём его как есть
+    return web.Response(text=garden_json, content_type="application/json")
+
+
 async def update_region(request: web.Request) -> web.Response:
     """
     PUT /api/user/region
@@ -28,12 +28,14 @@ def setup_routes(app: web.Application) -> None:
     # User settings
     app.router.add_get("/api/user/region", user.get_region)
     app.router.add_put("/api/user/region", user.update_region)
+    app.router.add_get("/api/user/garden", user.get_garden)
 
     # Admin panel API (мониторинг консультаций)
     app.router.add_get("/api/admin/users", admin.get_users_list)
     app.router.add_get("/api/admin/users/{id}/topics", admin.get_user_topics)
     app.router.add_get("/api/admin/topics/{id}/logs", admin.get_topic_logs)
     app.router.add_get("/api/admin/logs/recent", admin.get_recent_logs)
+    app.router.add_get(r"/api/admin/logs/{id:\d+}", admin.get_log)
     app.router.add_get("/api/admin/stats", admin.get_stats)
     app.router.add_get("/api/admin/stats/embeddings", admin.get_embedding_stats)
 
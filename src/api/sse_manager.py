@@ -18,6 +18,21 @@ from typing import Dict, Optional, Any
 logger = logging.getLogger(__name__)
 
 
+def format_sse_frame(event_type: str, payload: bytes, event_id: Optional[Any] = None) -> bytes:
+    """
+    Собирает готовый SSE кадр из уже сериализованного JSON.
+
+    Формат SSE:
+        event: <event_type>
+        id: <event_id>
+        data: <json>
+    """
+    head = f"event: {event_type}\n"
+    if event_id is not None:
+        head += f"id: {event_id}\n"
+    return head.encode('utf-8') + b"data: " + payload + b"\n\n"
+
+
 @dataclass
 class SSEClient:
     """Представляет подключённого SSE клиента."""
@@ -129,25 +144,26 @@ class SSEManager:
         event_type: str,
         data: Any,
         endpoint_type: str,
-        entity_id: Optional[int] = None
+        entity_id: Optional[int] = None,
+        data_bytes: Optional[bytes] = None
     ) -> int:
         """
         Отправляет событие всем подходящим клиентам.
 
+        Событие сериализуется один раз в готовый SSE кадр ('frame'),
+        который все клиенты пишут в соединение без повторного json.dumps.
+
         Args:
             event_type: Тип события ('new_log', 'status_update', etc.)
             data: Данные события (будут сериализованы в JSON)
             endpoint_type: Тип endpoint для фильтрации клиентов
             entity_id: ID сущности для дополнительной фильтрации
+            data_bytes: Уже сериализованный JSON data (если вызывающий код
+                сделал это сам — повторно не сериализуем)
 
         Returns:
             Количество клиентов, которым отправлено событие
         """
-        event = {
-            'type': event_type,
-            'data': data,
-            'id': data.get('id') if isinstance(data, dict) else None
-        }
 
         # Фильтруем клиентов по endpoint_type и entity_id
         target_clients = [
@@ -166,6 +182,17 @@ class SSEManager:
             )
             return 0
 
+        event_id = data.get('id') if isinstance(data, dict) else None
+        if data_bytes is None:
+            data_bytes = json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+        event = {
+            'type': event_type,
+            'data': data,
+            'id': event_id,
+            'frame': format_sse_frame(event_type, data_bytes, event_id)
+        }
+
         # Отправляем событие в очереди всех подходящих клиентов
         sent_count = 0
         for client in target_clients:
@@ -203,10 +230,14 @@ class SSEManager:
                 if not self.clients:
                     continue
 
+                heartbeat_data = {'timestamp': datetime.now().isoformat()}
                 heartbeat_event = {
                     'type': 'heartbeat',
-                    'data': {'timestamp': datetime.now().isoformat()},
-                    'id': None
+                    'data': heartbeat_data,
+                    'id': None,
+                    'frame': format_sse_frame(
+                        'heartbeat', json.dumps(heartbeat_data).encode('utf-8')
+                    )
                 }
 
                 for client in list(self.clients.values()):
@@ -53,6 +53,24 @@ class Settings(BaseSettings):
         ...,
         description="Пароль пользователя БД",
     )
+    db_pool_min_size: int = Field(
+        1,
+        description="Минимальное количество соединений в пуле",
+    )
+    db_pool_max_size: int = Field(
+        20,
+        description="Максимальное количество соединений в пуле",
+    )
+    db_command_timeout: float = Field(
+        30.0,
+        description="Таймаут запроса к БД в секундах (зависший запрос не держит соединение пула)",
+    )
+    db_async_commit: bool = Field(
+        False,
+        description="Открывать соединения пула с synchronous_commit=off: COMMIT не ждёт "
+                    "fsync WAL (при падении БД можно потерять последние секунды записей — "
+                    "всех записей пула, не только логов)",
+    )
 
     # --- OpenAI ---
     openai_api_key: str = Field(
@@ -68,6 +86,23 @@ class Settings(BaseSettings):
         description="Имя модели OpenAI для эмбеддингов",
     )
 
+    # --- RAG поиск ---
+    rag_halfvec_search: bool = Field(
+        False,
+        description="Искать по FP16 колонкам embedding_half (halfvec) — "
+                    "включать после применения db/schema_17_halfvec_embeddings.sql",
+    )
+
+    # --- Логи консультаций ---
+    buffered_log_writes: bool = Field(
+        False,
+        description="Объединять записи consultation_logs, пришедшие в пределах ~20 мс, в один INSERT",
+    )
+    buffered_message_writes: bool = Field(
+        False,
+        description="Объединять записи messages, пришедшие в пределах ~20 мс, в один COPY",
+    )
+
     # --- Администраторы ---
     admin_ids: str = Field(
         "",
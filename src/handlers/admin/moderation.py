@@ -11,16 +11,16 @@ from aiogram.types import Message, CallbackQuery
 
 from src.services.db.moderation_repo import (
     moderation_get_next_pending,
+    moderation_get_next_pending_with_count,
     moderation_get_by_id,
     moderation_update_status,
+    moderation_approve,
     moderation_set_category,
-    moderation_count_pending,
     moderation_update_answer,
 )
 
 from src.services.db.kb_repo import (
     kb_get_distinct_subcategories,
-    kb_insert,
 )
 
 from src.services.llm.embeddings_llm import get_text_embedding
@@ -282,8 +282,8 @@ async def cb_admin_queue(callback: CallbackQuery):
         await callback.answer("Доступ запрещён.", show_alert=True)
         return
 
-    # Берём самого старого кандидата
-    item = await moderation_get_next_pending()
+    # Берём самого старого кандидата и реальное количество pending — одним запросом
+    item, pending_count = await moderation_get_next_pending_with_count()
 
     if not item:
         await callback.message.answer(
@@ -293,8 +293,6 @@ async def cb_admin_queue(callback: CallbackQuery):
         await callback.answer()
         return
 
-    # Считаем реальное количество pending
-    pending_count = await moderation_count_pending()
     count_line = f"Вопросов в очереди на проверку: <b>{pending_count}</b>"
 
     created_at = item.get("created_at")
@@ -858,8 +856,8 @@ async def cb_kb_approve(callback: CallbackQuery):
     raw_cat = item["category_guess"]
 
     # По умолчанию:
-    #   - category    = тип консультации (в kb_insert это первый параметр)
-    #   - subcategory = культура (в kb_insert это второй параметр)
+    #   - category    = тип консультации (knowledge_base.category)
+    #   - subcategory = культура (knowledge_base.subcategory)
     category = "unknown"           # Тип консультации по умолчанию
     subcategory = "общая информация"  # Культура по умолчанию
 
@@ -885,21 +883,22 @@ async def cb_kb_approve(callback: CallbackQuery):
     # Эмбеддинги считаем по ВОПРОСУ
     embedding = await get_text_embedding(question)
 
-    kb_id = await kb_insert(
+    # Вставка в KB и смена статуса — один запрос; None, если запись
+    # уже успели обработать (например, другой админ)
+    kb_id = await moderation_approve(
+        item_id,
         category=category,          # Тип консультации (или "unknown")
         subcategory=subcategory,    # Культура (растение)
         question=question,
         answer=answer,
         embedding=embedding,
+        admin_id=callback.from_user.id,
         source_type="admin_qa",
     )
 
-    await moderation_update_status(
-        item_id=item_id,
-        status="approved",
-        admin_id=callback.from_user.id,
-        kb_id=kb_id,
-    )
+    if kb_id is None:
+        await callback.answer("Запись уже обработана.", show_alert=True)
+        return
 
     category_safe = html.escape(category)
     subcategory_safe = html.escape(subcategory) if subcategory else None
@@ -17,6 +17,8 @@
         * добавить пару вопрос-ответ в очередь модерации
 """
 
+import asyncio
+
 from aiogram import Router, F
 from aiogram.types import Message
 
@@ -24,11 +26,11 @@ from aiogram.types import Message
 from src.services.db.users_repo import get_or_create_user
 from src.services.db.topics_repo import (
     get_or_create_open_topic,
-    get_topic_culture,
 )
 from src.services.db.messages_repo import log_message
 from src.services.db.moderation_repo import moderation_add
 from src.services.db.tokens_repo import has_sufficient_tokens, deduct_tokens, get_token_balance
+from src.services.db.pool import acquire
 
 # Прайсы токенов
 from src.pricing import COST_NEW_TOPIC, COST_ADDITIONAL_QUESTIONS
@@ -904,9 +906,8 @@ async def handle_consultation_root(message: Message) -> None:
     # КРИТИЧНО: Проверяем статус, message_count и culture ДО логирования сообщения!
     from src.services.db.topics_repo import (
         get_topic_message_count,
-        get_topic_status,
+        get_topic_info,
         set_topic_culture,
-        get_topic_category,
         set_topic_category,
         get_follow_up_questions_left,
         decrement_follow_up_questions,
@@ -914,11 +915,16 @@ async def handle_consultation_root(message: Message) -> None:
     )
     from src.services.llm.classification_llm import compare_topics_for_change, detect_category_and_culture
 
-    message_count_before = await get_topic_message_count(topic_id)
-    topic_status = await get_topic_status(topic_id)
-    culture = await get_topic_culture(topic_id)
-    saved_category = await get_topic_category(topic_id)
-    questions_left = await get_follow_up_questions_left(topic_id)
+    # Поля темы — одним запросом; количество сообщений — параллельно
+    message_count_before, topic_info = await asyncio.gather(
+        get_topic_message_count(topic_id),
+        get_topic_info(topic_id),
+    )
+    topic_info = topic_info or {}
+    topic_status = topic_info.get("status")
+    culture = topic_info.get("culture")
+    saved_category = topic_info.get("category")
+    questions_left = topic_info.get("follow_up_questions_left") or 0
 
     print(f"[entry] BEFORE: topic_id={topic_id}, msg_count={message_count_before}, status={topic_status}, culture={culture!r}, questions_left={questions_left}")
 
@@ -1238,34 +1244,32 @@ async def handle_get_more_questions(callback: CallbackQuery) -> None:
 
     telegram_user_id = callback.from_user.id
 
-    # Получаем внутренний user_id
-    user_id = await get_or_create_user(
-        telegram_user_id=telegram_user_id,
-        username=callback.from_user.username,
-        first_name=callback.from_user.first_name,
-        last_name=callback.from_user.last_name,
-    )
+    # Запросы к БД до ответа в Telegram — на одном соединении пула
+    async with acquire():
+        # Получаем внутренний user_id
+        user_id = await get_or_create_user(
+            telegram_user_id=telegram_user_id,
+            username=callback.from_user.username,
+            first_name=callback.from_user.first_name,
+            last_name=callback.from_user.last_name,
+        )
 
-    # Проверяем баланс токенов
-    if not await has_sufficient_tokens(user_id, COST_ADDITIONAL_QUESTIONS):
-        balance = await get_token_balance(user_id)
+        # Списываем токен (проверка баланса — в том же запросе)
+        success = await deduct_tokens(
+            user_id,
+            COST_ADDITIONAL_QUESTIONS,
+            "buy_questions",
+            "3 дополнительных вопроса"
+        )
+        balance = None if success else await get_token_balance(user_id)
+
+    if not success:
         await callback.answer(
             f"Недостаточно токенов! Нужно: {COST_ADDITIONAL_QUESTIONS}, у вас: {balance}",
             show_alert=True
         )
         return
 
-    # Списываем токен
-    success = await deduct_tokens(
-        user_id,
-        COST_ADDITIONAL_QUESTIONS,
-        "buy_questions",
-        "3 дополнительных вопроса"
-    )
-    if not success:
-        await callback.answer("Ошибка списания токенов", show_alert=True)
-        return
-
     # Получаем session_id из callback.message
     if callback.message is None:
         await callback.answer("Ошибка: сообщение не найдено")
@@ -1274,12 +1278,13 @@ async def handle_get_more_questions(callback: CallbackQuery) -> None:
     session_id = build_session_id_from_message(callback.message)
 
     # Получаем топик
-    from src.services.db.topics_repo import reset_follow_up_questions
-    topic_id = await get_or_create_open_topic(user_id=user_id, session_id=session_id)
+    from src.services.db.topics_repo import reset_follow_up_questions, get_follow_up_questions_left
+    async with acquire():
+        topic_id = await get_or_create_open_topic(user_id=user_id, session_id=session_id)
 
-    # Сбрасываем счётчик
-    await reset_follow_up_questions(topic_id)
-    questions_left = await get_follow_up_questions_left(topic_id)
+        # Сбрасываем счётчик
+        await reset_follow_up_questions(topic_id)
+        questions_left = await get_follow_up_questions_left(topic_id)
 
     print(f"[get_more_questions] Reset: user={telegram_user_id}, topic={topic_id}, left={questions_left}")
 
@@ -28,6 +28,8 @@
     - Очищаем состояние и контекст.
 """
 
+import asyncio
+
 from aiogram import Router
 from aiogram.types import Message
 
@@ -293,8 +295,11 @@ async def handle_nutrition_root(message: Message) -> None:
 
     # КРИТИЧНО: Проверяем message_count и culture ДО логирования сообщения!
     from src.services.db.topics_repo import get_topic_message_count
-    message_count_before = await get_topic_message_count(topic_id)
-    culture = await get_topic_culture(topic_id)
+    # Запросы независимы — выполняем параллельно на двух соединениях пула
+    message_count_before, culture = await asyncio.gather(
+        get_topic_message_count(topic_id),
+        get_topic_culture(topic_id),
+    )
 
     print(f"[nutrition] ДО логирования: topic_id={topic_id}, message_count={message_count_before}, culture={culture!r}")
 
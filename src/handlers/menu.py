@@ -15,6 +15,7 @@ from src.services.db.users_repo import get_or_create_user, count_all_users  # С
 from src.services.db.topics_repo import get_or_create_open_topic     # Создание/поиск "открытой" темы (диалога)
 from src.services.db.messages_repo import log_message                # Логирование сообщений в таблицу messages
 from src.services.db.moderation_repo import moderation_count_pending # Подсчёт вопросов на модерации
+from src.services.db.pool import acquire                             # Одно соединение на несколько запросов подряд
 
 # Импортируем глобальное состояние консультации и утилиту для сборки session_id
 from src.handlers.common import CONSULTATION_STATE, CONSULTATION_CONTEXT, build_session_id_from_message
@@ -57,21 +58,24 @@ async def cmd_start(message: Message) -> None:
         first_name = None
         last_name = None
 
-    user_id = await get_or_create_user(
-        telegram_user_id=telegram_user_id,
-        username=username,
-        first_name=first_name,
-        last_name=last_name,
-    )
-
     # При команде /start закрываем все старые топики и создаём новый
     from src.services.db.topics_repo import close_open_topics
-    await close_open_topics(user_id)
 
-    topic_id = await get_or_create_open_topic(
-        user_id=user_id,
-        session_id=session_id,
-    )
+    # Три запроса подряд — на одном соединении пула
+    async with acquire():
+        user_id = await get_or_create_user(
+            telegram_user_id=telegram_user_id,
+            username=username,
+            first_name=first_name,
+            last_name=last_name,
+        )
+
+        await close_open_topics(user_id)
+
+        topic_id = await get_or_create_open_topic(
+            user_id=user_id,
+            session_id=session_id,
+        )
 
     user_text = message.text or "/start"
 
@@ -5,7 +5,6 @@
 
 from datetime import datetime
 from typing import Optional
-from uuid import UUID
 
 from src.services.db.pool import get_pool
 
@@ -69,7 +68,7 @@ async def get_event_by_id(event_id: str, user_id: int) -> Optional[dict]:
             FROM calendar_events
             WHERE id = $1 AND user_id = $2
             """,
-            UUID(event_id),
+            event_id,
             user_id,
         )
 
@@ -141,7 +140,7 @@ async def update_event(event_id: str, user_id: int, data: dict) -> Optional[dict
                       type, culture_code, plot_id, status, description, tags, color,
                       created_at, updated_at
             """,
-            UUID(event_id),
+            event_id,
             user_id,
             data.get("title"),
             data.get("startDateTime"),
@@ -175,7 +174,7 @@ async def delete_event(event_id: str, user_id: int) -> bool:
             DELETE FROM calendar_events
             WHERE id = $1 AND user_id = $2
             """,
-            UUID(event_id),
+            event_id,
             user_id,
         )
 
@@ -199,7 +198,7 @@ async def update_event_status(event_id: str, user_id: int, status: str) -> Optio
                       type, culture_code, plot_id, status, description, tags, color,
                       created_at, updated_at
             """,
-            UUID(event_id),
+            event_id,
             user_id,
             status,
         )
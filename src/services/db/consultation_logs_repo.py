@@ -8,19 +8,278 @@
     - get_users_with_stats: Список пользователей со статистикой консультаций
     - get_topics_by_user: Топики пользователя
     - get_logs_by_topic: Логи консультации по топику
+    - get_topic_info / iter_topic_logs / iter_topic_messages: То же потоково (страницами)
     - get_recent_logs: Последние логи (для live feed)
+    - get_log_by_id: Полный лог по id
     - get_stats_summary: Общая статистика
 """
 
+import asyncio
 import json
 import logging
-from typing import Optional, List, Dict, Any
+import time
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
 
+from src.config import settings
 from src.services.db.pool import get_pool
 
 logger = logging.getLogger(__name__)
 
 
+# SQL горячих запросов вынесен в константы модуля: текст запроса — ключ
+# кэша подготовленных выражений asyncpg (statement_cache_size в pool.py),
+# поэтому повторные вызовы на том же соединении не тратят время на parse/plan.
+# RETURNING отдаёт сразу все поля SSE события new_log (включая llm_cost_usd),
+# поэтому log_consultation собирает log_data из dict(row), а не из аргументов.
+_LOG_INSERT_RETURNING = """
+    RETURNING
+        id, created_at, user_id, topic_id,
+        user_message, bot_response,
+        COALESCE(system_prompt, '') AS system_prompt,
+        prompt_tokens, completion_tokens, total_tokens,
+        COALESCE(cost_usd, 0)::float8 AS cost_usd,
+        GREATEST(
+            0,
+            COALESCE(cost_usd, 0) - COALESCE(embedding_cost_usd, 0)
+            - COALESCE(compose_cost_usd, 0) - COALESCE(classification_cost_usd, 0)
+        )::float8 AS llm_cost_usd,
+        latency_ms, consultation_category, culture,
+        COALESCE(composed_question, '') AS composed_question,
+        COALESCE(compose_tokens, 0) AS compose_tokens,
+        COALESCE(compose_cost_usd, 0)::float8 AS compose_cost_usd,
+        COALESCE(embedding_tokens, 0) AS embedding_tokens,
+        COALESCE(embedding_cost_usd, 0)::float8 AS embedding_cost_usd,
+        COALESCE(classification_tokens, 0) AS classification_tokens,
+        COALESCE(classification_cost_usd, 0)::float8 AS classification_cost_usd
+"""
+
+_LOG_INSERT_SQL = """
+    INSERT INTO consultation_logs (
+        user_id, topic_id, message_id,
+        user_message, bot_response, system_prompt,
+        rag_snippets, llm_params,
+        prompt_tokens, completion_tokens, cost_usd, latency_ms,
+        consultation_category, culture,
+        embedding_tokens, embedding_cost_usd, embedding_model,
+        composed_question, compose_cost_usd, compose_tokens,
+        classification_cost_usd, classification_tokens
+    )
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20, $21, $22)
+""" + _LOG_INSERT_RETURNING
+
+_LOG_USER_SQL = """
+    SELECT telegram_user_id, username, first_name
+    FROM users
+    WHERE id = $1
+"""
+
+# Лента логов собирается в JSON на стороне PostgreSQL (json_build_object + json_agg):
+# выборки маленькие (LIMIT 50), а Python не копирует ~15 полей каждой строки в dict.
+_LOG_FEED_ITEM_SQL = """
+    json_build_object(
+        'id', cl.id,
+        'user_id', cl.user_id,
+        'topic_id', cl.topic_id,
+        'user_message', cl.user_message,
+        'bot_response', cl.bot_response,
+        'prompt_tokens', cl.prompt_tokens,
+        'completion_tokens', cl.completion_tokens,
+        'total_tokens', cl.total_tokens,
+        'cost_usd', COALESCE(cl.cost_usd, 0)::float8,
+        'latency_ms', cl.latency_ms,
+        'consultation_category', cl.consultation_category,
+        'culture', cl.culture,
+        'created_at', cl.created_at,
+        'user', json_build_object(
+            'username', u.username,
+            'first_name', u.first_name,
+            'telegram_user_id', u.telegram_user_id
+        )
+    )
+"""
+
+# Live feed показывает только начало вопроса/ответа: текст обрезается в SQL
+# до _FEED_PREVIEW_CHARS символов, *_len подсказывают клиенту, что есть
+# продолжение (полный лог — get_log_by_id). Лента топика получает полный текст.
+_FEED_PREVIEW_CHARS = 200
+
+_LOG_FEED_PREVIEW_ITEM_SQL = _LOG_FEED_ITEM_SQL.replace(
+    "'user_message', cl.user_message,",
+    f"'user_message', substring(cl.user_message, 1, {_FEED_PREVIEW_CHARS}), "
+    "'user_message_len', length(cl.user_message),",
+).replace(
+    "'bot_response', cl.bot_response,",
+    f"'bot_response', substring(cl.bot_response, 1, {_FEED_PREVIEW_CHARS}), "
+    "'bot_response_len', length(cl.bot_response),",
+)
+
+_LOGS_SINCE_ID_SQL = f"""
+    SELECT COALESCE(json_agg(s.item ORDER BY s.id), '[]')::text
+    FROM (
+        SELECT cl.id, {_LOG_FEED_PREVIEW_ITEM_SQL} AS item
+        FROM consultation_logs cl
+        JOIN users u ON u.id = cl.user_id
+        WHERE cl.id > $1
+        ORDER BY cl.id ASC
+        LIMIT $2
+    ) s
+"""
+
+_LOGS_SINCE_ID_BY_TOPIC_SQL = f"""
+    SELECT COALESCE(json_agg(s.item ORDER BY s.id), '[]')::text
+    FROM (
+        SELECT cl.id, {_LOG_FEED_ITEM_SQL} AS item
+        FROM consultation_logs cl
+        JOIN users u ON u.id = cl.user_id
+        WHERE cl.id > $1 AND cl.topic_id = $2
+        ORDER BY cl.id ASC
+        LIMIT $3
+    ) s
+"""
+
+_RECENT_LOGS_SQL = f"""
+    SELECT COALESCE(json_agg(s.item ORDER BY s.created_at DESC), '[]')::text
+    FROM (
+        SELECT cl.created_at, {_LOG_FEED_PREVIEW_ITEM_SQL} AS item
+        FROM consultation_logs cl
+        JOIN users u ON u.id = cl.user_id
+        ORDER BY cl.created_at DESC
+        LIMIT $1
+    ) s
+"""
+
+
+async def _fetchrow(sql: str, *args):
+    """fetchrow на отдельном соединении из пула (для параллельных запросов через asyncio.gather)."""
+    async with get_pool().acquire() as conn:
+        return await conn.fetchrow(sql, *args)
+
+
+async def _fetch(sql: str, *args):
+    """fetch на отдельном соединении из пула (для параллельных запросов через asyncio.gather)."""
+    async with get_pool().acquire() as conn:
+        return await conn.fetch(sql, *args)
+
+
+class _LogWriteBuffer:
+    """
+    Буфер записи логов консультаций (включается BUFFERED_LOG_WRITES=True).
+
+    Вызовы log_consultation, пришедшие в пределах flush_interval, объединяются
+    в один многострочный INSERT ... VALUES (...), (...) RETURNING ... —
+    один round trip вместо N. Каждый вызов получает свою строку RETURNING
+    через future.
+    """
+
+    _COLUMNS_COUNT = 22
+
+    def __init__(self, flush_interval: float = 0.02, max_batch: int = 100):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(self, args: Tuple) -> Any:
+        """Ставит запись в очередь и ждёт, пока её пачка будет записана."""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((args, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+
+            # Добираем записи, пришедшие в окне flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+
+    def _build_sql(self, rows_count: int) -> str:
+        values = []
+        for r in range(rows_count):
+            base = r * self._COLUMNS_COUNT
+            values.append(
+                "(" + ", ".join(f"${base + c + 1}" for c in range(self._COLUMNS_COUNT)) + ")"
+            )
+        head = _LOG_INSERT_SQL.split("VALUES")[0]
+        return f"{head}VALUES {', '.join(values)}\n{_LOG_INSERT_RETURNING}"
+
+    async def _flush(self, batch: List[Tuple[Tuple, asyncio.Future]]) -> None:
+        params = [value for args, _ in batch for value in args]
+
+        try:
+            pool = get_pool()
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(self._build_sql(len(batch)), *params)
+        except Exception as e:
+            logger.error(f"[consultation_logs_repo] Ошибка пакетной записи логов: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # id выдаются из SERIAL по порядку строк VALUES,
+        # поэтому сортировка по id восстанавливает порядок пачки
+        rows = sorted(rows, key=lambda r: r["id"])
+        for (_, future), row in zip(batch, rows):
+            if not future.done():
+                future.set_result(row)
+
+
+_log_write_buffer = _LogWriteBuffer()
+
+
+# Кэш данных пользователя для SSE события log_consultation:
+# user_id -> ({username, first_name, telegram_user_id}, время записи по time.monotonic()).
+# Эти поля почти не меняются, поэтому повторные консультации обходятся без запроса к users.
+# Бот их не обновляет; правки в обход бота видны не позже чем через _USER_CACHE_TTL.
+# Если появится UPDATE этих полей — сбрасывать запись через _USER_CACHE.pop(user_id).
+_USER_CACHE_TTL = 300.0
+_USER_CACHE: Dict[int, Tuple[Dict[str, Any], float]] = {}
+
+
+def _get_cached_user(user_id: int) -> Optional[Dict[str, Any]]:
+    """Возвращает данные пользователя из кэша или None, если записи нет или она устарела."""
+    cached = _USER_CACHE.get(user_id)
+    if cached is None:
+        return None
+
+    user_info, stored_at = cached
+    if time.monotonic() - stored_at > _USER_CACHE_TTL:
+        _USER_CACHE.pop(user_id, None)
+        return None
+
+    return user_info
+
+
+def _cache_user(user_id: int, user_row) -> Dict[str, Any]:
+    """Формирует данные пользователя из строки users и кладёт их в кэш."""
+    if user_row is None:
+        return {"username": None, "first_name": None, "telegram_user_id": None}
+
+    user_info = {
+        "username": user_row["username"],
+        "first_name": user_row["first_name"],
+        "telegram_user_id": user_row["telegram_user_id"],
+    }
+    _USER_CACHE[user_id] = (user_info, time.monotonic())
+    return user_info
+
+
 async def log_consultation(
     user_id: int,
     user_message: str,
@@ -52,145 +311,161 @@ async def log_consultation(
     """
     pool = get_pool()
 
-    try:
+    insert_args = (
+        user_id,
+        topic_id,
+        message_id,
+        user_message,
+        bot_response,
+        system_prompt,
+        json.dumps(rag_snippets, ensure_ascii=False),
+        json.dumps(llm_params, ensure_ascii=False),
+        prompt_tokens,
+        completion_tokens,
+        cost_usd,
+        latency_ms,
+        consultation_category,
+        culture,
+        embedding_tokens,
+        embedding_cost_usd,
+        embedding_model,
+        composed_question,
+        compose_cost_usd,
+        compose_tokens,
+        classification_cost_usd,
+        classification_tokens,
+    )
+
+    async def _insert():
+        # В буферизованном режиме INSERT объединяется с соседними вызовами
+        if settings.buffered_log_writes:
+            return await _log_write_buffer.submit(insert_args)
         async with pool.acquire() as conn:
-            row = await conn.fetchrow(
-                """
-                INSERT INTO consultation_logs (
-                    user_id, topic_id, message_id,
-                    user_message, bot_response, system_prompt,
-                    rag_snippets, llm_params,
-                    prompt_tokens, completion_tokens, cost_usd, latency_ms,
-                    consultation_category, culture,
-                    embedding_tokens, embedding_cost_usd, embedding_model,
-                    composed_question, compose_cost_usd, compose_tokens,
-                    classification_cost_usd, classification_tokens
-                )
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20, $21, $22)
-                RETURNING id, created_at
-                """,
-                user_id,
-                topic_id,
-                message_id,
-                user_message,
-                bot_response,
-                system_prompt,
-                json.dumps(rag_snippets, ensure_ascii=False),
-                json.dumps(llm_params, ensure_ascii=False),
-                prompt_tokens,
-                completion_tokens,
-                cost_usd,
-                latency_ms,
-                consultation_category,
-                culture,
-                embedding_tokens,
-                embedding_cost_usd,
-                embedding_model,
-                composed_question,
-                compose_cost_usd,
-                compose_tokens,
-                classification_cost_usd,
-                classification_tokens,
-            )
-            log_id = row["id"]
-            created_at = row["created_at"]
-
-            # Получаем информацию о пользователе для SSE события
-            user_row = await conn.fetchrow(
-                """
-                SELECT telegram_user_id, username, first_name
-                FROM users
-                WHERE id = $1
-                """,
-                user_id,
+            return await conn.fetchrow(_LOG_INSERT_SQL, *insert_args)
+
+    try:
+        # Информация о пользователе для SSE события берётся из кэша, если
+        # пользователь уже писал в последние _USER_CACHE_TTL секунд. Иначе
+        # SELECT идёт параллельно с INSERT на другом соединении пула:
+        # asyncpg не поддерживает pipeline, так экономим один round trip.
+        user_info = _get_cached_user(user_id)
+        if user_info is None:
+            row, user_row = await asyncio.gather(_insert(), _fetchrow(_LOG_USER_SQL, user_id))
+            user_info = _cache_user(user_id, user_row)
+        else:
+            row = await _insert()
+        log_id = row["id"]
+
+        # Broadcast SSE event для live-feed и конкретного топика
+        try:
+            from src.api.sse_manager import sse_manager
+
+            # Формируем данные лога для SSE из строки RETURNING
+            log_data = dict(row)
+            created_at = log_data["created_at"]
+            log_data["created_at"] = created_at.isoformat() if created_at else None
+
+            # Обычно вызывающий код передаёт готовые list/dict — тогда разбор не нужен.
+            # json.loads вызывается только для строк, ошибки ловим узко.
+            parsed_rag_snippets = rag_snippets
+            if isinstance(rag_snippets, (str, bytes)):
+                try:
+                    parsed_rag_snippets = json.loads(rag_snippets or "[]")
+                except json.JSONDecodeError:
+                    parsed_rag_snippets = []
+
+            parsed_llm_params = llm_params
+            if isinstance(llm_params, (str, bytes)):
+                try:
+                    parsed_llm_params = json.loads(llm_params or "{}")
+                except json.JSONDecodeError:
+                    parsed_llm_params = {}
+
+            log_data["rag_snippets"] = parsed_rag_snippets or []
+            log_data["llm_params"] = parsed_llm_params or {}
+            log_data["user"] = user_info
+
+            # Сериализуем один раз — для обоих broadcast и всех клиентов
+            log_data_bytes = json.dumps(log_data, ensure_ascii=False).encode('utf-8')
+
+            # Broadcast для live-feed (все клиенты)
+            await sse_manager.broadcast(
+                event_type='new_log',
+                data=log_data,
+                endpoint_type='live-feed',
+                data_bytes=log_data_bytes
             )
 
-            # Broadcast SSE event для live-feed и конкретного топика
-            try:
-                from src.api.sse_manager import sse_manager
-                import json as json_lib
-
-                # Формируем данные лога для SSE
-                total_tokens = prompt_tokens + completion_tokens
-
-                # Calculate llm_cost_usd (same logic as in get_logs_by_topic line 445)
-                llm_cost_usd = max(0, float(cost_usd) - float(embedding_cost_usd) - float(compose_cost_usd) - float(classification_cost_usd))
-
-                # Парсим JSON поля если они строки
-                parsed_rag_snippets = rag_snippets
-                if isinstance(rag_snippets, str):
-                    try:
-                        parsed_rag_snippets = json_lib.loads(rag_snippets)
-                    except:
-                        parsed_rag_snippets = []
-
-                parsed_llm_params = llm_params
-                if isinstance(llm_params, str):
-                    try:
-                        parsed_llm_params = json_lib.loads(llm_params)
-                    except:
-                        parsed_llm_params = {}
-
-                log_data = {
-                    "id": log_id,
-                    "user_id": user_id,
-                    "topic_id": topic_id,
-                    "user_message": user_message,
-                    "bot_response": bot_response,
-                    "system_prompt": system_prompt or "",
-                    "rag_snippets": parsed_rag_snippets or [],
-                    "llm_params": parsed_llm_params or {},
-                    "prompt_tokens": prompt_tokens,
-                    "completion_tokens": completion_tokens,
-                    "total_tokens": total_tokens,
-                    "cost_usd": float(cost_usd),
-                    "llm_cost_usd": float(llm_cost_usd) if llm_cost_usd else 0.0,
-                    "latency_ms": latency_ms,
-                    "consultation_category": consultation_category,
-                    "culture": culture,
-                    "composed_question": composed_question or "",
-                    "compose_tokens": compose_tokens or 0,
-                    "compose_cost_usd": float(compose_cost_usd) if compose_cost_usd else 0.0,
-                    "embedding_tokens": embedding_tokens or 0,
-                    "embedding_cost_usd": float(embedding_cost_usd) if embedding_cost_usd else 0.0,
-                    "classification_tokens": classification_tokens or 0,
-                    "classification_cost_usd": float(classification_cost_usd) if classification_cost_usd else 0.0,
-                    "created_at": created_at.isoformat() if created_at else None,
-                    "user": {
-                        "username": user_row["username"] if user_row else None,
-                        "first_name": user_row["first_name"] if user_row else None,
-                        "telegram_user_id": user_row["telegram_user_id"] if user_row else None,
-                    },
-                }
-
-                # Broadcast для live-feed (все клиенты)
+            # Broadcast для конкретного топика (если есть)
+            if topic_id:
                 await sse_manager.broadcast(
                     event_type='new_log',
                     data=log_data,
-                    endpoint_type='live-feed'
+                    endpoint_type='logs',
+                    entity_id=topic_id,
+                    data_bytes=log_data_bytes
                 )
 
-                # Broadcast для конкретного топика (если есть)
-                if topic_id:
-                    await sse_manager.broadcast(
-                        event_type='new_log',
-                        data=log_data,
-                        endpoint_type='logs',
-                        entity_id=topic_id
-                    )
+            logger.debug(f"SSE broadcast sent for log {log_id}, llm_cost_usd={log_data.get('llm_cost_usd', 'MISSING')}, composed_question={bool(log_data.get('composed_question'))}")
 
-                logger.debug(f"SSE broadcast sent for log {log_id}, llm_cost_usd={log_data.get('llm_cost_usd', 'MISSING')}, composed_question={bool(log_data.get('composed_question'))}")
+        except Exception as e:
+            # Не падаем если SSE broadcast не сработал
+            logger.warning(f"Failed to broadcast SSE event for log {log_id}: {e}")
 
-            except Exception as e:
-                # Не падаем если SSE broadcast не сработал
-                logger.warning(f"Failed to broadcast SSE event for log {log_id}: {e}")
-
-            return log_id
+        return log_id
     except Exception as e:
         logger.error(f"[consultation_logs_repo] Ошибка записи лога: {e}")
         return -1
 
 
+_USERS_COUNT_SEARCH_SQL = """
+    SELECT COUNT(*) AS cnt
+    FROM users u
+    WHERE u.username ILIKE $1 OR u.first_name ILIKE $1
+"""
+
+_USERS_COUNT_SQL = """
+    SELECT COUNT(*) AS cnt FROM users
+"""
+
+_USERS_WITH_STATS_SEARCH_SQL = """
+    SELECT
+        u.id,
+        u.telegram_user_id,
+        u.username,
+        u.first_name,
+        u.last_name,
+        u.token_balance,
+        COALESCE(s.total_consultations, 0) AS total_consultations,
+        COALESCE(s.total_tokens, 0) AS total_tokens,
+        COALESCE(s.total_cost_usd, 0) AS total_cost_usd,
+        to_char(s.last_consultation_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') AS last_consultation_at
+    FROM users u
+    LEFT JOIN users_stats s ON s.user_id = u.id
+    WHERE u.username ILIKE $1 OR u.first_name ILIKE $1
+    ORDER BY s.last_consultation_at DESC NULLS LAST
+    LIMIT $2 OFFSET $3
+"""
+
+_USERS_WITH_STATS_SQL = """
+    SELECT
+        u.id,
+        u.telegram_user_id,
+        u.username,
+        u.first_name,
+        u.last_name,
+        u.token_balance,
+        COALESCE(s.total_consultations, 0) AS total_consultations,
+        COALESCE(s.total_tokens, 0) AS total_tokens,
+        COALESCE(s.total_cost_usd, 0) AS total_cost_usd,
+        to_char(s.last_consultation_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') AS last_consultation_at
+    FROM users u
+    LEFT JOIN users_stats s ON s.user_id = u.id
+    ORDER BY s.last_consultation_at DESC NULLS LAST
+    LIMIT $1 OFFSET $2
+"""
+
+
 async def get_users_with_stats(
     limit: int = 50,
     offset: int = 0,
@@ -207,100 +482,68 @@ async def get_users_with_stats(
             "offset": int
         }
     """
-    pool = get_pool()
-
-    async with pool.acquire() as conn:
-        # Подсчёт общего количества
-        if search:
-            count_row = await conn.fetchrow(
-                """
-                SELECT COUNT(DISTINCT u.id) AS cnt
-                FROM users u
-                LEFT JOIN consultation_logs cl ON cl.user_id = u.id
-                WHERE u.username ILIKE $1 OR u.first_name ILIKE $1
-                """,
-                f"%{search}%",
-            )
-        else:
-            count_row = await conn.fetchrow(
-                """
-                SELECT COUNT(*) AS cnt FROM users
-                """
-            )
-
-        total = count_row["cnt"] if count_row else 0
-
-        # Получение пользователей со статистикой
-        if search:
-            rows = await conn.fetch(
-                """
-                SELECT
-                    u.id,
-                    u.telegram_user_id,
-                    u.username,
-                    u.first_name,
-                    u.last_name,
-                    u.token_balance,
-                    COALESCE(COUNT(cl.id), 0) AS total_consultations,
-                    COALESCE(SUM(cl.total_tokens), 0) AS total_tokens,
-                    COALESCE(SUM(cl.cost_usd), 0) AS total_cost_usd,
-                    MAX(cl.created_at) AS last_consultation_at
-                FROM users u
-                LEFT JOIN consultation_logs cl ON cl.user_id = u.id
-                WHERE u.username ILIKE $1 OR u.first_name ILIKE $1
-                GROUP BY u.id
-                ORDER BY last_consultation_at DESC NULLS LAST
-                LIMIT $2 OFFSET $3
-                """,
-                f"%{search}%",
-                limit,
-                offset,
-            )
-        else:
-            rows = await conn.fetch(
-                """
-                SELECT
-                    u.id,
-                    u.telegram_user_id,
-                    u.username,
-                    u.first_name,
-                    u.last_name,
-                    u.token_balance,
-                    COALESCE(COUNT(cl.id), 0) AS total_consultations,
-                    COALESCE(SUM(cl.total_tokens), 0) AS total_tokens,
-                    COALESCE(SUM(cl.cost_usd), 0) AS total_cost_usd,
-                    MAX(cl.created_at) AS last_consultation_at
-                FROM users u
-                LEFT JOIN consultation_logs cl ON cl.user_id = u.id
-                GROUP BY u.id
-                ORDER BY last_consultation_at DESC NULLS LAST
-                LIMIT $1 OFFSET $2
-                """,
-                limit,
-                offset,
-            )
-
-        users = []
-        for row in rows:
-            users.append({
-                "id": row["id"],
-                "telegram_user_id": row["telegram_user_id"],
-                "username": row["username"],
-                "first_name": row["first_name"],
-                "last_name": row["last_name"],
-                "token_balance": row["token_balance"],
-                "total_consultations": row["total_consultations"],
-                "total_tokens": row["total_tokens"],
-                "total_cost_usd": float(row["total_cost_usd"]) if row["total_cost_usd"] else 0,
-                "last_consultation_at": row["last_consultation_at"].isoformat() if row["last_consultation_at"] else None,
-            })
+    # Подсчёт общего количества и страница пользователей независимы —
+    # выполняем их параллельно на разных соединениях пула.
+    # Агрегаты берутся из users_stats (поддерживается триггером, см. schema_15),
+    # поэтому consultation_logs не сканируется на каждый запрос.
+    if search:
+        pattern = f"%{search}%"
+        count_row, rows = await asyncio.gather(
+            _fetchrow(_USERS_COUNT_SEARCH_SQL, pattern),
+            _fetch(_USERS_WITH_STATS_SEARCH_SQL, pattern, limit, offset),
+        )
+    else:
+        count_row, rows = await asyncio.gather(
+            _fetchrow(_USERS_COUNT_SQL),
+            _fetch(_USERS_WITH_STATS_SQL, limit, offset),
+        )
 
-        return {
-            "users": users,
-            "total": total,
-            "limit": limit,
-            "offset": offset,
-        }
+    total = count_row["cnt"] if count_row else 0
+
+    users = []
+    for record in rows:
+        # dict(record) один раз на строку: дальше обычные dict-lookup
+        # вместо повторных обращений к Record по имени колонки
+        row = dict(record)
+        users.append({
+            "id": row["id"],
+            "telegram_user_id": row["telegram_user_id"],
+            "username": row["username"],
+            "first_name": row["first_name"],
+            "last_name": row["last_name"],
+            "token_balance": row["token_balance"],
+            "total_consultations": row["total_consultations"],
+            "total_tokens": row["total_tokens"],
+            "total_cost_usd": float(row["total_cost_usd"]) if row["total_cost_usd"] else 0,
+            "last_consultation_at": row["last_consultation_at"],
+        })
+
+    return {
+        "users": users,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+    }
+
+_TOPICS_BY_USER_SQL = """
+    SELECT
+        t.id,
+        t.session_id,
+        t.status,
+        t.culture,
+        to_char(t.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') AS created_at,
+        to_char(t.updated_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') AS updated_at,
+        COALESCE(COUNT(cl.id), 0) AS message_count,
+        COALESCE(SUM(cl.total_tokens), 0) AS total_tokens,
+        COALESCE(SUM(cl.cost_usd), 0) AS total_cost_usd,
+        MAX(cl.consultation_category) AS category
+    FROM topics t
+    LEFT JOIN consultation_logs cl ON cl.topic_id = t.id
+    WHERE t.user_id = $1
+    GROUP BY t.id
+    ORDER BY t.created_at DESC
+    LIMIT $2 OFFSET $3
+"""
 
 
 async def get_topics_by_user(user_id: int, limit: int = 50, offset: int = 0) -> List[Dict]:
@@ -311,32 +554,15 @@ async def get_topics_by_user(user_id: int, limit: int = 50, offset: int = 0) ->
 
     async with pool.acquire() as conn:
         rows = await conn.fetch(
-            """
-            SELECT
-                t.id,
-                t.session_id,
-                t.status,
-                t.culture,
-                t.created_at,
-                t.updated_at,
-                COALESCE(COUNT(cl.id), 0) AS message_count,
-                COALESCE(SUM(cl.total_tokens), 0) AS total_tokens,
-                COALESCE(SUM(cl.cost_usd), 0) AS total_cost_usd,
-                MAX(cl.consultation_category) AS category
-            FROM topics t
-            LEFT JOIN consultation_logs cl ON cl.topic_id = t.id
-            WHERE t.user_id = $1
-            GROUP BY t.id
-            ORDER BY t.created_at DESC
-            LIMIT $2 OFFSET $3
-            """,
+            _TOPICS_BY_USER_SQL,
             user_id,
             limit,
             offset,
         )
 
         topics = []
-        for row in rows:
+        for record in rows:
+            row = dict(record)
             topics.append({
                 "id": row["id"],
                 "session_id": row["session_id"],
@@ -346,155 +572,280 @@ async def get_topics_by_user(user_id: int, limit: int = 50, offset: int = 0) ->
                 "message_count": row["message_count"],
                 "total_tokens": row["total_tokens"],
                 "total_cost_usd": float(row["total_cost_usd"]) if row["total_cost_usd"] else 0,
-                "created_at": row["created_at"].isoformat() if row["created_at"] else None,
-                "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None,
+                "created_at": row["created_at"],
+                "updated_at": row["updated_at"],
             })
 
         return topics
 
 
-async def get_logs_by_topic(topic_id: int) -> Dict[str, Any]:
+_TOPIC_INFO_SQL = """
+    SELECT
+        t.id,
+        t.session_id,
+        t.status,
+        t.culture,
+        to_char(t.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') AS created_at,
+        to_char(t.updated_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') AS updated_at,
+        u.username,
+        u.first_name,
+        u.telegram_user_id
+    FROM topics t
+    JOIN users u ON u.id = t.user_id
+    WHERE t.id = $1
+"""
+
+# Даты форматируются в ISO строку на стороне PostgreSQL (to_char),
+# ORDER BY ссылается на колонку таблицы, а не на текстовый алиас.
+_TOPIC_LOGS_SQL = """
+    SELECT
+        id, user_message, bot_response, system_prompt,
+        rag_snippets, llm_params,
+        prompt_tokens, completion_tokens, total_tokens,
+        cost_usd, latency_ms,
+        consultation_category, culture,
+        to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') AS created_at,
+        composed_question,
+        embedding_tokens, embedding_cost_usd, embedding_model,
+        COALESCE(compose_cost_usd, 0) AS compose_cost_usd,
+        COALESCE(compose_tokens, 0) AS compose_tokens,
+        COALESCE(classification_cost_usd, 0) AS classification_cost_usd,
+        COALESCE(classification_tokens, 0) AS classification_tokens
+    FROM consultation_logs
+    WHERE topic_id = $1
+    ORDER BY consultation_logs.created_at ASC
+"""
+
+_LOG_BY_ID_SQL = _TOPIC_LOGS_SQL.replace(
+    "WHERE topic_id = $1\n    ORDER BY consultation_logs.created_at ASC", "WHERE id = $1"
+)
+
+_TOPIC_MESSAGES_SQL = """
+    SELECT id, direction, text,
+           to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') AS created_at
+    FROM messages
+    WHERE topic_id = $1
+    ORDER BY messages.created_at ASC
+"""
+
+# Страницы для потоковой выдачи топика (iter_topic_logs/iter_topic_messages):
+# keyset по (created_at, id). $2/$3 — id и created_at последней строки
+# предыдущей страницы (NULL для первой), $4 — размер страницы. Исходный
+# created_at возвращается колонкой sort_created_at — ключ следующей страницы.
+_TOPIC_LOGS_PAGE_SQL = """
+    SELECT
+        id, user_message, bot_response, system_prompt,
+        rag_snippets, llm_params,
+        prompt_tokens, completion_tokens, total_tokens,
+        cost_usd, latency_ms,
+        consultation_category, culture,
+        to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') AS created_at,
+        consultation_logs.created_at AS sort_created_at,
+        composed_question,
+        embedding_tokens, embedding_cost_usd, embedding_model,
+        COALESCE(compose_cost_usd, 0) AS compose_cost_usd,
+        COALESCE(compose_tokens, 0) AS compose_tokens,
+        COALESCE(classification_cost_usd, 0) AS classification_cost_usd,
+        COALESCE(classification_tokens, 0) AS classification_tokens
+    FROM consultation_logs
+    WHERE topic_id = $1
+      AND ($2::bigint IS NULL OR (consultation_logs.created_at, consultation_logs.id) > ($3, $2))
+    ORDER BY consultation_logs.created_at ASC, consultation_logs.id ASC
+    LIMIT $4
+"""
+
+_TOPIC_MESSAGES_PAGE_SQL = """
+    SELECT id, direction, text,
+           to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') AS created_at,
+           messages.created_at AS sort_created_at
+    FROM messages
+    WHERE topic_id = $1
+      AND ($2::bigint IS NULL OR (messages.created_at, messages.id) > ($3, $2))
+    ORDER BY messages.created_at ASC, messages.id ASC
+    LIMIT $4
+"""
+
+
+def _topic_row_to_dict(row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "session_id": row["session_id"],
+        "status": row["status"],
+        "culture": row["culture"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+        "user": {
+            "username": row["username"],
+            "first_name": row["first_name"],
+            "telegram_user_id": row["telegram_user_id"],
+        },
+    }
+
+
+def _topic_log_to_dict(record, raw_json: bool) -> Dict[str, Any]:
+    row = dict(record)
+    # Парсим JSONB поля (asyncpg может вернуть строку)
+    rag_snippets = row["rag_snippets"]
+    llm_params = row["llm_params"]
+    if raw_json:
+        # Отдаём JSON-текст как есть — без разбора и повторной сериализации
+        rag_snippets = rag_snippets or "[]"
+        llm_params = llm_params or "{}"
+    else:
+        if isinstance(rag_snippets, str):
+            rag_snippets = json.loads(rag_snippets) if rag_snippets else []
+        elif rag_snippets is None:
+            rag_snippets = []
+
+        if isinstance(llm_params, str):
+            llm_params = json.loads(llm_params) if llm_params else {}
+        elif llm_params is None:
+            llm_params = {}
+
+    # Вычисляем llm_cost_usd как разницу между общей стоимостью и отдельными компонентами
+    cost_usd = float(row["cost_usd"]) if row["cost_usd"] else 0
+    embedding_cost_usd = float(row["embedding_cost_usd"]) if row["embedding_cost_usd"] else 0
+    compose_cost_usd = float(row["compose_cost_usd"]) if row["compose_cost_usd"] else 0
+    classification_cost_usd = float(row["classification_cost_usd"]) if row["classification_cost_usd"] else 0
+    llm_cost_usd = max(0, cost_usd - embedding_cost_usd - compose_cost_usd - classification_cost_usd)
+
+    return {
+        "id": row["id"],
+        "user_message": row["user_message"],
+        "bot_response": row["bot_response"],
+        "system_prompt": row["system_prompt"],
+        "rag_snippets": rag_snippets,
+        "llm_params": llm_params,
+        "prompt_tokens": row["prompt_tokens"],
+        "completion_tokens": row["completion_tokens"],
+        "total_tokens": row["total_tokens"],
+        "cost_usd": cost_usd,
+        "latency_ms": row["latency_ms"],
+        "consultation_category": row["consultation_category"],
+        "culture": row["culture"],
+        "created_at": row["created_at"],
+        "composed_question": row["composed_question"],
+        # Детализация стоимости и токенов по шагам
+        "embedding_tokens": row["embedding_tokens"] or 0,
+        "embedding_cost_usd": embedding_cost_usd,
+        "embedding_model": row["embedding_model"],
+        "compose_cost_usd": compose_cost_usd,
+        "compose_tokens": row["compose_tokens"] or 0,
+        "classification_cost_usd": classification_cost_usd,
+        "classification_tokens": row["classification_tokens"] or 0,
+        "llm_cost_usd": llm_cost_usd,
+    }
+
+
+def _topic_message_to_dict(row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "direction": row["direction"],
+        "text": row["text"],
+        "created_at": row["created_at"],
+    }
+
+
+async def get_logs_by_topic(topic_id: int, raw_json: bool = False) -> Dict[str, Any]:
     """
     Возвращает полный лог консультации по топику.
 
+    Для длинных консультаций HTTP-слой использует потоковые
+    get_topic_info + iter_topic_logs + iter_topic_messages.
+
+    Параметры:
+        topic_id: ID топика
+        raw_json: если True, rag_snippets/llm_params возвращаются как JSON-текст
+            из БД без json.loads — HTTP-слой вставляет их в ответ как есть
+
     Результат:
         {
             "topic": {...},
             "logs": [...]
         }
     """
-    pool = get_pool()
+    # Топик, его логи и переписка запрашиваются параллельно на разных
+    # соединениях пула: для несуществующего топика логи и сообщения
+    # просто пустые.
+    topic_row, log_rows, message_rows = await asyncio.gather(
+        _fetchrow(_TOPIC_INFO_SQL, topic_id),
+        _fetch(_TOPIC_LOGS_SQL, topic_id),
+        _fetch(_TOPIC_MESSAGES_SQL, topic_id),
+    )
 
-    async with pool.acquire() as conn:
-        # Получаем информацию о топике
-        topic_row = await conn.fetchrow(
-            """
-            SELECT
-                t.id,
-                t.session_id,
-                t.status,
-                t.culture,
-                t.created_at,
-                t.updated_at,
-                u.username,
-                u.first_name,
-                u.telegram_user_id
-            FROM topics t
-            JOIN users u ON u.id = t.user_id
-            WHERE t.id = $1
-            """,
-            topic_id,
-        )
+    if not topic_row:
+        return {"topic": None, "logs": []}
 
-        if not topic_row:
-            return {"topic": None, "logs": []}
-
-        topic = {
-            "id": topic_row["id"],
-            "session_id": topic_row["session_id"],
-            "status": topic_row["status"],
-            "culture": topic_row["culture"],
-            "created_at": topic_row["created_at"].isoformat() if topic_row["created_at"] else None,
-            "updated_at": topic_row["updated_at"].isoformat() if topic_row["updated_at"] else None,
-            "user": {
-                "username": topic_row["username"],
-                "first_name": topic_row["first_name"],
-                "telegram_user_id": topic_row["telegram_user_id"],
-            },
-        }
+    topic = _topic_row_to_dict(topic_row)
+    logs = [_topic_log_to_dict(record, raw_json) for record in log_rows]
+    messages = [_topic_message_to_dict(record) for record in message_rows]
 
-        # Получаем логи консультации
-        log_rows = await conn.fetch(
-            """
-            SELECT
-                id, user_message, bot_response, system_prompt,
-                rag_snippets, llm_params,
-                prompt_tokens, completion_tokens, total_tokens,
-                cost_usd, latency_ms,
-                consultation_category, culture, created_at,
-                composed_question,
-                embedding_tokens, embedding_cost_usd, embedding_model,
-                COALESCE(compose_cost_usd, 0) AS compose_cost_usd,
-                COALESCE(compose_tokens, 0) AS compose_tokens,
-                COALESCE(classification_cost_usd, 0) AS classification_cost_usd,
-                COALESCE(classification_tokens, 0) AS classification_tokens
-            FROM consultation_logs
-            WHERE topic_id = $1
-            ORDER BY created_at ASC
-            """,
-            topic_id,
-        )
+    return {"topic": topic, "logs": logs, "messages": messages}
 
-        logs = []
-        for row in log_rows:
-            # Парсим JSONB поля (asyncpg может вернуть строку)
-            rag_snippets = row["rag_snippets"]
-            if isinstance(rag_snippets, str):
-                rag_snippets = json.loads(rag_snippets) if rag_snippets else []
-            elif rag_snippets is None:
-                rag_snippets = []
-
-            llm_params = row["llm_params"]
-            if isinstance(llm_params, str):
-                llm_params = json.loads(llm_params) if llm_params else {}
-            elif llm_params is None:
-                llm_params = {}
-
-            # Вычисляем llm_cost_usd как разницу между общей стоимостью и отдельными компонентами
-            cost_usd = float(row["cost_usd"]) if row["cost_usd"] else 0
-            embedding_cost_usd = float(row["embedding_cost_usd"]) if row["embedding_cost_usd"] else 0
-            compose_cost_usd = float(row["compose_cost_usd"]) if row["compose_cost_usd"] else 0
-            classification_cost_usd = float(row["classification_cost_usd"]) if row["classification_cost_usd"] else 0
-            llm_cost_usd = max(0, cost_usd - embedding_cost_usd - compose_cost_usd - classification_cost_usd)
-
-            logs.append({
-                "id": row["id"],
-                "user_message": row["user_message"],
-                "bot_response": row["bot_response"],
-                "system_prompt": row["system_prompt"],
-                "rag_snippets": rag_snippets,
-                "llm_params": llm_params,
-                "prompt_tokens": row["prompt_tokens"],
-                "completion_tokens": row["completion_tokens"],
-                "total_tokens": row["total_tokens"],
-                "cost_usd": cost_usd,
-                "latency_ms": row["latency_ms"],
-                "consultation_category": row["consultation_category"],
-                "culture": row["culture"],
-                "created_at": row["created_at"].isoformat() if row["created_at"] else None,
-                "composed_question": row["composed_question"],
-                # Детализация стоимости и токенов по шагам
-                "embedding_tokens": row["embedding_tokens"] or 0,
-                "embedding_cost_usd": embedding_cost_usd,
-                "embedding_model": row["embedding_model"],
-                "compose_cost_usd": compose_cost_usd,
-                "compose_tokens": row["compose_tokens"] or 0,
-                "classification_cost_usd": classification_cost_usd,
-                "classification_tokens": row["classification_tokens"] or 0,
-                "llm_cost_usd": llm_cost_usd,
-            })
 
-        # Получаем все сообщения топика (переписку)
-        message_rows = await conn.fetch(
-            """
-            SELECT id, direction, text, created_at
-            FROM messages
-            WHERE topic_id = $1
-            ORDER BY created_at ASC
-            """,
-            topic_id,
-        )
+async def get_log_by_id(log_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Возвращает полный лог консультации по id или None.
 
-        messages = []
-        for row in message_rows:
-            messages.append({
-                "id": row["id"],
-                "direction": row["direction"],
-                "text": row["text"],
-                "created_at": row["created_at"].isoformat() if row["created_at"] else None,
-            })
+    Используется live feed для догрузки полного текста, когда в ленте
+    пришло только превью (см. _FEED_PREVIEW_CHARS).
+    """
+    row = await _fetchrow(_LOG_BY_ID_SQL, log_id)
+    return _topic_log_to_dict(row, raw_json=False) if row else None
 
-        return {"topic": topic, "logs": logs, "messages": messages}
+
+async def get_topic_info(topic_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Возвращает информацию о топике (с пользователем) или None.
+    """
+    row = await _fetchrow(_TOPIC_INFO_SQL, topic_id)
+    return _topic_row_to_dict(row) if row else None
+
+
+async def _iter_topic_pages(sql: str, topic_id: int, page_size: int) -> AsyncIterator[Any]:
+    """
+    Отдаёт строки топика страницами по page_size (keyset по created_at, id).
+
+    Соединение пула берётся только на время выборки страницы и возвращается
+    до того, как строки уходят вызывающему: медленный или зависший клиент
+    не держит соединение, а брошенный генератор ничего не удерживает.
+    """
+    last_id = None
+    last_created_at = None
+    while True:
+        rows = await _fetch(sql, topic_id, last_id, last_created_at, page_size)
+        for record in rows:
+            yield record
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+        last_created_at = rows[-1]["sort_created_at"]
+
+
+async def iter_topic_logs(
+    topic_id: int,
+    raw_json: bool = False,
+    page_size: int = 100,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Потоково отдаёт логи консультации по топику страницами.
+
+    В памяти держится не больше page_size строк, первые логи уходят
+    клиенту, не дожидаясь выборки всего топика.
+    """
+    async for record in _iter_topic_pages(_TOPIC_LOGS_PAGE_SQL, topic_id, page_size):
+        yield _topic_log_to_dict(record, raw_json)
+
+
+async def iter_topic_messages(
+    topic_id: int,
+    page_size: int = 100,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Потоково отдаёт сообщения топика (переписку) страницами.
+    """
+    async for record in _iter_topic_pages(_TOPIC_MESSAGES_PAGE_SQL, topic_id, page_size):
+        yield _topic_message_to_dict(record)
 
 
 async def get_logs_since_id(
@@ -516,77 +867,29 @@ async def get_logs_since_id(
 
     async with pool.acquire() as conn:
         if topic_id:
-            rows = await conn.fetch(
-                """
-                SELECT
-                    cl.id, cl.user_id, cl.topic_id,
-                    cl.user_message, cl.bot_response,
-                    cl.prompt_tokens, cl.completion_tokens, cl.total_tokens,
-                    cl.cost_usd, cl.latency_ms,
-                    cl.consultation_category, cl.culture, cl.created_at,
-                    u.username, u.first_name, u.telegram_user_id
-                FROM consultation_logs cl
-                JOIN users u ON u.id = cl.user_id
-                WHERE cl.id > $1 AND cl.topic_id = $2
-                ORDER BY cl.id ASC
-                LIMIT $3
-                """,
+            logs_json = await conn.fetchval(
+                _LOGS_SINCE_ID_BY_TOPIC_SQL,
                 since_id,
                 topic_id,
                 limit,
             )
         else:
-            rows = await conn.fetch(
-                """
-                SELECT
-                    cl.id, cl.user_id, cl.topic_id,
-                    cl.user_message, cl.bot_response,
-                    cl.prompt_tokens, cl.completion_tokens, cl.total_tokens,
-                    cl.cost_usd, cl.latency_ms,
-                    cl.consultation_category, cl.culture, cl.created_at,
-                    u.username, u.first_name, u.telegram_user_id
-                FROM consultation_logs cl
-                JOIN users u ON u.id = cl.user_id
-                WHERE cl.id > $1
-                ORDER BY cl.id ASC
-                LIMIT $2
-                """,
+            logs_json = await conn.fetchval(
+                _LOGS_SINCE_ID_SQL,
                 since_id,
                 limit,
             )
 
-        logs = []
-        for row in rows:
-            logs.append({
-                "id": row["id"],
-                "user_id": row["user_id"],
-                "topic_id": row["topic_id"],
-                "user_message": row["user_message"],
-                "bot_response": row["bot_response"],
-                "prompt_tokens": row["prompt_tokens"],
-                "completion_tokens": row["completion_tokens"],
-                "total_tokens": row["total_tokens"],
-                "cost_usd": float(row["cost_usd"]) if row["cost_usd"] else 0,
-                "latency_ms": row["latency_ms"],
-                "consultation_category": row["consultation_category"],
-                "culture": row["culture"],
-                "created_at": row["created_at"].isoformat() if row["created_at"] else None,
-                "user": {
-                    "username": row["username"],
-                    "first_name": row["first_name"],
-                    "telegram_user_id": row["telegram_user_id"],
-                },
-            })
-
-        return logs
+        return json.loads(logs_json)
 
 
 async def get_recent_logs(
     limit: int = 50,
     since_id: Optional[int] = None,
-) -> List[Dict]:
+) -> str:
     """
-    Возвращает последние логи консультаций (для live feed).
+    Возвращает последние логи консультаций (для live feed)
+    готовым JSON-массивом (текст), который HTTP-слой отдаёт без пересериализации.
 
     Параметры:
         limit: максимальное количество записей
@@ -596,290 +899,218 @@ async def get_recent_logs(
 
     async with pool.acquire() as conn:
         if since_id:
-            rows = await conn.fetch(
-                """
-                SELECT
-                    cl.id, cl.user_id, cl.topic_id,
-                    cl.user_message, cl.bot_response,
-                    cl.prompt_tokens, cl.completion_tokens, cl.total_tokens,
-                    cl.cost_usd, cl.latency_ms,
-                    cl.consultation_category, cl.culture, cl.created_at,
-                    u.username, u.first_name, u.telegram_user_id
-                FROM consultation_logs cl
-                JOIN users u ON u.id = cl.user_id
-                WHERE cl.id > $1
-                ORDER BY cl.id ASC
-                LIMIT $2
-                """,
+            logs_json = await conn.fetchval(
+                _LOGS_SINCE_ID_SQL,
                 since_id,
                 limit,
             )
         else:
-            rows = await conn.fetch(
-                """
-                SELECT
-                    cl.id, cl.user_id, cl.topic_id,
-                    cl.user_message, cl.bot_response,
-                    cl.prompt_tokens, cl.completion_tokens, cl.total_tokens,
-                    cl.cost_usd, cl.latency_ms,
-                    cl.consultation_category, cl.culture, cl.created_at,
-                    u.username, u.first_name, u.telegram_user_id
-                FROM consultation_logs cl
-                JOIN users u ON u.id = cl.user_id
-                ORDER BY cl.created_at DESC
-                LIMIT $1
-                """,
+            logs_json = await conn.fetchval(
+                _RECENT_LOGS_SQL,
                 limit,
             )
 
-        logs = []
-        for row in rows:
-            logs.append({
-                "id": row["id"],
-                "user_id": row["user_id"],
-                "topic_id": row["topic_id"],
-                "user_message": row["user_message"],
-                "bot_response": row["bot_response"],
-                "prompt_tokens": row["prompt_tokens"],
-                "completion_tokens": row["completion_tokens"],
-                "total_tokens": row["total_tokens"],
-                "cost_usd": float(row["cost_usd"]) if row["cost_usd"] else 0,
-                "latency_ms": row["latency_ms"],
-                "consultation_category": row["consultation_category"],
-                "culture": row["culture"],
-                "created_at": row["created_at"].isoformat() if row["created_at"] else None,
-                "user": {
-                    "username": row["username"],
-                    "first_name": row["first_name"],
-                    "telegram_user_id": row["telegram_user_id"],
-                },
-            })
+        return logs_json
 
-        return logs
 
+# Период статистики -> сколько дней назад от сегодняшней даты начинается выборка.
+# Граница считается в SQL от CURRENT_DATE (та же дата, что и у "сегодня" и у
+# дневных итогов consultation_totals), а количество дней передаётся параметром
+# $1, поэтому текст SQL один для всех периодов и план кэшируется, а условие
+# created_at >= граница без OR позволяет использовать индексы по дате.
+# Для 'all' передаётся NULL — граница становится '-infinity'.
+_PERIOD_DAYS = {"day": 0, "week": 7, "month": 30}
 
-async def get_stats_summary(period: str = "all") -> Dict[str, Any]:
-    """
-    Возвращает общую статистику по консультациям.
 
-    Параметры:
-        period: 'day' | 'week' | 'month' | 'all'
-    """
-    pool = get_pool()
+def _period_days(period: str) -> Optional[int]:
+    return _PERIOD_DAYS.get(period)
 
-    # Определяем фильтр по периоду
-    period_filter = ""
-    if period == "day":
-        period_filter = "WHERE cl.created_at >= CURRENT_DATE"
-    elif period == "week":
-        period_filter = "WHERE cl.created_at >= CURRENT_DATE - INTERVAL '7 days'"
-    elif period == "month":
-        period_filter = "WHERE cl.created_at >= CURRENT_DATE - INTERVAL '30 days'"
 
-    async with pool.acquire() as conn:
-        # Общая статистика
-        overview_row = await conn.fetchrow(
-            f"""
-            SELECT
-                COUNT(*) AS total_consultations,
-                COALESCE(SUM(total_tokens), 0) AS total_tokens,
-                COALESCE(SUM(cost_usd), 0) AS total_cost_usd,
-                COALESCE(AVG(latency_ms), 0) AS avg_latency_ms
-            FROM consultation_logs cl
-            {period_filter}
-            """
-        )
-
-        # Статистика за сегодня
-        today_row = await conn.fetchrow(
-            """
-            SELECT
-                COUNT(*) AS consultations,
-                COALESCE(SUM(total_tokens), 0) AS tokens,
-                COALESCE(SUM(cost_usd), 0) AS cost_usd
-            FROM consultation_logs
-            WHERE created_at >= CURRENT_DATE
-            """
-        )
+_STATS_OVERVIEW_SQL = """
+    SELECT
+        COALESCE(SUM(ct.consultations), 0)::bigint AS total_consultations,
+        COALESCE(SUM(ct.tokens), 0)::bigint AS total_tokens,
+        COALESCE(SUM(ct.cost_usd), 0) AS total_cost_usd,
+        COALESCE(SUM(ct.latency_ms_sum) / NULLIF(SUM(ct.latency_ms_count), 0), 0) AS avg_latency_ms
+    FROM consultation_totals ct
+    WHERE ct.bucket >= COALESCE(CURRENT_DATE - $1::int, '-infinity'::date)
+"""
 
-        # Топ культур
-        culture_rows = await conn.fetch(
-            f"""
-            SELECT culture, COUNT(*) AS count
-            FROM consultation_logs cl
-            {period_filter}
-            {"AND" if period_filter else "WHERE"} culture IS NOT NULL
-            GROUP BY culture
-            ORDER BY count DESC
-            LIMIT 10
-            """
-        )
+# Строк за день несколько (шарды, schema_23) — суммируем; без записей за
+# сегодня SUM возвращает NULL, что обрабатывается как 0
+_STATS_TODAY_SQL = """
+    SELECT
+        SUM(consultations)::bigint AS consultations,
+        SUM(tokens)::bigint AS tokens,
+        SUM(cost_usd) AS cost_usd
+    FROM consultation_totals
+    WHERE bucket = CURRENT_DATE
+"""
 
-        # Топ категорий
-        category_rows = await conn.fetch(
-            f"""
-            SELECT consultation_category AS category, COUNT(*) AS count
-            FROM consultation_logs cl
-            {period_filter}
-            {"AND" if period_filter else "WHERE"} consultation_category IS NOT NULL
-            GROUP BY consultation_category
-            ORDER BY count DESC
-            LIMIT 10
-            """
-        )
+_STATS_BY_CULTURE_SQL = """
+    SELECT culture, COUNT(*) AS count
+    FROM consultation_logs cl
+    WHERE cl.created_at >= COALESCE(CURRENT_DATE - $1::int, '-infinity'::date)
+      AND culture IS NOT NULL
+    GROUP BY culture
+    ORDER BY count DESC
+    LIMIT 10
+"""
 
-        return {
-            "overview": {
-                "total_consultations": overview_row["total_consultations"] if overview_row else 0,
-                "total_tokens": overview_row["total_tokens"] if overview_row else 0,
-                "total_cost_usd": float(overview_row["total_cost_usd"]) if overview_row and overview_row["total_cost_usd"] else 0,
-                "avg_latency_ms": int(overview_row["avg_latency_ms"]) if overview_row and overview_row["avg_latency_ms"] else 0,
-            },
-            "today": {
-                "consultations": today_row["consultations"] if today_row else 0,
-                "tokens": today_row["tokens"] if today_row else 0,
-                "cost_usd": float(today_row["cost_usd"]) if today_row and today_row["cost_usd"] else 0,
-            },
-            "by_culture": [
-                {"culture": row["culture"], "count": row["count"]}
-                for row in culture_rows
-            ],
-            "by_category": [
-                {"category": row["category"], "count": row["count"]}
-                for row in category_rows
-            ],
-        }
+_STATS_BY_CATEGORY_SQL = """
+    SELECT consultation_category AS category, COUNT(*) AS count
+    FROM consultation_logs cl
+    WHERE cl.created_at >= COALESCE(CURRENT_DATE - $1::int, '-infinity'::date)
+      AND consultation_category IS NOT NULL
+    GROUP BY consultation_category
+    ORDER BY count DESC
+    LIMIT 10
+"""
 
 
-async def get_embedding_stats(period: str = "all") -> Dict[str, Any]:
+async def get_stats_summary(period: str = "all") -> Dict[str, Any]:
     """
-    Возвращает статистику по embeddings (документы + консультации).
+    Возвращает общую статистику по консультациям.
 
     Параметры:
         period: 'day' | 'week' | 'month' | 'all'
     """
-    pool = get_pool()
-
-    # Определяем фильтр по периоду
-    period_filter = ""
-    if period == "day":
-        period_filter = "WHERE created_at >= CURRENT_DATE"
-    elif period == "week":
-        period_filter = "WHERE created_at >= CURRENT_DATE - INTERVAL '7 days'"
-    elif period == "month":
-        period_filter = "WHERE created_at >= CURRENT_DATE - INTERVAL '30 days'"
-
-    async with pool.acquire() as conn:
-        # Статистика embeddings консультаций
-        consultations_row = await conn.fetchrow(
-            f"""
-            SELECT
-                COALESCE(SUM(embedding_tokens), 0) AS tokens,
-                COALESCE(SUM(embedding_cost_usd), 0) AS cost_usd
-            FROM consultation_logs
-            {period_filter}
-            """
-        )
-
-        # Статистика embeddings документов
-        docs_period_filter = period_filter.replace("created_at", "d.created_at") if period_filter else ""
-        documents_row = await conn.fetchrow(
-            f"""
-            SELECT
-                COALESCE(SUM(embedding_tokens), 0) AS tokens,
-                COALESCE(SUM(embedding_cost_usd), 0) AS cost_usd
-            FROM documents d
-            WHERE processing_status = 'completed'
-            {"AND d.created_at >= CURRENT_DATE" if period == "day" else ""}
-            {"AND d.created_at >= CURRENT_DATE - INTERVAL '7 days'" if period == "week" else ""}
-            {"AND d.created_at >= CURRENT_DATE - INTERVAL '30 days'" if period == "month" else ""}
-            """
-        )
+    days = _period_days(period)
+
+    # Общая статистика — из дневных итогов consultation_totals (schema_16),
+    # а не полным сканированием consultation_logs
+    overview_row_query = _fetchrow(
+        _STATS_OVERVIEW_SQL,
+        days,
+    )
+
+    # Статистика за сегодня
+    today_row_query = _fetchrow(
+        _STATS_TODAY_SQL
+    )
+
+    # Топ культур
+    culture_rows_query = _fetch(
+        _STATS_BY_CULTURE_SQL,
+        days,
+    )
+
+    # Топ категорий
+    category_rows_query = _fetch(
+        _STATS_BY_CATEGORY_SQL,
+        days,
+    )
+
+    # Запросы независимы — выполняем их параллельно на разных соединениях пула
+    overview_row, today_row, culture_rows, category_rows = await asyncio.gather(
+        overview_row_query, today_row_query, culture_rows_query, category_rows_query
+    )
+
+    return {
+        "overview": {
+            "total_consultations": overview_row["total_consultations"] if overview_row else 0,
+            "total_tokens": overview_row["total_tokens"] if overview_row else 0,
+            "total_cost_usd": float(overview_row["total_cost_usd"]) if overview_row and overview_row["total_cost_usd"] else 0,
+            "avg_latency_ms": int(overview_row["avg_latency_ms"]) if overview_row and overview_row["avg_latency_ms"] else 0,
+        },
+        "today": {
+            "consultations": (today_row["consultations"] or 0) if today_row else 0,
+            "tokens": (today_row["tokens"] or 0) if today_row else 0,
+            "cost_usd": float(today_row["cost_usd"]) if today_row and today_row["cost_usd"] else 0,
+        },
+        "by_culture": [
+            {"culture": row["culture"], "count": row["count"]}
+            for row in culture_rows
+        ],
+        "by_category": [
+            {"category": row["category"], "count": row["count"]}
+            for row in category_rows
+        ],
+    }
+
+
+# Вся статистика embeddings — одним запросом (один round trip): консультации и
+# документы агрегируются по модели один раз, из этих же групп считаются итоги
+# (включая строки без модели), а разбивка по моделям (FULL OUTER JOIN по модели,
+# сортировка по стоимости) возвращается JSON-массивом в той же строке.
+_EMBEDDING_STATS_SQL = """
+    WITH c AS (
+        SELECT
+            embedding_model AS model,
+            SUM(embedding_tokens) AS tokens,
+            SUM(embedding_cost_usd) AS cost_usd
+        FROM consultation_logs
+        WHERE created_at >= COALESCE(CURRENT_DATE - $1::int, '-infinity'::date)
+        GROUP BY embedding_model
+    ),
+    d AS (
+        SELECT
+            embedding_model AS model,
+            SUM(embedding_tokens) AS tokens,
+            SUM(embedding_cost_usd) AS cost_usd
+        FROM documents
+        WHERE processing_status = 'completed'
+          AND created_at >= COALESCE(CURRENT_DATE - $1::int, '-infinity'::date)
+        GROUP BY embedding_model
+    ),
+    m AS (
+        SELECT
+            model,
+            COALESCE(c.tokens, 0)::bigint AS consultations_tokens,
+            COALESCE(c.cost_usd, 0)::float8 AS consultations_cost_usd,
+            COALESCE(d.tokens, 0)::bigint AS documents_tokens,
+            COALESCE(d.cost_usd, 0)::float8 AS documents_cost_usd,
+            (COALESCE(c.tokens, 0) + COALESCE(d.tokens, 0))::bigint AS total_tokens,
+            (COALESCE(c.cost_usd, 0) + COALESCE(d.cost_usd, 0))::float8 AS total_cost_usd
+        FROM c
+        FULL OUTER JOIN d USING (model)
+        WHERE model IS NOT NULL
+    )
+    SELECT
+        (SELECT COALESCE(SUM(tokens), 0) FROM c)::bigint AS consultations_tokens,
+        (SELECT COALESCE(SUM(cost_usd), 0) FROM c)::float8 AS consultations_cost_usd,
+        (SELECT COALESCE(SUM(tokens), 0) FROM d)::bigint AS documents_tokens,
+        (SELECT COALESCE(SUM(cost_usd), 0) FROM d)::float8 AS documents_cost_usd,
+        (
+            SELECT COALESCE(json_agg(m ORDER BY m.total_cost_usd DESC), '[]'::json)
+            FROM m
+        )::text AS by_model
+"""
 
-        # Статистика по моделям (консультации)
-        by_model_consultations = await conn.fetch(
-            f"""
-            SELECT
-                embedding_model AS model,
-                COALESCE(SUM(embedding_tokens), 0) AS tokens,
-                COALESCE(SUM(embedding_cost_usd), 0) AS cost_usd
-            FROM consultation_logs
-            {period_filter}
-            {"AND" if period_filter else "WHERE"} embedding_model IS NOT NULL
-            GROUP BY embedding_model
-            ORDER BY cost_usd DESC
-            """
-        )
 
-        # Статистика по моделям (документы)
-        by_model_documents = await conn.fetch(
-            f"""
-            SELECT
-                embedding_model AS model,
-                COALESCE(SUM(embedding_tokens), 0) AS tokens,
-                COALESCE(SUM(embedding_cost_usd), 0) AS cost_usd
-            FROM documents
-            WHERE processing_status = 'completed' AND embedding_model IS NOT NULL
-            {"AND created_at >= CURRENT_DATE" if period == "day" else ""}
-            {"AND created_at >= CURRENT_DATE - INTERVAL '7 days'" if period == "week" else ""}
-            {"AND created_at >= CURRENT_DATE - INTERVAL '30 days'" if period == "month" else ""}
-            GROUP BY embedding_model
-            ORDER BY cost_usd DESC
-            """
-        )
+async def get_embedding_stats(period: str = "all") -> Dict[str, Any]:
+    """
+    Возвращает статистику по embeddings (документы + консультации).
 
-        # Объединяем статистику по моделям
-        model_stats = {}
-        for row in by_model_consultations:
-            model = row["model"]
-            model_stats[model] = {
-                "model": model,
-                "consultations_tokens": row["tokens"],
-                "consultations_cost_usd": float(row["cost_usd"]) if row["cost_usd"] else 0,
-                "documents_tokens": 0,
-                "documents_cost_usd": 0,
-            }
-        for row in by_model_documents:
-            model = row["model"]
-            if model in model_stats:
-                model_stats[model]["documents_tokens"] = row["tokens"]
-                model_stats[model]["documents_cost_usd"] = float(row["cost_usd"]) if row["cost_usd"] else 0
-            else:
-                model_stats[model] = {
-                    "model": model,
-                    "consultations_tokens": 0,
-                    "consultations_cost_usd": 0,
-                    "documents_tokens": row["tokens"],
-                    "documents_cost_usd": float(row["cost_usd"]) if row["cost_usd"] else 0,
-                }
-
-        # Добавляем total для каждой модели
-        by_model = []
-        for model, stats in model_stats.items():
-            stats["total_tokens"] = stats["consultations_tokens"] + stats["documents_tokens"]
-            stats["total_cost_usd"] = stats["consultations_cost_usd"] + stats["documents_cost_usd"]
-            by_model.append(stats)
-
-        # Сортируем по общей стоимости
-        by_model.sort(key=lambda x: x["total_cost_usd"], reverse=True)
-
-        consultations_tokens = consultations_row["tokens"] if consultations_row else 0
-        consultations_cost = float(consultations_row["cost_usd"]) if consultations_row and consultations_row["cost_usd"] else 0
-        documents_tokens = documents_row["tokens"] if documents_row else 0
-        documents_cost = float(documents_row["cost_usd"]) if documents_row and documents_row["cost_usd"] else 0
-
-        return {
-            "consultations": {
-                "tokens": consultations_tokens,
-                "cost_usd": consultations_cost,
-            },
-            "documents": {
-                "tokens": documents_tokens,
-                "cost_usd": documents_cost,
-            },
-            "total": {
-                "tokens": consultations_tokens + documents_tokens,
-                "cost_usd": consultations_cost + documents_cost,
-            },
-            "by_model": by_model,
-        }
+    Параметры:
+        period: 'day' | 'week' | 'month' | 'all'
+    """
+    row = await _fetchrow(_EMBEDDING_STATS_SQL, _period_days(period))
+
+    consultations_tokens = row["consultations_tokens"]
+    consultations_cost = row["consultations_cost_usd"]
+    documents_tokens = row["documents_tokens"]
+    documents_cost = row["documents_cost_usd"]
+
+    return {
+        "consultations": {
+            "tokens": consultations_tokens,
+            "cost_usd": consultations_cost,
+        },
+        "documents": {
+            "tokens": documents_tokens,
+            "cost_usd": documents_cost,
+        },
+        "total": {
+            "tokens": consultations_tokens + documents_tokens,
+            "cost_usd": consultations_cost + documents_cost,
+        },
+        "by_model": json.loads(row["by_model"]),
+    }
+
+
+# Запись лога идёт на каждой консультации — запрос прогревается на
+# соединениях пула (см. pool._init_connection)
+WARMUP_SQLS = (
+    _LOG_INSERT_SQL,
+)
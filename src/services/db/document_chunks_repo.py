@@ -1,69 +1,154 @@
 # src/services/db/document_chunks_repo.py
 
+from array import array
 from typing import List, Dict, Optional
+from src.config import settings
 from src.services.db.pool import get_pool
+from src.services.db.vector_codec import normalize_vector
 
 
 # Размерность вектора (фиксированная для OpenAI embeddings)
 VECTOR_DIM = 1536  # text-embedding-3-small
 
+# С какого размера пачки chunks_bulk_insert использует COPY вместо executemany
+COPY_MIN_CHUNKS = 32
 
-def _normalize_embedding(embedding: List[float]) -> List[float]:
+# Колонки document_chunks в порядке полей записи для вставки
+_CHUNK_COLUMNS = [
+    "document_id",
+    "chunk_index",
+    "chunk_text",
+    "chunk_size",
+    "page_number",
+    "embedding",
+    "category",
+    "subcategory",
+]
+
+
+def _normalize_embedding(embedding: List[float]) -> array:
     """
     Приводит эмбеддинг к размерности VECTOR_DIM.
     """
-    if embedding is None:
-        return [0.0] * VECTOR_DIM
+    return normalize_vector(embedding, VECTOR_DIM)
 
-    emb = list(embedding)
-    n = len(emb)
 
-    if n == VECTOR_DIM:
-        return emb
-    elif n > VECTOR_DIM:
-        return emb[:VECTOR_DIM]
-    else:
-        return emb + [0.0] * (VECTOR_DIM - n)
+# В поисковых запросах ORDER BY ссылается на алиас distance: расстояние
+# считается один раз на строку, а планировщик по-прежнему сопоставляет
+# сортировку с HNSW индексом (это то же выражение из списка SELECT).
+# Фильтр активности (is_active + document_active, schema_18) совпадает с
+# условием частичных HNSW индексов, поэтому JOIN documents не нужен.
+def _search_column() -> tuple:
+    """
+    Колонка и тип для векторного поиска: FP16 embedding_half (schema_17,
+    RAG_HALFVEC_SEARCH=True) или исходная FP32 embedding.
 
+    Поиск идёт по скалярному произведению (<#>, индексы *_ip_ops из schema_21):
+    эмбеддинги нормированы в normalize_vector.
+    """
+    if settings.rag_halfvec_search:
+        return "embedding_half", "halfvec"
+    return "embedding", "vector"
 
-async def chunks_bulk_insert(chunks: List[Dict]) -> None:
+
+def _build_search_sql(extra_filter: str = "") -> str:
+    """
+    Текст поискового запроса по чанкам; extra_filter — дополнительное
+    условие WHERE (например, только приоритетные документы).
+    """
+    column, vector_type = _search_column()
+    return f"""
+        SELECT
+            id,
+            document_id,
+            chunk_text,
+            page_number,
+            subcategory,
+            -- Для нормированных векторов косинусное расстояние = 1 - скалярное произведение
+            1 + s.neg_inner_product AS distance
+        FROM (
+            SELECT
+                c.id,
+                c.document_id,
+                c.chunk_text,
+                c.page_number,
+                c.subcategory,
+                c.{column} <#> $1::{vector_type} AS neg_inner_product
+            FROM document_chunks c
+            WHERE c.is_active = TRUE
+              AND c.document_active = TRUE{extra_filter}
+            ORDER BY neg_inner_product
+            LIMIT $2
+        ) s
+        -- Порог расстояния: NULL — без ограничения
+        WHERE $3::float8 IS NULL OR 1 + s.neg_inner_product <= $3
+        ORDER BY s.neg_inner_product;
     """
-    Массовая вставка чанков в таблицу document_chunks.
 
-    Параметры:
-        chunks: Список словарей с полями:
-            - document_id: int
-            - chunk_index: int
-            - chunk_text: str
-            - chunk_size: int
-            - page_number: Optional[int]
-            - embedding: List[float]
-            - category: str
-            - subcategory: Optional[str]
+
+# Тексты запросов собираются один раз при импорте (колонка поиска задаётся
+# настройкой и во время работы не меняется): одна и та же строка на каждый
+# вызов попадает в кэш подготовленных выражений соединения asyncpg,
+# а основной запрос поиска прогревается на соединениях пула
+# (см. pool._init_connection).
+_CHUNKS_SEARCH_SQL = _build_search_sql()
+_CHUNKS_SEARCH_PRIORITY_SQL = _build_search_sql(
+    "\n              AND c.subcategory = 'приоритет'"
+)
+
+WARMUP_SQLS = (
+    _CHUNKS_SEARCH_SQL,
+)
+
+
+def chunk_record(
+    document_id: int,
+    chunk_index: int,
+    chunk_text: str,
+    chunk_size: int,
+    page_number: Optional[int],
+    embedding: List[float],
+    category: str,
+    subcategory: Optional[str],
+) -> tuple:
     """
-    if not chunks:
+    Запись чанка для chunks_insert_records: кортеж в порядке колонок
+    вставки, эмбеддинг уже нормализован (уходит в бинарном формате, см. vector_codec).
+    """
+    return (
+        document_id,
+        chunk_index,
+        chunk_text,
+        chunk_size,
+        page_number,
+        _normalize_embedding(embedding),
+        category,
+        subcategory,
+    )
+
+
+async def chunks_insert_records(records: List[tuple]) -> None:
+    """
+    Массовая вставка готовых записей chunk_record в таблицу document_chunks.
+
+    Большие пачки (от COPY_MIN_CHUNKS) загружаются через бинарный COPY:
+    одна проверка прав/парсинг на всю пачку вместо INSERT на каждую строку.
+    Небольшие — через executemany.
+    """
+    if not records:
         return
 
     pool = get_pool()
 
-    # Подготовка данных для вставки
-    records = []
-    for chunk in chunks:
-        norm_embedding = _normalize_embedding(chunk["embedding"])
-        vector_str = "[" + ",".join(f"{x:.6f}" for x in norm_embedding) + "]"
-
-        records.append((
-            chunk["document_id"],
-            chunk["chunk_index"],
-            chunk["chunk_text"],
-            chunk["chunk_size"],
-            chunk.get("page_number"),
-            vector_str,
-            chunk["category"],
-            chunk.get("subcategory"),
-        ))
-
     async with pool.acquire() as conn:
+        if len(records) >= COPY_MIN_CHUNKS:
+            await conn.copy_records_to_table(
+                "document_chunks",
+                columns=_CHUNK_COLUMNS,
+                records=records,
+            )
+            return
+
         await conn.executemany(
             """
             INSERT INTO document_chunks (
@@ -82,6 +167,52 @@ async def chunks_bulk_insert(chunks: List[Dict]) -> None:
         )
 
 
+async def chunks_bulk_insert(chunks: List[Dict]) -> None:
+    """
+    Массовая вставка чанков в таблицу document_chunks.
+
+    Обёртка над chunks_insert_records для чанков в виде словарей.
+
+    Параметры:
+        chunks: Список словарей с полями:
+            - document_id: int
+            - chunk_index: int
+            - chunk_text: str
+            - chunk_size: int
+            - page_number: Optional[int]
+            - embedding: List[float]
+            - category: str
+            - subcategory: Optional[str]
+    """
+    await chunks_insert_records([
+        chunk_record(
+            chunk["document_id"],
+            chunk["chunk_index"],
+            chunk["chunk_text"],
+            chunk["chunk_size"],
+            chunk.get("page_number"),
+            chunk["embedding"],
+            chunk["category"],
+            chunk.get("subcategory"),
+        )
+        for chunk in chunks
+    ])
+
+
+async def chunks_delete_by_document(document_id: int) -> int:
+    """
+    Удаляет все чанки документа (откат частично загруженного документа).
+
+    Возвращает количество удалённых чанков.
+    """
+    pool = get_pool()
+    result = await pool.execute(
+        "DELETE FROM document_chunks WHERE document_id = $1",
+        document_id,
+    )
+    # result = "DELETE <n>"
+    return int(result.split()[-1])
+
 async def chunks_search(
     *,
     query_embedding: List[float],
@@ -100,33 +231,15 @@ async def chunks_search(
     pool = get_pool()
 
     norm_embedding = _normalize_embedding(query_embedding)
-    vector_str = "[" + ",".join(f"{x:.6f}" for x in norm_embedding) + "]"
 
     async with pool.acquire() as conn:
         rows = await conn.fetch(
-            """
-            SELECT
-                c.id,
-                c.document_id,
-                c.chunk_text,
-                c.page_number,
-                c.subcategory,
-                c.embedding <=> $1::vector AS distance
-            FROM document_chunks c
-            JOIN documents d ON c.document_id = d.id
-            WHERE c.is_active = TRUE
-              AND d.is_active = TRUE
-            ORDER BY c.embedding <=> $1::vector
-            LIMIT $2;
-            """,
-            vector_str,
+            _CHUNKS_SEARCH_SQL,
+            norm_embedding,
             limit,
+            distance_threshold,
         )
 
-    # Фильтрация по distance_threshold
-    if distance_threshold is not None:
-        rows = [r for r in rows if r["distance"] <= distance_threshold]
-
     return rows
 
 
@@ -145,49 +258,44 @@ async def chunks_search_priority(
     pool = get_pool()
 
     norm_embedding = _normalize_embedding(query_embedding)
-    vector_str = "[" + ",".join(f"{x:.6f}" for x in norm_embedding) + "]"
 
     async with pool.acquire() as conn:
         rows = await conn.fetch(
-            """
-            SELECT
-                c.id,
-                c.document_id,
-                c.chunk_text,
-                c.page_number,
-                c.subcategory,
-                c.embedding <=> $1::vector AS distance
-            FROM document_chunks c
-            JOIN documents d ON c.document_id = d.id
-            WHERE c.is_active = TRUE
-              AND d.is_active = TRUE
-              AND c.subcategory = 'приоритет'
-            ORDER BY c.embedding <=> $1::vector
-            LIMIT $2;
-            """,
-            vector_str,
+            _CHUNKS_SEARCH_PRIORITY_SQL,
+            norm_embedding,
             limit,
+            distance_threshold,
         )
 
-    # Фильтрация по distance_threshold
-    if distance_threshold is not None:
-        rows = [r for r in rows if r["distance"] <= distance_threshold]
-
     return rows
 
 
 async def chunks_count_by_document(document_id: int) -> int:
     """
     Возвращает количество чанков для документа.
+
+    Для обработанного документа читается documents.total_chunks
+    (записывается в document_update_status после вставки чанков) —
+    без подсчёта строк document_chunks. COUNT(*) остаётся только для
+    документов, которые ещё обрабатываются или завершились ошибкой.
     """
     pool = get_pool()
 
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             """
-            SELECT COUNT(*) as count
-            FROM document_chunks
-            WHERE document_id = $1;
+            SELECT
+                CASE
+                    WHEN d.processing_status = 'completed' AND d.total_chunks IS NOT NULL
+                        THEN d.total_chunks
+                    ELSE (
+                        SELECT COUNT(*)
+                        FROM document_chunks c
+                        WHERE c.document_id = d.id
+                    )
+                END AS count
+            FROM documents d
+            WHERE d.id = $1;
             """,
             document_id,
         )
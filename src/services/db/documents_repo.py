@@ -1,9 +1,29 @@
 # src/services/db/documents_repo.py
 
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from src.services.db.pool import get_pool
 
 
+_DOCUMENT_UPDATE_STATUS_SQL = """
+    UPDATE documents
+    SET processing_status = $1,
+        processing_error = $2
+    WHERE id = $3;
+"""
+
+_DOCUMENT_COMPLETE_SQL = """
+    UPDATE documents
+    SET processing_status = $1,
+        processing_error = $2,
+        total_chunks = $3,
+        embedding_tokens = COALESCE($5, embedding_tokens),
+        embedding_cost_usd = COALESCE($6, embedding_cost_usd),
+        embedding_model = COALESCE($7, embedding_model),
+        is_active = COALESCE($8, is_active)
+    WHERE id = $4;
+"""
+
+
 async def document_insert(
     *,
     filename: str,
@@ -13,9 +33,13 @@ async def document_insert(
     category: str,
     subcategory: Optional[str] = None,
     processing_status: str = "pending",
+    is_active: bool = True,
 ) -> int:
     """
     Создаёт новую запись в таблице documents и возвращает её id.
+
+    is_active=False — документ не участвует в поиске, пока его не включат
+    (чанки получают document_active=FALSE триггером schema_18).
     """
     pool = get_pool()
 
@@ -29,9 +53,10 @@ async def document_insert(
                 file_size_bytes,
                 category,
                 subcategory,
-                processing_status
+                processing_status,
+                is_active
             )
-            VALUES ($1, $2, $3, $4, $5, $6, $7)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
             RETURNING id;
             """,
             filename,
@@ -41,6 +66,7 @@ async def document_insert(
             category,
             subcategory,
             processing_status,
+            is_active,
         )
 
     return row["id"]
@@ -54,25 +80,20 @@ async def document_update_status(
     embedding_tokens: Optional[int] = None,
     embedding_cost_usd: Optional[float] = None,
     embedding_model: Optional[str] = None,
+    is_active: Optional[bool] = None,
 ) -> None:
     """
     Обновляет статус обработки документа.
+
+    is_active (вместе с total_chunks) включает/выключает документ в поиске;
+    None — не меняет.
     """
     pool = get_pool()
 
     async with pool.acquire() as conn:
         if total_chunks is not None:
             await conn.execute(
-                """
-                UPDATE documents
-                SET processing_status = $1,
-                    processing_error = $2,
-                    total_chunks = $3,
-                    embedding_tokens = COALESCE($5, embedding_tokens),
-                    embedding_cost_usd = COALESCE($6, embedding_cost_usd),
-                    embedding_model = COALESCE($7, embedding_model)
-                WHERE id = $4;
-                """,
+                _DOCUMENT_COMPLETE_SQL,
                 status,
                 error,
                 total_chunks,
@@ -80,15 +101,11 @@ async def document_update_status(
                 embedding_tokens,
                 embedding_cost_usd,
                 embedding_model,
+                is_active,
             )
         else:
             await conn.execute(
-                """
-                UPDATE documents
-                SET processing_status = $1,
-                    processing_error = $2
-                WHERE id = $3;
-                """,
+                _DOCUMENT_UPDATE_STATUS_SQL,
                 status,
                 error,
                 document_id,
@@ -118,16 +135,78 @@ async def document_exists_by_hash(file_hash: str) -> Optional[Dict]:
     return None
 
 
+async def documents_exist_by_hashes(file_hashes: List[str]) -> Dict[str, Dict]:
+    """
+    Пакетная проверка существования документов по хешам (для массового импорта).
+    Один запрос вместо document_exists_by_hash на каждый файл.
+
+    Возвращает словарь {file_hash: поля документа} только для найденных хешей.
+    """
+    if not file_hashes:
+        return {}
+
+    pool = get_pool()
+
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT id, filename, file_hash, category, subcategory, processing_status
+            FROM documents
+            WHERE file_hash = ANY($1::text[]);
+            """,
+            file_hashes,
+        )
+
+    return {row["file_hash"]: dict(row) for row in rows}
+
+
 async def document_get_by_id(document_id: int) -> Optional[Dict]:
     """
-    Получает документ по ID.
+    Получает документ по ID (все поля, которые нужны карточке/статусу документа).
+    """
+    pool = get_pool()
+
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT
+                id,
+                filename,
+                file_path,
+                file_hash,
+                file_size_bytes,
+                category,
+                subcategory,
+                processing_status,
+                processing_error,
+                total_chunks,
+                embedding_tokens,
+                embedding_cost_usd,
+                embedding_model,
+                is_active,
+                created_at
+            FROM documents
+            WHERE id = $1;
+            """,
+            document_id,
+        )
+
+    if row:
+        return dict(row)
+    return None
+
+
+async def document_get_summary_by_id(document_id: int) -> Optional[Dict]:
+    """
+    Облегчённый вариант document_get_by_id: только id, filename, category,
+    subcategory и processing_status — для проверок существования и списков.
     """
     pool = get_pool()
 
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             """
-            SELECT *
+            SELECT id, filename, category, subcategory, processing_status
             FROM documents
             WHERE id = $1;
             """,
@@ -153,7 +232,16 @@ async def document_list_by_category(
         if subcategory:
             rows = await conn.fetch(
                 """
-                SELECT *
+                SELECT
+                    id,
+                    filename,
+                    category,
+                    subcategory,
+                    processing_status,
+                    total_chunks,
+                    file_size_bytes,
+                    is_active,
+                    created_at
                 FROM documents
                 WHERE category = $1 AND subcategory = $2
                 ORDER BY created_at DESC
@@ -166,7 +254,16 @@ async def document_list_by_category(
         else:
             rows = await conn.fetch(
                 """
-                SELECT *
+                SELECT
+                    id,
+                    filename,
+                    category,
+                    subcategory,
+                    processing_status,
+                    total_chunks,
+                    file_size_bytes,
+                    is_active,
+                    created_at
                 FROM documents
                 WHERE category = $1
                 ORDER BY created_at DESC
@@ -1,33 +1,51 @@
-from typing import Optional, List  # Для типов параметров и возвращаемых значений
+import time  # Время записи в кэш списков категорий (time.monotonic)
+from array import array  # Эмбеддинг как компактный массив float32
+from typing import Dict, Optional, List, Tuple  # Для типов параметров и возвращаемых значений
 
+from src.config import settings  # Настройки (переключатель поиска по halfvec)
 from src.services.db.pool import get_pool  # Пул подключений
+from src.services.db.vector_codec import normalize_vector  # Нормализация размерности эмбеддинга
 
 
 # Жёстко фиксируем размерность под колонку embedding VECTOR(1536)
 KB_VECTOR_DIM = 1536
 
 
-def _normalize_embedding(embedding: List[float]) -> List[float]:
+def _normalize_embedding(embedding: List[float]) -> array:
     """
     Приводит эмбеддинг к размерности KB_VECTOR_DIM:
       - если вектор длиннее — обрезаем;
       - если короче — дополняем нулями.
     Это убирает ошибку вида: expected 1536 dimensions, not 3072.
     """
-    if embedding is None:
-        return [0.0] * KB_VECTOR_DIM
+    return normalize_vector(embedding, KB_VECTOR_DIM)
 
-    emb = list(embedding)
-    n = len(emb)
 
-    if n == KB_VECTOR_DIM:
-        return emb
-    elif n > KB_VECTOR_DIM:
-        # Обрезаем лишнее
-        return emb[:KB_VECTOR_DIM]
-    else:
-        # Дополняем нулями
-        return emb + [0.0] * (KB_VECTOR_DIM - n)
+# Кэш списков DISTINCT category/subcategory:
+# (колонка, limit) -> (список значений, время записи по time.monotonic()).
+# Списки нужны классификатору на каждом сообщении, а меняются только при
+# добавлении записей в базу знаний (kb_insert сбрасывает кэш).
+_DISTINCT_CACHE_TTL = 60.0
+_DISTINCT_CACHE: Dict[Tuple[str, int], Tuple[List[str], float]] = {}
+
+
+def _get_cached_distinct(column: str, limit: int) -> Optional[List[str]]:
+    """Возвращает копию закэшированного списка или None, если записи нет или она устарела."""
+    cached = _DISTINCT_CACHE.get((column, limit))
+    if cached is None:
+        return None
+
+    values, stored_at = cached
+    if time.monotonic() - stored_at > _DISTINCT_CACHE_TTL:
+        _DISTINCT_CACHE.pop((column, limit), None)
+        return None
+
+    return list(values)
+
+
+def invalidate_distinct_cache() -> None:
+    """Сбрасывает кэш списков категорий/подкатегорий (после изменения knowledge_base)."""
+    _DISTINCT_CACHE.clear()
 
 
 async def kb_insert(
@@ -47,9 +65,6 @@ async def kb_insert(
     # Нормализуем размерность эмбеддинга под VECTOR(1536)
     norm_embedding = _normalize_embedding(embedding)
 
-    # Превращаем список чисел в строку формата "[0.123456,0.654321,...]" для pgvector
-    vector_str = "[" + ",".join(f"{x:.6f}" for x in norm_embedding) + "]"
-
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             """
@@ -69,9 +84,12 @@ async def kb_insert(
             question,    # $3
             answer,      # $4
             source_type, # $5
-            vector_str,  # $6 — строка, которую pgvector приведёт к vector(1536)
+            norm_embedding,  # $6 — array('f'), уходит в бинарном формате (vector_codec)
         )
 
+    # Могла появиться новая категория/культура
+    invalidate_distinct_cache()
+
     return row["id"]
 
 
@@ -97,36 +115,52 @@ async def kb_search(
     # Нормализуем эмбеддинг запроса под VECTOR(1536)
     norm_embedding = _normalize_embedding(query_embedding)
 
-    # Строка формата "[0.1234,0.5678,...]" для pgvector
-    vector_str = "[" + ",".join(f"{x:.6f}" for x in norm_embedding) + "]"
+    # FP16 колонка (schema_17) или исходная FP32.
+    # Эмбеддинги нормированы, поэтому ранжируем по скалярному произведению
+    # (<#>, индексы *_ip_ops из schema_21) — без расчёта норм на каждую строку.
+    # ORDER BY по алиасу — значение считается один раз на строку,
+    # сортировка по-прежнему идёт по HNSW индексу.
+    column, vector_type = (
+        ("embedding_half", "halfvec") if settings.rag_halfvec_search else ("embedding", "vector")
+    )
 
     async with pool.acquire() as conn:
         rows = await conn.fetch(
-            """
+            f"""
             SELECT
                 id,
                 category,
                 subcategory,
                 question,
                 answer,
-                embedding <=> $1::vector AS distance
-            FROM knowledge_base
-            WHERE is_active = TRUE
-              AND category = $2
-              AND ($3::text IS NULL OR subcategory = $3)
-            ORDER BY embedding <=> $1::vector
-            LIMIT $4;
+                -- Для нормированных векторов косинусное расстояние = 1 - скалярное произведение
+                1 + s.neg_inner_product AS distance
+            FROM (
+                SELECT
+                    id,
+                    category,
+                    subcategory,
+                    question,
+                    answer,
+                    {column} <#> $1::{vector_type} AS neg_inner_product
+                FROM knowledge_base
+                WHERE is_active = TRUE
+                  AND category = $2
+                  AND ($3::text IS NULL OR subcategory = $3)
+                ORDER BY neg_inner_product
+                LIMIT $4
+            ) s
+            -- Порог расстояния: NULL — без ограничения
+            WHERE $5::float8 IS NULL OR 1 + s.neg_inner_product <= $5
+            ORDER BY s.neg_inner_product;
             """,
-            vector_str,   # $1 — эмбеддинг запроса
+            norm_embedding,  # $1 — эмбеддинг запроса (бинарный vector/halfvec)
             category,     # $2 — тип консультации
             subcategory,  # $3 — культура (или NULL: тогда по всем культурам)
             limit,        # $4 — лимит количества строк
+            distance_threshold,  # $5 — порог расстояния (или NULL)
         )
 
-    # Если задан порог distance_threshold, фильтруем результаты.
-    if distance_threshold is not None:
-        rows = [r for r in rows if r["distance"] <= distance_threshold]
-
     return rows
 
 
@@ -143,22 +177,28 @@ async def kb_get_distinct_categories(limit: int = 50, only_valid: bool = True) -
 
     Внимание: служебные bootstrap-записи с is_active=FALSE всё равно попадут сюда,
     если у них заполнено поле category.
-    """
-    pool = get_pool()
 
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT DISTINCT category
-            FROM knowledge_base
-            WHERE category IS NOT NULL
-            ORDER BY category
-            LIMIT $1;
-            """,
-            limit,
-        )
+    Результат запроса кэшируется на _DISTINCT_CACHE_TTL секунд.
+    """
+    categories = _get_cached_distinct("category", limit)
+
+    if categories is None:
+        pool = get_pool()
+
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT DISTINCT category
+                FROM knowledge_base
+                WHERE category IS NOT NULL
+                ORDER BY category
+                LIMIT $1;
+                """,
+                limit,
+            )
 
-    categories = [r["category"] for r in rows]
+        categories = [r["category"] for r in rows]
+        _DISTINCT_CACHE[("category", limit)] = (list(categories), time.monotonic())
 
     # Если требуется - отфильтровать только валидные категории культур
     if only_valid:
@@ -191,7 +231,13 @@ async def kb_get_distinct_subcategories(limit: int = 200) -> List[str]:
     Используется, например, для подсказки LLM-классификатору культур
     (detect_culture_name), чтобы он ориентировался на реальные культуры
     из базы знаний, а не на типы консультаций.
+
+    Результат запроса кэшируется на _DISTINCT_CACHE_TTL секунд.
     """
+    subcategories = _get_cached_distinct("subcategory", limit)
+    if subcategories is not None:
+        return subcategories
+
     pool = get_pool()
 
     async with pool.acquire() as conn:
@@ -206,4 +252,6 @@ async def kb_get_distinct_subcategories(limit: int = 200) -> List[str]:
             limit,
         )
 
-    return [r["subcategory"] for r in rows]
+    subcategories = [r["subcategory"] for r in rows]
+    _DISTINCT_CACHE[("subcategory", limit)] = (list(subcategories), time.monotonic())
+    return subcategories
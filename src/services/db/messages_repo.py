@@ -1,9 +1,122 @@
 # src/services/db/messages_repo.py
 
-from typing import Optional, Dict, Any, List  # Для типов параметров и возвращаемого значения
+import asyncio  # Очередь и фоновая задача буфера записи
+import logging
+from typing import Optional, Dict, Any, List, Tuple  # Для типов параметров и возвращаемого значения
 
+from src.config import settings  # Настройки (буферизация записи сообщений)
 from src.services.db.pool import get_pool  # Пул подключений
 
+logger = logging.getLogger(__name__)
+
+
+_LOG_MESSAGE_SQL = """
+    INSERT INTO messages (user_id, direction, text, session_id, topic_id, meta)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    RETURNING id
+"""
+
+# Последние N сообщений отбираются по убыванию времени, а внешний
+# ORDER BY сразу отдаёт их от старых к новым — без разворота списка в Python.
+# id — второй ключ сортировки: сообщения одной пачки COPY (см. _MessageWriteBuffer)
+# получают одинаковый created_at, а id выдаются в порядке записи.
+_LAST_MESSAGES_SQL = """
+    SELECT direction, text, created_at
+    FROM (
+        SELECT id, direction, text, created_at
+        FROM messages
+        WHERE user_id = $1
+        ORDER BY created_at DESC, id DESC
+        LIMIT $2
+    ) last
+    ORDER BY created_at ASC, id ASC
+"""
+
+_RECENT_MESSAGES_SQL = """
+    SELECT direction, text, created_at
+    FROM (
+        SELECT id, direction, text, created_at
+        FROM messages
+        WHERE topic_id = $1
+        ORDER BY created_at DESC, id DESC
+        LIMIT $2
+    ) last
+    ORDER BY created_at ASC, id ASC
+"""
+
+
+# Колонки messages, которые пишет буфер (created_at и id — по умолчанию в БД)
+_MESSAGE_COLUMNS = ("user_id", "direction", "text", "session_id", "topic_id", "meta")
+
+
+class _MessageWriteBuffer:
+    """
+    Буфер записи сообщений (включается BUFFERED_MESSAGE_WRITES=True).
+
+    Вызовы log_message, пришедшие в пределах flush_interval, записываются
+    одним COPY (copy_records_to_table) — один round trip вместо N INSERT.
+    Вызывающий ждёт записи своей пачки, поэтому следующий get_last_messages
+    уже видит сообщение.
+    """
+
+    def __init__(self, flush_interval: float = 0.02, max_batch: int = 200):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(self, record: Tuple) -> None:
+        """Ставит сообщение в очередь и ждёт, пока его пачка будет записана."""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((record, future))
+        await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+
+            # Добираем сообщения, пришедшие в окне flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Tuple, asyncio.Future]]) -> None:
+        try:
+            pool = get_pool()
+            async with pool.acquire() as conn:
+                await conn.copy_records_to_table(
+                    "messages",
+                    records=[record for record, _ in batch],
+                    columns=_MESSAGE_COLUMNS,
+                )
+        except Exception as e:
+            logger.error(f"[messages_repo] Ошибка пакетной записи сообщений: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+
+_message_write_buffer = _MessageWriteBuffer()
+
 
 async def log_message(
     user_id: int,                     # Внутренний id пользователя (users.id)
@@ -12,11 +125,21 @@ async def log_message(
     session_id: str,                  # Идентификатор сессии (например, aiogram/LLM)
     topic_id: Optional[int] = None,   # Текущая тема (topics.id) или None
     meta: Optional[Dict[str, Any]] = None,  # Дополнительные данные (JSON), например, промты/категория
-) -> int:
+    sync: bool = False,               # Писать сразу отдельным INSERT и вернуть id (в обход буфера)
+) -> Optional[int]:
     """
     Записывает сообщение в таблицу messages.
     Возвращает messages.id.
+
+    При BUFFERED_MESSAGE_WRITES=True (и sync=False) сообщение пишется пачкой
+    через _MessageWriteBuffer; COPY не возвращает id, поэтому результат — None.
     """
+    if settings.buffered_message_writes and not sync:
+        await _message_write_buffer.submit(
+            (user_id, direction, text, session_id, topic_id, meta)
+        )
+        return None
+
     # Берём пул
     pool = get_pool()
 
@@ -24,11 +147,7 @@ async def log_message(
     async with pool.acquire() as conn:
         # Выполняем INSERT и сразу получаем вставленную строку (RETURNING id)
         row = await conn.fetchrow(
-            """
-            INSERT INTO messages (user_id, direction, text, session_id, topic_id, meta)
-            VALUES ($1, $2, $3, $4, $5, $6)
-            RETURNING id
-            """,
+            _LOG_MESSAGE_SQL,
             user_id,    # $1
             direction,  # $2
             text,       # $3
@@ -52,33 +171,15 @@ async def get_last_messages(user_id: int, limit: int = 6) -> List[dict]:
     # Делаем запрос к БД
     async with pool.acquire() as conn:
         rows = await conn.fetch(
-            """
-            SELECT direction, text, created_at
-            FROM messages
-            WHERE user_id = $1
-            ORDER BY created_at DESC
-            LIMIT $2
-            """,
+            _LAST_MESSAGES_SQL,
             user_id,  # $1
             limit,    # $2
         )
 
-    # Сейчас rows отсортированы от новых к старым, а нам нужно наоборот.
-    rows = list(reversed(rows))
-
-    # Преобразуем результат в список обычных словарей (dict),
-    # чтобы было удобно использовать в коде и передавать в LLM.
-    result: List[dict] = []
-    for row in rows:
-        result.append(
-            {
-                "direction": row["direction"],  # 'user' или 'assistant'
-                "text": row["text"],            # текст сообщения
-                "created_at": row["created_at"] # время создания
-            }
-        )
-
-    return result
+    # Строки уже отсортированы от старых к новым; преобразуем в обычные
+    # словари (direction, text, created_at), чтобы было удобно использовать
+    # в коде и передавать в LLM.
+    return [dict(row) for row in rows]
 
 
 async def get_recent_messages(topic_id: int, limit: int = 5) -> List[dict]:
@@ -95,15 +196,17 @@ async def get_recent_messages(topic_id: int, limit: int = 5) -> List[dict]:
     pool = get_pool()
     async with pool.acquire() as conn:
         rows = await conn.fetch(
-            """
-            SELECT direction, text, created_at
-            FROM messages
-            WHERE topic_id = $1
-            ORDER BY created_at DESC
-            LIMIT $2
-            """,
+            _RECENT_MESSAGES_SQL,
             topic_id,
             limit,
         )
-        # Возвращаем в хронологическом порядке (старые → новые)
-        return [dict(row) for row in reversed(rows)]
+        # Уже в хронологическом порядке (старые → новые)
+        return [dict(row) for row in rows]
+
+
+# Запросы, которые pool.py прогревает на соединениях пула
+# (сообщения пишутся и читаются на каждом ходе диалога).
+WARMUP_SQLS = (
+    _LOG_MESSAGE_SQL,
+    _LAST_MESSAGES_SQL,
+)
@@ -1,9 +1,104 @@
 # src/services/db/moderation_repo.py
 
-from typing import Optional, List  # Для аннотаций типов (Optional, List)
+from typing import Optional, List, Tuple  # Для аннотаций типов (Optional, List, Tuple)
 
 # Импорт функции, которая возвращает пул подключений к БД
 from src.services.db.pool import get_pool  # Пул подключений asyncpg
+from src.services.db.kb_repo import KB_VECTOR_DIM, invalidate_distinct_cache  # Размерность и кэш категорий KB
+from src.services.db.vector_codec import normalize_vector  # Нормализация размерности эмбеддинга
+
+
+# Обновление статуса кандидата (одобрение / отклонение)
+_MODERATION_UPDATE_STATUS_SQL = """
+    UPDATE moderation_queue
+    SET status     = $2,
+        admin_id   = COALESCE($3, admin_id),
+        kb_id      = COALESCE($4, kb_id),
+        updated_at = NOW()
+    WHERE id = $1;
+"""
+
+# Одобрение кандидата одним запросом: блокируем запись, пока она 'pending',
+# добавляем пару в knowledge_base и переводим запись в 'approved' с kb_id.
+# Если запись уже обработана (или её одобряет другой админ), item пуст —
+# в knowledge_base ничего не вставляется и запрос возвращает 0 строк.
+_MODERATION_APPROVE_SQL = """
+    WITH item AS (
+        SELECT id
+        FROM moderation_queue
+        WHERE id = $1 AND status = 'pending'
+        FOR UPDATE
+    ),
+    kb AS (
+        INSERT INTO knowledge_base (
+            category,
+            subcategory,
+            question,
+            answer,
+            source_type,
+            embedding
+        )
+        SELECT $2, $3, $4, $5, $6, $7::vector
+        FROM item
+        RETURNING id
+    )
+    UPDATE moderation_queue m
+    SET status     = 'approved',
+        admin_id   = COALESCE($8, m.admin_id),
+        kb_id      = kb.id,
+        updated_at = NOW()
+    FROM kb
+    WHERE m.id = $1
+    RETURNING kb.id AS kb_id;
+"""
+
+# Следующий кандидат и размер очереди одним запросом (экран очереди в админке).
+# Количество — по частичному индексу pending-записей, кандидат — LATERAL
+# подзапрос с той же логикой, что и moderation_get_next_pending; при пустой
+# очереди колонки кандидата NULL, а total_pending = 0.
+_MODERATION_NEXT_WITH_COUNT_SQL = """
+    SELECT
+        q.id,
+        q.user_id,
+        q.topic_id,
+        q.category_guess,
+        q.question,
+        q.answer,
+        q.status,
+        q.admin_id,
+        q.kb_id,
+        q.created_at,
+        cnt.total_pending
+    FROM (
+        SELECT COUNT(*) AS total_pending
+        FROM moderation_queue
+        WHERE status = 'pending'
+    ) cnt
+    LEFT JOIN LATERAL (
+        SELECT
+            id,
+            user_id,
+            topic_id,
+            category_guess,
+            question,
+            answer,
+            status,
+            admin_id,
+            kb_id,
+            created_at
+        FROM moderation_queue
+        WHERE status = 'pending'
+        ORDER BY created_at ASC
+        LIMIT 1
+    ) q ON TRUE;
+"""
+
+# Количество кандидатов в очереди
+_MODERATION_COUNT_PENDING_SQL = """
+    SELECT COUNT(*) AS cnt
+    FROM moderation_queue
+    WHERE status = 'pending';
+"""
 
 
 async def moderation_add(
@@ -67,6 +162,7 @@ async def moderation_get_next_pending():
     # Открываем соединение из пула
     async with pool.acquire() as conn:
         # Берём самую старую запись со статусом 'pending'
+        # (частичный индекс idx_moderation_pending_created)
         row = await conn.fetchrow(
             """
             SELECT
@@ -90,6 +186,24 @@ async def moderation_get_next_pending():
         return row
 
 
+async def moderation_get_next_pending_with_count() -> Tuple[Optional[dict], int]:
+    """
+    Следующий кандидат (как moderation_get_next_pending) и количество записей
+    'pending' — одним запросом вместо двух.
+
+    Возвращает (запись или None, количество).
+    """
+    pool = get_pool()
+
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(_MODERATION_NEXT_WITH_COUNT_SQL)
+
+    total = int(row["total_pending"]) if row else 0
+    if row is None or row["id"] is None:
+        return None, total
+    return dict(row), total
+
+
 async def moderation_get_by_id(item_id: int):
     """
     Получить запись moderation_queue по id или None.
@@ -143,14 +257,7 @@ async def moderation_update_status(
     async with pool.acquire() as conn:
         # Обновляем статус и связанные поля
         await conn.execute(
-            """
-            UPDATE moderation_queue
-            SET status     = $2,
-                admin_id   = COALESCE($3, admin_id),
-                kb_id      = COALESCE($4, kb_id),
-                updated_at = NOW()
-            WHERE id = $1;
-            """,
+            _MODERATION_UPDATE_STATUS_SQL,
             item_id,  # $1 — id записи
             status,   # $2 — новый статус
             admin_id, # $3 — id админа (если None, оставляем старое значение)
@@ -158,6 +265,47 @@ async def moderation_update_status(
         )
 
 
+async def moderation_approve(
+    item_id: int,               # id записи в moderation_queue
+    *,
+    category: str,              # Тип консультации (knowledge_base.category)
+    subcategory: Optional[str], # Культура (knowledge_base.subcategory)
+    question: str,              # Вопрос (полный вопрос кандидата)
+    answer: str,                # Ответ
+    embedding: List[float],     # Эмбеддинг вопроса
+    admin_id: Optional[int] = None,  # Кто одобрил
+    source_type: str = "admin_qa",   # Тип источника в knowledge_base
+) -> Optional[int]:
+    """
+    Одобрить кандидата: добавить пару в knowledge_base и перевести запись
+    в статус 'approved' — один запрос вместо kb_insert + moderation_update_status.
+
+    Возвращает id новой записи knowledge_base или None, если запись уже
+    не в статусе 'pending' (обработана другим админом) — тогда в базу знаний
+    ничего не добавляется.
+    """
+    pool = get_pool()
+
+    async with pool.acquire() as conn:
+        kb_id = await conn.fetchval(
+            _MODERATION_APPROVE_SQL,
+            item_id,      # $1 — id записи
+            category,     # $2
+            subcategory,  # $3
+            question,     # $4
+            answer,       # $5
+            source_type,  # $6
+            normalize_vector(embedding, KB_VECTOR_DIM),  # $7 — под VECTOR(1536)
+            admin_id,     # $8
+        )
+
+    if kb_id is not None:
+        # Могла появиться новая категория/культура
+        invalidate_distinct_cache()
+
+    return kb_id
+
+
 async def moderation_set_category(item_id: int, category: str) -> None:
     """
     Обновляет поле category_guess у записи в moderation_queue.
@@ -189,16 +337,13 @@ async def moderation_count_pending() -> int:
     Вернёт количество записей в moderation_queue со статусом 'pending'.
     Используется для вывода:
         'В очереди на проверку: N вопросов.'
+
+    Считается по частичному индексу idx_moderation_pending_created
+    (только pending-записи, index-only scan), а не по всей таблице.
     """
     pool = get_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT COUNT(*) AS cnt
-            FROM moderation_queue
-            WHERE status = 'pending';
-            """
-        )
+        row = await conn.fetchrow(_MODERATION_COUNT_PENDING_SQL)
         return int(row["cnt"]) if row and row["cnt"] is not None else 0
 
 
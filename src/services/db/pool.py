@@ -1,15 +1,112 @@
 # src/services/db/pool.py
 
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
 import asyncpg  # Библиотека для работы с PostgreSQL асинхронно
-from typing import Optional  # Для аннотации типов (Optional[...] может быть None)
+from typing import AsyncIterator, Optional, Union  # Для аннотации типов (Optional[...] может быть None)
 
 from src.config import settings  # Конфиг проекта: из него берём параметры подключения к БД
+from src.services.db.vector_codec import register_vector_codec  # Бинарный кодек pgvector
 
 
 # Глобальная переменная, в которой будет лежать пул соединений.
 # Тип: asyncpg.Pool или None (если пул ещё не создан или уже закрыт).
 _db_pool: Optional[asyncpg.Pool] = None
 
+# Соединение, взятое блоком `async with acquire():` в текущей задаче.
+# Репозитории, использующие get_executor(), выполняют запросы на нём
+# вместо отдельного acquire/release на каждый вызов.
+_current_connection: ContextVar[Optional[asyncpg.Connection]] = ContextVar(
+    "db_current_connection", default=None
+)
+
+# Прогрев запросов выполняется только для соединений, которые открывает
+# init_db_pool (min_size), а не для каждого соединения, открытого по требованию
+_warmup_on_connect: bool = False
+
+logger = logging.getLogger(__name__)
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """
+    Настраивает каждое новое соединение пула.
+
+    Регистрирует кодеки (pgvector, uuid как строка) и на соединениях, открытых
+    при старте пула, прогревает несколько запросов, которые выполняются на
+    каждом сообщении пользователя.
+    """
+    # Кодеки регистрируем до подготовки запросов: типы параметров
+    # подготовленного выражения привязываются к кодекам соединения
+    await register_vector_codec(conn)
+
+    # uuid в текстовом формате: id посадок/событий приходят из HTTP строкой
+    # и передаются в запрос как есть, без uuid.UUID() на каждый вызов;
+    # из БД uuid тоже возвращается строкой
+    await conn.set_type_codec(
+        "uuid",
+        schema="pg_catalog",
+        encoder=str,
+        decoder=str,
+        format="text",
+    )
+
+    # Соединения, которые пул открывает позже по требованию (в т.ч. после
+    # закрытия простаивающих), отдаются сразу: прогрев на них задержал бы
+    # именно тот запрос, ради которого соединение открыто
+    if not _warmup_on_connect:
+        return
+
+    # Импорт внутри функции: репозитории сами импортируют pool.py
+    from src.services.db import (
+        consultation_logs_repo,
+        document_chunks_repo,
+        messages_repo,
+        tokens_repo,
+        topics_repo,
+        users_repo,
+    )
+
+    warmup_sqls = (
+        *users_repo.WARMUP_SQLS,
+        *topics_repo.WARMUP_SQLS,
+        *messages_repo.WARMUP_SQLS,
+        *tokens_repo.WARMUP_SQLS,
+        *consultation_logs_repo.WARMUP_SQLS,
+        *document_chunks_repo.WARMUP_SQLS,
+    )
+
+    for sql in warmup_sqls:
+        try:
+            # prepare() проводит разбор запроса на сервере и интроспекцию
+            # типов параметров/колонок: кодеки типов кэшируются на соединении,
+            # каталог — в процессе бэкенда, и первый настоящий запрос
+            # обходится без этих обращений к pg_type/pg_class
+            await conn.prepare(sql)
+        except Exception as e:
+            # Например, не применена миграция — запрос подготовится при первом вызове
+            logger.warning(f"[pool] Не удалось подготовить запрос при прогреве соединения: {e}")
+
+
+def _server_settings() -> dict:
+    """
+    Параметры сессии, которые asyncpg передаёт при установке соединения.
+
+    JIT для коротких запросов по ключу только добавляет задержку.
+    READ COMMITTED — явно, независимо от настроек сервера/пулера:
+    на нём держатся атомарные UPDATE ... WHERE (deduct_tokens) без FOR UPDATE.
+    При settings.db_async_commit COMMIT не ждёт fsync WAL — задаётся один раз
+    на соединение, а не SET LOCAL в отдельной транзакции на каждую запись.
+    """
+    server_settings = {
+        "jit": "off",
+        "default_transaction_isolation": "read committed",
+    }
+    if settings.db_async_commit:
+        server_settings["synchronous_commit"] = "off"
+    return server_settings
+
 
 async def init_db_pool() -> None:
     """
@@ -17,7 +114,7 @@ async def init_db_pool() -> None:
 
     Вызывается один раз при старте бота (например, в main.py).
     """
-    global _db_pool  # Говорим, что будем менять глобальную переменную _db_pool
+    global _db_pool, _warmup_on_connect  # Говорим, что будем менять глобальные переменные
 
     # Если пул уже создан, ничего не делаем (чтобы не пересоздавать его).
     if _db_pool is not None:
@@ -25,15 +122,32 @@ async def init_db_pool() -> None:
 
     # Создаём пул соединений с БД.
     # Все параметры берём из settings (host, port, имя базы, логин, пароль).
-    _db_pool = await asyncpg.create_pool(
-        host=settings.db_host,         # Адрес сервера PostgreSQL
-        port=settings.db_port,         # Порт PostgreSQL
-        database=settings.db_name,     # Имя базы данных
-        user=settings.db_user,         # Имя пользователя
-        password=settings.db_password, # Пароль
-        min_size=1,                    # Минимальное количество соединений в пуле
-        max_size=5,                    # Максимальное количество соединений в пуле
-    )
+    # create_pool открывает min_size соединений сразу — только их и прогреваем.
+    _warmup_on_connect = True
+    try:
+        _db_pool = await asyncpg.create_pool(
+            host=settings.db_host,         # Адрес сервера PostgreSQL
+            port=settings.db_port,         # Порт PostgreSQL
+            database=settings.db_name,     # Имя базы данных
+            user=settings.db_user,         # Имя пользователя
+            password=settings.db_password, # Пароль
+            min_size=settings.db_pool_min_size,  # Минимальное количество соединений в пуле
+            max_size=settings.db_pool_max_size,  # Максимальное количество соединений в пуле
+            command_timeout=settings.db_command_timeout,  # Таймаут запроса по умолчанию
+            # Кэш подготовленных выражений на соединение: горячие запросы
+            # (log_consultation, live feed, сообщения диалога) парсятся и
+            # планируются один раз и не вытесняются по времени.
+            statement_cache_size=1024,
+            max_cached_statement_lifetime=0,
+            # Простаивающие соединения закрываются через 5 минут и открываются
+            # заново по требованию (уже без прогрева, см. _init_connection)
+            max_inactive_connection_lifetime=300,
+            # Параметры сессии уходят при установке соединения, без отдельного SET
+            server_settings=_server_settings(),
+            init=_init_connection,         # Кодеки на каждом соединении, прогрев — на стартовых
+        )
+    finally:
+        _warmup_on_connect = False
 
 
 async def close_db_pool() -> None:
@@ -67,3 +181,44 @@ def get_pool() -> asyncpg.Pool:
 
     # Возвращаем активный пул.
     return _db_pool
+
+
+@asynccontextmanager
+async def acquire() -> AsyncIterator[asyncpg.Connection]:
+    """
+    Берёт соединение из пула и делает его текущим для вложенных вызовов
+    репозиториев (get_executor). Вложенный acquire() использует уже взятое
+    соединение.
+
+    Оборачивайте только короткие последовательности запросов в хендлере.
+    Внутри блока не вызывайте LLM/внешние API (соединение занято всё это
+    время) и не запускайте запросы через asyncio.gather — задачи унаследуют
+    одно соединение, а asyncpg не выполняет на нём запросы параллельно.
+    """
+    conn = _current_connection.get()
+    if conn is not None:
+        yield conn
+        return
+
+    async with get_pool().acquire() as conn:
+        token = _current_connection.set(conn)
+        try:
+            yield conn
+        finally:
+            _current_connection.reset(token)
+
+
+def get_executor() -> Union[asyncpg.Pool, asyncpg.Connection]:
+    """
+    Возвращает соединение текущего блока acquire(), а вне его — пул.
+
+    Для однозапросных функций репозиториев: у пула и соединения одинаковые
+    fetch/fetchrow/fetchval/execute.
+    """
+    conn = _current_connection.get()
+    if conn is not None:
+        return conn
+    # Проверка get_pool() без лишнего вызова функции: это путь каждого запроса
+    if _db_pool is None:
+        raise RuntimeError("Пул подключений к БД не инициализирован. Сначала вызовите init_db_pool().")
+    return _db_pool
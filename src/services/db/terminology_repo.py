@@ -1,27 +1,55 @@
 """
 Репозиторий для работы со словарём терминов.
 """
-from typing import List, Optional
+import time
+from typing import List, Optional, Tuple
+
+import asyncpg
+
 from src.services.db.pool import get_pool
 
 
-async def get_all_terminology() -> List[dict]:
+# Кэш словаря: (строки terminology, время записи по time.monotonic()).
+# Словарь подставляется в каждый промпт консультации, а меняется только
+# админом через add_terminology / delete_terminology (они сбрасывают кэш).
+_TERMINOLOGY_CACHE_TTL = 300.0
+_terminology_cache: Optional[Tuple[List[asyncpg.Record], float]] = None
+
+
+def _invalidate_terminology_cache() -> None:
+    global _terminology_cache
+    _terminology_cache = None
+
+
+async def get_all_terminology() -> List[asyncpg.Record]:
     """
     Получить все термины из словаря.
 
+    Результат кэшируется на _TERMINOLOGY_CACHE_TTL секунд.
+
     Returns:
-        List[dict]: Список словарей с полями {id, term, preferred_phrase, description}
+        List[asyncpg.Record]: Записи с полями {id, term, preferred_phrase, description}
+        (доступ как к словарю: row["term"])
     """
+    global _terminology_cache
+
+    if _terminology_cache is not None:
+        rows, stored_at = _terminology_cache
+        if time.monotonic() - stored_at <= _TERMINOLOGY_CACHE_TTL:
+            # Record неизменяемы — копируем только сам список
+            return list(rows)
+
     pool = get_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT id, term, preferred_phrase, description
-            FROM terminology
-            ORDER BY term
-            """
-        )
-        return [dict(row) for row in rows]
+    rows = await pool.fetch(
+        """
+        SELECT id, term, preferred_phrase, description
+        FROM terminology
+        ORDER BY term
+        """
+    )
+
+    _terminology_cache = (rows, time.monotonic())
+    return list(rows)
 
 
 async def add_terminology(term: str, preferred_phrase: str, description: Optional[str] = None) -> int:
@@ -37,16 +65,17 @@ async def add_terminology(term: str, preferred_phrase: str, description: Optiona
         int: ID созданной записи
     """
     pool = get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            INSERT INTO terminology (term, preferred_phrase, description)
-            VALUES ($1, $2, $3)
-            RETURNING id
-            """,
-            term, preferred_phrase, description
-        )
-        return row['id']
+    row = await pool.fetchrow(
+        """
+        INSERT INTO terminology (term, preferred_phrase, description)
+        VALUES ($1, $2, $3)
+        RETURNING id
+        """,
+        term, preferred_phrase, description
+    )
+
+    _invalidate_terminology_cache()
+    return row['id']
 
 
 async def delete_terminology(terminology_id: int) -> bool:
@@ -60,12 +89,13 @@ async def delete_terminology(terminology_id: int) -> bool:
         bool: True если удалено, False если не найдено
     """
     pool = get_pool()
-    async with pool.acquire() as conn:
-        result = await conn.execute(
-            """
-            DELETE FROM terminology
-            WHERE id = $1
-            """,
-            terminology_id
-        )
-        return result == "DELETE 1"
+    result = await pool.execute(
+        """
+        DELETE FROM terminology
+        WHERE id = $1
+        """,
+        terminology_id
+    )
+
+    _invalidate_terminology_cache()
+    return result == "DELETE 1"
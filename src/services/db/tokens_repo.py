@@ -11,7 +11,36 @@
 
 from typing import Optional
 
-from src.services.db.pool import get_pool
+from src.services.db.pool import get_executor
+
+
+_TOKEN_BALANCE_SQL = "SELECT token_balance FROM users WHERE id = $1"
+
+_HAS_SUFFICIENT_TOKENS_SQL = "SELECT token_balance >= $2 FROM users WHERE id = $1"
+
+# Проверка баланса, списание и запись в token_transactions одним запросом
+_DEDUCT_TOKENS_SQL = """
+    WITH upd AS (
+        UPDATE users
+        SET token_balance = token_balance - $2
+        WHERE id = $1 AND token_balance >= $2
+        RETURNING id, token_balance
+    ),
+    log AS (
+        INSERT INTO token_transactions
+        (user_id, amount, operation_type, description)
+        SELECT id, -$2::int, $3, $4  -- отрицательное значение = списание
+        FROM upd
+    )
+    SELECT token_balance FROM upd
+"""
+
+# Проверка и списание токенов на каждой консультации — прогреваются
+# на соединениях пула (см. pool._init_connection)
+WARMUP_SQLS = (
+    _HAS_SUFFICIENT_TOKENS_SQL,
+    _DEDUCT_TOKENS_SQL,
+)
 
 
 async def get_token_balance(user_id: int) -> int:
@@ -24,13 +53,8 @@ async def get_token_balance(user_id: int) -> int:
     Returns:
         Количество токенов (0 если пользователь не найден)
     """
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT token_balance FROM users WHERE id = $1",
-            user_id,
-        )
-        return row["token_balance"] if row else 0
+    db = get_executor()
+    return await db.fetchval(_TOKEN_BALANCE_SQL, user_id) or 0
 
 
 async def has_sufficient_tokens(user_id: int, required: int) -> bool:
@@ -43,9 +67,15 @@ async def has_sufficient_tokens(user_id: int, required: int) -> bool:
 
     Returns:
         True если баланс >= required
+
+    Сравнение выполняется в SQL — один запрос, без отдельного чтения баланса.
     """
-    balance = await get_token_balance(user_id)
-    return balance >= required
+    db = get_executor()
+    sufficient = await db.fetchval(_HAS_SUFFICIENT_TOKENS_SQL, user_id, required)
+    # None — пользователь не найден (баланс считается 0)
+    if sufficient is None:
+        return required <= 0
+    return bool(sufficient)
 
 
 async def deduct_tokens(
@@ -57,8 +87,10 @@ async def deduct_tokens(
     """
     Списывает токены с баланса пользователя.
 
-    Использует транзакцию с блокировкой строки для атомарности.
-    Логирует операцию в таблицу token_transactions.
+    Проверка баланса, списание и запись в token_transactions — один запрос
+    (CTE): UPDATE с условием token_balance >= amount атомарен сам по себе,
+    отдельная транзакция и SELECT ... FOR UPDATE не нужны. Если баланса
+    не хватает, UPDATE не меняет строк и транзакция не логируется.
 
     Args:
         user_id: внутренний ID пользователя
@@ -69,42 +101,15 @@ async def deduct_tokens(
     Returns:
         True если списание успешно, False если недостаточно токенов
     """
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        async with conn.transaction():
-            # Проверяем баланс с блокировкой строки
-            row = await conn.fetchrow(
-                "SELECT token_balance FROM users WHERE id = $1 FOR UPDATE",
-                user_id,
-            )
-            if not row or row["token_balance"] < amount:
-                return False
-
-            # Списываем токены
-            await conn.execute(
-                """
-                UPDATE users
-                SET token_balance = token_balance - $1
-                WHERE id = $2
-                """,
-                amount,
-                user_id,
-            )
-
-            # Логируем транзакцию
-            await conn.execute(
-                """
-                INSERT INTO token_transactions
-                (user_id, amount, operation_type, description)
-                VALUES ($1, $2, $3, $4)
-                """,
-                user_id,
-                -amount,  # отрицательное значение = списание
-                operation_type,
-                description,
-            )
-
-            return True
+    db = get_executor()
+    new_balance = await db.fetchval(
+        _DEDUCT_TOKENS_SQL,
+        user_id,
+        amount,
+        operation_type,
+        description,
+    )
+    return new_balance is not None
 
 
 async def add_tokens(
@@ -117,7 +122,8 @@ async def add_tokens(
     Начисляет токены на баланс пользователя.
 
     Используется администратором для пополнения баланса.
-    Логирует операцию в таблицу token_transactions.
+    Начисление и запись в token_transactions — один запрос (CTE),
+    как в deduct_tokens: без отдельной транзакции и второго INSERT.
 
     Args:
         user_id: внутренний ID пользователя
@@ -126,34 +132,28 @@ async def add_tokens(
         description: описание операции (опционально)
 
     Returns:
-        Новый баланс токенов
+        Новый баланс токенов (0 если пользователь не найден)
     """
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        async with conn.transaction():
-            # Начисляем токены
-            row = await conn.fetchrow(
-                """
-                UPDATE users
-                SET token_balance = token_balance + $1
-                WHERE id = $2
-                RETURNING token_balance
-                """,
-                amount,
-                user_id,
-            )
-
-            # Логируем транзакцию
-            await conn.execute(
-                """
-                INSERT INTO token_transactions
-                (user_id, amount, operation_type, description)
-                VALUES ($1, $2, $3, $4)
-                """,
-                user_id,
-                amount,  # положительное значение = начисление
-                operation_type,
-                description,
-            )
-
-            return row["token_balance"] if row else 0
+    db = get_executor()
+    new_balance = await db.fetchval(
+        """
+        WITH upd AS (
+            UPDATE users
+            SET token_balance = token_balance + $1
+            WHERE id = $2
+            RETURNING id, token_balance
+        ),
+        log AS (
+            INSERT INTO token_transactions
+            (user_id, amount, operation_type, description)
+            SELECT id, $1, $3, $4  -- положительное значение = начисление
+            FROM upd
+        )
+        SELECT token_balance FROM upd
+        """,
+        amount,
+        user_id,
+        operation_type,
+        description,
+    )
+    return new_balance if new_balance is not None else 0
@@ -1,10 +1,93 @@
 # src/services/db/topics_repo.py
 
+"""
+Репозиторий тем (topics) консультаций.
+
+Несколько полей одной темы читайте через get_topic_info — один запрос.
+Независимые чтения (например, get_topic_message_count и поле темы)
+запускайте через asyncio.gather: asyncpg не мультиплексирует одно
+соединение, но каждая функция берёт своё соединение из пула, и запросы
+идут параллельно. Цена — по слоту пула на запрос, поэтому gather уместен
+для пары-тройки чтений в хендлере, а не для циклов по многим темам.
+"""
+
+import logging
 from typing import Optional  # topic_id может быть Optional в других местах
 
-from src.services.db.pool import get_pool  # Пул подключений
+from src.services.db.pool import get_executor  # Пул или текущее соединение (acquire())
 from src.api.sse_manager import sse_manager  # SSE Manager для broadcast
 
+logger = logging.getLogger(__name__)
+
+
+# Последняя открытая тема пользователя или новая — одним запросом.
+# INSERT выполняется, только если открытой темы нет; created показывает,
+# какая ветка сработала (для SSE события new_topic).
+# Поиск открытой темы идёт по частичному индексу idx_topics_user_open_created
+# (schema_22): условие status = 'open' должно совпадать с условием индекса.
+_GET_OR_CREATE_OPEN_TOPIC_SQL = """
+    WITH existing AS (
+        SELECT id
+        FROM topics
+        WHERE user_id = $1
+          AND status = 'open'
+        ORDER BY created_at DESC
+        LIMIT 1
+    ),
+    ins AS (
+        INSERT INTO topics (user_id, session_id, status, follow_up_questions_left)
+        SELECT $1, $2, 'open', 3
+        WHERE NOT EXISTS (SELECT 1 FROM existing)
+        RETURNING id
+    )
+    SELECT id, FALSE AS created FROM existing
+    UNION ALL
+    SELECT id, TRUE AS created FROM ins
+"""
+
+# force_new: закрываем все открытые темы и создаём новую — тоже один запрос
+# (UPDATE в CTE не видит вставленную строку, обе операции на одном снимке)
+_CREATE_NEW_TOPIC_SQL = """
+    WITH closed AS (
+        UPDATE topics
+        SET status = 'closed', updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = $1 AND status = 'open'
+    )
+    INSERT INTO topics (user_id, session_id, status, follow_up_questions_left)
+    VALUES ($1, $2, 'open', 3)
+    RETURNING id, TRUE AS created
+"""
+
+
+_TOPIC_CULTURE_SQL = "SELECT culture FROM topics WHERE id = $1"
+
+_FOLLOW_UP_LEFT_SQL = "SELECT follow_up_questions_left FROM topics WHERE id = $1"
+
+_TOPIC_INFO_SQL = """
+    SELECT id, status, culture, category, follow_up_questions_left
+    FROM topics WHERE id = $1
+"""
+
+_TOPIC_MESSAGE_COUNT_SQL = """
+    SELECT COUNT(*) as count
+    FROM messages
+    WHERE topic_id = $1 AND direction = 'user'
+"""
+
+_DECREMENT_FOLLOW_UP_SQL = """
+    UPDATE topics
+    SET follow_up_questions_left = GREATEST(follow_up_questions_left - 1, 0),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = $1
+    RETURNING follow_up_questions_left
+"""
+
+# Запросы каждого сообщения консультации — прогреваются на соединениях
+# пула (см. pool._init_connection)
+WARMUP_SQLS = (
+    _GET_OR_CREATE_OPEN_TOPIC_SQL,
+    _TOPIC_CULTURE_SQL,
+)
 
 async def get_or_create_open_topic(user_id: int, session_id: str, force_new: bool = False) -> int:
     """
@@ -12,230 +95,144 @@ async def get_or_create_open_topic(user_id: int, session_id: str, force_new: boo
     Если нашёл — возвращает её id.
     Если нет — создаёт новую запись в topics и возвращает её id.
 
+    Поиск и создание (или закрытие старых тем и создание при force_new) —
+    один запрос к БД.
+
     Args:
         user_id: ID пользователя
         session_id: Идентификатор сессии
         force_new: Если True, закрывает все открытые темы и создает новую
     """
-    # Берём пул
-    pool = get_pool()
+    # Берём пул (или соединение текущего блока acquire())
+    db = get_executor()
 
     # Работаем с БД
-    async with pool.acquire() as conn:
-        # Если force_new=True, закрываем все открытые темы
-        if force_new:
-            await conn.execute(
-                """
-                UPDATE topics
-                SET status = 'closed', updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = $1 AND status = 'open'
-                """,
-                user_id,
-            )
-            print(f"[get_or_create_open_topic] force_new=True, закрыты все открытые топики для user_id={user_id}")
-        else:
-            # Ищем последнюю открытую тему у пользователя
-            row = await conn.fetchrow(
-                """
-                SELECT id, status
-                FROM topics
-                WHERE user_id = $1
-                  AND status = 'open'
-                ORDER BY created_at DESC
-                LIMIT 1
-                """,
-                user_id,  # $1
-            )
-
-            # Если нашли — возвращаем id
-            if row is not None:
-                print(f"[get_or_create_open_topic] Найден открытый топик: topic_id={row['id']}, status={row['status']}, user_id={user_id}")
-                return row["id"]
-            else:
-                print(f"[get_or_create_open_topic] Открытый топик НЕ найден для user_id={user_id}, создаём новый")
-
-        # Если не нашли или force_new=True — создаём новую тему
-        row = await conn.fetchrow(
-            """
-            INSERT INTO topics (user_id, session_id, status, follow_up_questions_left)
-            VALUES ($1, $2, 'open', 3)
-            RETURNING id
-            """,
-            user_id,     # $1 — пользователь
-            session_id,  # $2 — идентификатор сессии
-        )
-
-        topic_id = row["id"]
-        print(f"[get_or_create_open_topic] Создан НОВЫЙ топик: topic_id={topic_id}, user_id={user_id}, follow_up_questions_left=3")
-
-        # Broadcast SSE event для нового топика
-        await sse_manager.broadcast(
-            event_type='new_topic',
-            data={'topic_id': topic_id, 'user_id': user_id, 'status': 'open'},
-            endpoint_type='users',
-            entity_id=user_id
-        )
-
-        # Возвращаем id новой темы
+    row = await db.fetchrow(
+        _CREATE_NEW_TOPIC_SQL if force_new else _GET_OR_CREATE_OPEN_TOPIC_SQL,
+        user_id,     # $1 — пользователь
+        session_id,  # $2 — идентификатор сессии
+    )
+
+    topic_id = row["id"]
+
+    if not row["created"]:
+        logger.debug("[get_or_create_open_topic] Найден открытый топик: topic_id=%s, user_id=%s", topic_id, user_id)
         return topic_id
 
+    logger.debug(
+        "[get_or_create_open_topic] Создан НОВЫЙ топик: topic_id=%s, user_id=%s, force_new=%s, follow_up_questions_left=3",
+        topic_id, user_id, force_new,
+    )
+
+    # Broadcast SSE event для нового топика
+    await sse_manager.broadcast(
+        event_type='new_topic',
+        data={'topic_id': topic_id, 'user_id': user_id, 'status': 'open'},
+        endpoint_type='users',
+        entity_id=user_id
+    )
+
+    # Возвращаем id новой темы
+    return topic_id
+
 
 async def get_topic_culture(topic_id: int) -> Optional[str]:
     """Получить культуру для темы."""
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT culture FROM topics WHERE id = $1",
-            topic_id,
-        )
-        return row["culture"] if row else None
-
-
-async def get_topic_category(topic_id: int) -> Optional[str]:
-    """Получить категорию для темы."""
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT category FROM topics WHERE id = $1",
-            topic_id,
-        )
-        return row["category"] if row else None
+    db = get_executor()
+    return await db.fetchval(_TOPIC_CULTURE_SQL, topic_id)
 
 
 async def set_topic_culture(topic_id: int, culture: str) -> None:
     """Установить культуру для темы."""
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        await conn.execute(
-            "UPDATE topics SET culture = $1, updated_at = CURRENT_TIMESTAMP WHERE id = $2",
-            culture,
-            topic_id,
-        )
+    db = get_executor()
+    await db.execute(
+        "UPDATE topics SET culture = $1, updated_at = CURRENT_TIMESTAMP WHERE id = $2",
+        culture,
+        topic_id,
+    )
 
 
 async def set_topic_category(topic_id: int, category: str) -> None:
     """Установить категорию для темы."""
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        await conn.execute(
-            "UPDATE topics SET category = $1, updated_at = CURRENT_TIMESTAMP WHERE id = $2",
-            category,
-            topic_id,
-        )
+    db = get_executor()
+    await db.execute(
+        "UPDATE topics SET category = $1, updated_at = CURRENT_TIMESTAMP WHERE id = $2",
+        category,
+        topic_id,
+    )
 
 
 async def get_topic_message_count(topic_id: int) -> int:
     """Получить количество сообщений пользователя в теме."""
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT COUNT(*) as count
-            FROM messages
-            WHERE topic_id = $1 AND direction = 'user'
-            """,
-            topic_id,
-        )
-        return row["count"] if row else 0
-
-
-async def get_topic_status(topic_id: int) -> Optional[str]:
-    """Получить статус темы."""
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT status FROM topics WHERE id = $1",
-            topic_id,
-        )
-        return row["status"] if row else None
-
-
-async def close_open_topics(user_id: int) -> None:
+    db = get_executor()
+    return await db.fetchval(_TOPIC_MESSAGE_COUNT_SQL, topic_id) or 0
+
+
+async def close_open_topics(user_id: int) -> int:
     """
     Закрывает все открытые топики пользователя.
     Используется при нажатии кнопки "Новая тема" или возврате в главное меню.
+
+    Возвращает количество закрытых топиков (один UPDATE ... RETURNING,
+    без отдельных COUNT до и после).
     """
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        # Сначала проверим, сколько топиков открыто
-        count_before = await conn.fetchval(
-            "SELECT COUNT(*) FROM topics WHERE user_id = $1 AND status = 'open'",
-            user_id,
-        )
-        print(f"[close_open_topics] До закрытия: {count_before} открытых топиков для user_id={user_id}")
-
-        # Закрываем
-        result = await conn.execute(
-            """
-            UPDATE topics
-            SET status = 'closed', updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = $1 AND status = 'open'
-            """,
-            user_id,
-        )
-        print(f"[close_open_topics] Закрыто топиков: {result}, user_id={user_id}")
-
-        # Проверяем после
-        count_after = await conn.fetchval(
-            "SELECT COUNT(*) FROM topics WHERE user_id = $1 AND status = 'open'",
-            user_id,
-        )
-        print(f"[close_open_topics] После закрытия: {count_after} открытых топиков для user_id={user_id}")
+    db = get_executor()
+    rows = await db.fetch(
+        """
+        UPDATE topics
+        SET status = 'closed', updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = $1 AND status = 'open'
+        RETURNING id
+        """,
+        user_id,
+    )
+
+    closed_count = len(rows)
+    logger.debug("[close_open_topics] Закрыто топиков: %s, user_id=%s", closed_count, user_id)
+    return closed_count
 
 
 async def get_follow_up_questions_left(topic_id: int) -> int:
     """Получить количество оставшихся уточняющих вопросов."""
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT follow_up_questions_left FROM topics WHERE id = $1",
-            topic_id,
-        )
-        return row["follow_up_questions_left"] if row else 0
+    db = get_executor()
+    return await db.fetchval(_FOLLOW_UP_LEFT_SQL, topic_id) or 0
 
 
 async def decrement_follow_up_questions(topic_id: int) -> int:
     """Уменьшить количество уточняющих вопросов на 1. Возвращает новое значение."""
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            UPDATE topics
-            SET follow_up_questions_left = GREATEST(follow_up_questions_left - 1, 0),
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = $1
-            RETURNING follow_up_questions_left
-            """,
-            topic_id,
-        )
-        return row["follow_up_questions_left"] if row else 0
+    db = get_executor()
+    return await db.fetchval(_DECREMENT_FOLLOW_UP_SQL, topic_id) or 0
 
 
 async def reset_follow_up_questions(topic_id: int) -> None:
-    """Сбросить счётчик уточняющих вопросов на 3."""
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        await conn.execute(
-            """
-            UPDATE topics
-            SET follow_up_questions_left = 3,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = $1
-            """,
-            topic_id,
-        )
-        print(f"[reset_follow_up_questions] Reset counter to 3 for topic_id={topic_id}")
+    """
+    Сбросить счётчик уточняющих вопросов на 3.
+
+    Если счётчик уже равен 3, строка не обновляется (нет лишней записи в WAL
+    и новой версии строки при повторных нажатиях).
+    """
+    db = get_executor()
+    result = await db.execute(
+        """
+        UPDATE topics
+        SET follow_up_questions_left = 3,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = $1 AND follow_up_questions_left IS DISTINCT FROM 3
+        """,
+        topic_id,
+    )
+    if result == "UPDATE 1":
+        logger.debug("[reset_follow_up_questions] Reset counter to 3 for topic_id=%s", topic_id)
 
 
 async def get_topic_info(topic_id: int) -> Optional[dict]:
-    """Получить полную информацию о теме."""
-    pool = get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT id, status, culture, follow_up_questions_left
-            FROM topics WHERE id = $1
-            """,
-            topic_id,
-        )
-        return dict(row) if row else None
+    """
+    Получить полную информацию о теме: id, status, culture, category,
+    follow_up_questions_left.
+
+    Один запрос вместо нескольких get_topic_culture /
+    get_follow_up_questions_left подряд.
+    """
+    db = get_executor()
+    row = await db.fetchrow(_TOPIC_INFO_SQL, topic_id)
+    return dict(row) if row else None
@@ -4,31 +4,62 @@
 """
 
 from typing import Optional
-from uuid import UUID
 
 from src.services.db.pool import get_pool
 
 
-async def get_plantings_by_user(user_id: int) -> list[dict]:
+# Посадка в формате API (те же ключи, что у _PLANTING_API_COLUMNS_SQL), собранная в PostgreSQL:
+# DATE и TIMESTAMPTZ сериализуются json_build_object в ISO 8601.
+_PLANTING_JSON_SQL = """
+    json_build_object(
+        'id', id,
+        'userId', user_id,
+        'cultureType', culture_type,
+        'variety', variety,
+        'fruitingStart', fruiting_start,
+        'fruitingEnd', fruiting_end,
+        'createdAt', created_at,
+        'updatedAt', updated_at
+    )
+"""
+
+
+# Колонки посадки для SELECT/RETURNING сразу в формате API: имена полей
+# как у _PLANTING_JSON_SQL, даты и время — ISO 8601 строкой (та же
+# сериализация, что и в JSON). Строка превращается в dict без
+# поэлементных проверок и isoformat() в Python.
+_PLANTING_API_COLUMNS_SQL = """
+    id,
+    user_id AS "userId",
+    culture_type AS "cultureType",
+    variety,
+    to_char(fruiting_start, 'YYYY-MM-DD') AS "fruitingStart",
+    to_char(fruiting_end, 'YYYY-MM-DD') AS "fruitingEnd",
+    to_json(created_at) #>> '{}' AS "createdAt",
+    to_json(updated_at) #>> '{}' AS "updatedAt"
+"""
+
+
+async def get_plantings_json_by_user(user_id: int) -> str:
     """
-    Получить все посадки пользователя.
+    Получить все посадки пользователя готовым JSON-массивом.
+
+    Массив строится в PostgreSQL (json_agg) — HTTP-слой отдаёт текст как есть,
+    без Record -> dict -> json.dumps на каждую посадку.
     """
     pool = get_pool()
 
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT id, user_id, culture_type, variety,
-                   fruiting_start, fruiting_end,
-                   created_at, updated_at
-            FROM user_plantings
-            WHERE user_id = $1
-            ORDER BY created_at
-            """,
-            user_id,
-        )
-
-        return [_row_to_dict(row) for row in rows]
+    return await pool.fetchval(
+        f"""
+        SELECT COALESCE(
+            json_agg({_PLANTING_JSON_SQL} ORDER BY created_at),
+            '[]'::json
+        )::text
+        FROM user_plantings
+        WHERE user_id = $1
+        """,
+        user_id,
+    )
 
 
 async def get_planting_by_id(planting_id: str, user_id: int) -> Optional[dict]:
@@ -37,23 +68,20 @@ async def get_planting_by_id(planting_id: str, user_id: int) -> Optional[dict]:
     """
     pool = get_pool()
 
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT id, user_id, culture_type, variety,
-                   fruiting_start, fruiting_end,
-                   created_at, updated_at
-            FROM user_plantings
-            WHERE id = $1 AND user_id = $2
-            """,
-            UUID(planting_id),
-            user_id,
-        )
+    row = await pool.fetchrow(
+        f"""
+        SELECT {_PLANTING_API_COLUMNS_SQL}
+        FROM user_plantings
+        WHERE id = $1 AND user_id = $2
+        """,
+        planting_id,
+        user_id,
+    )
 
-        if row is None:
-            return None
+    if row is None:
+        return None
 
-        return _row_to_dict(row)
+    return _row_to_dict(row)
 
 
 async def create_planting(user_id: int, data: dict) -> dict:
@@ -62,60 +90,140 @@ async def create_planting(user_id: int, data: dict) -> dict:
     """
     pool = get_pool()
 
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            INSERT INTO user_plantings (
-                user_id, culture_type, variety,
-                fruiting_start, fruiting_end
-            )
-            VALUES ($1, $2, $3, $4, $5)
-            RETURNING id, user_id, culture_type, variety,
-                      fruiting_start, fruiting_end,
-                      created_at, updated_at
-            """,
-            user_id,
-            data["cultureType"],
-            data.get("variety"),
-            data.get("fruitingStart"),
-            data.get("fruitingEnd"),
+    row = await pool.fetchrow(
+        f"""
+        INSERT INTO user_plantings (
+            user_id, culture_type, variety,
+            fruiting_start, fruiting_end
         )
+        VALUES ($1, $2, $3, $4, $5)
+        RETURNING {_PLANTING_API_COLUMNS_SQL}
+        """,
+        user_id,
+        data["cultureType"],
+        data.get("variety"),
+        data.get("fruitingStart"),
+        data.get("fruitingEnd"),
+    )
 
-        return _row_to_dict(row)
+    return _row_to_dict(row)
 
 
-async def update_planting(planting_id: str, user_id: int, data: dict) -> Optional[dict]:
+# С какого количества посадок create_plantings_bulk пишет через COPY
+# (временная таблица + INSERT ... SELECT ... RETURNING). Для нескольких
+# строк один INSERT из unnest() дешевле, чем создание временной таблицы.
+COPY_MIN_PLANTINGS = 32
+
+_PLANTING_COLUMNS = ("user_id", "culture_type", "variety", "fruiting_start", "fruiting_end")
+
+_PLANTING_RETURNING = f"RETURNING {_PLANTING_API_COLUMNS_SQL}"
+
+
+async def create_plantings_bulk(user_id: int, items: list[dict]) -> list[dict]:
     """
-    Обновить посадку (только если принадлежит пользователю).
+    Создать несколько посадок пользователя за один запрос/транзакцию
+    (импорт, перенос данных). items — словари в формате create_planting.
+
+    Возвращает созданные посадки (порядок не гарантируется).
     """
-    pool = get_pool()
+    if not items:
+        return []
 
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            UPDATE user_plantings
-            SET culture_type = COALESCE($3, culture_type),
-                variety = $4,
-                fruiting_start = $5,
-                fruiting_end = $6,
-                updated_at = NOW()
-            WHERE id = $1 AND user_id = $2
-            RETURNING id, user_id, culture_type, variety,
-                      fruiting_start, fruiting_end,
-                      created_at, updated_at
-            """,
-            UUID(planting_id),
+    records = [
+        (
             user_id,
-            data.get("cultureType"),
-            data.get("variety"),
-            data.get("fruitingStart"),
-            data.get("fruitingEnd"),
+            item["cultureType"],
+            item.get("variety"),
+            item.get("fruitingStart"),
+            item.get("fruitingEnd"),
         )
+        for item in items
+    ]
+
+    pool = get_pool()
+
+    async with pool.acquire() as conn:
+        if len(records) < COPY_MIN_PLANTINGS:
+            # Колонки пачки параметрами-массивами: один INSERT на все посадки
+            _, culture_types, varieties, starts, ends = (list(col) for col in zip(*records))
+            rows = await conn.fetch(
+                f"""
+                INSERT INTO user_plantings (
+                    user_id, culture_type, variety,
+                    fruiting_start, fruiting_end
+                )
+                SELECT $1, *
+                FROM unnest($2::text[], $3::text[], $4::date[], $5::date[])
+                {_PLANTING_RETURNING}
+                """,
+                user_id,
+                culture_types,
+                varieties,
+                starts,
+                ends,
+            )
+        else:
+            async with conn.transaction():
+                await conn.execute(
+                    """
+                    CREATE TEMP TABLE _plantings_import (
+                        user_id INTEGER,
+                        culture_type TEXT,
+                        variety TEXT,
+                        fruiting_start DATE,
+                        fruiting_end DATE
+                    ) ON COMMIT DROP
+                    """
+                )
+                await conn.copy_records_to_table(
+                    "_plantings_import",
+                    records=records,
+                    columns=_PLANTING_COLUMNS,
+                )
+                rows = await conn.fetch(
+                    f"""
+                    INSERT INTO user_plantings (
+                        user_id, culture_type, variety,
+                        fruiting_start, fruiting_end
+                    )
+                    SELECT user_id, culture_type, variety, fruiting_start, fruiting_end
+                    FROM _plantings_import
+                    {_PLANTING_RETURNING}
+                    """
+                )
+
+    return [_row_to_dict(row) for row in rows]
 
-        if row is None:
-            return None
 
-        return _row_to_dict(row)
+async def update_planting(planting_id: str, user_id: int, data: dict) -> Optional[dict]:
+    """
+    Обновить посадку (только если принадлежит пользователю).
+    """
+    pool = get_pool()
+
+    row = await pool.fetchrow(
+        f"""
+        UPDATE user_plantings
+        SET culture_type = COALESCE($3, culture_type),
+            variety = $4,
+            fruiting_start = $5,
+            fruiting_end = $6,
+            updated_at = NOW()
+        WHERE id = $1 AND user_id = $2
+        RETURNING {_PLANTING_API_COLUMNS_SQL}
+        """,
+        planting_id,
+        user_id,
+        data.get("cultureType"),
+        data.get("variety"),
+        data.get("fruitingStart"),
+        data.get("fruitingEnd"),
+    )
+
+    if row is None:
+        return None
+
+    return _row_to_dict(row)
 
 
 async def delete_planting(planting_id: str, user_id: int) -> bool:
@@ -125,18 +233,17 @@ async def delete_planting(planting_id: str, user_id: int) -> bool:
     """
     pool = get_pool()
 
-    async with pool.acquire() as conn:
-        result = await conn.execute(
-            """
-            DELETE FROM user_plantings
-            WHERE id = $1 AND user_id = $2
-            """,
-            UUID(planting_id),
-            user_id,
-        )
+    result = await pool.execute(
+        """
+        DELETE FROM user_plantings
+        WHERE id = $1 AND user_id = $2
+        """,
+        planting_id,
+        user_id,
+    )
 
-        # result = "DELETE 1" или "DELETE 0"
-        return result == "DELETE 1"
+    # result = "DELETE 1" или "DELETE 0"
+    return result == "DELETE 1"
 
 
 async def get_user_region(user_id: int) -> Optional[str]:
@@ -145,18 +252,12 @@ async def get_user_region(user_id: int) -> Optional[str]:
     """
     pool = get_pool()
 
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT region FROM users WHERE id = $1
-            """,
-            user_id,
-        )
-
-        if row is None:
-            return None
-
-        return row["region"]
+    return await pool.fetchval(
+        """
+        SELECT region FROM users WHERE id = $1
+        """,
+        user_id,
+    )
 
 
 async def update_user_region(user_id: int, region: str) -> str:
@@ -165,29 +266,51 @@ async def update_user_region(user_id: int, region: str) -> str:
     """
     pool = get_pool()
 
-    async with pool.acquire() as conn:
-        await conn.execute(
-            """
-            UPDATE users SET region = $2 WHERE id = $1
-            """,
-            user_id,
-            region,
-        )
+    await pool.execute(
+        """
+        UPDATE users SET region = $2 WHERE id = $1
+        """,
+        user_id,
+        region,
+    )
+
+    return region
+
+
+async def get_user_garden_json(user_id: int) -> Optional[str]:
+    """
+    Получить регион и посадки пользователя одним запросом — готовым JSON
+    вида {"region": ..., "plantings": [...]} (формат get_plantings_json_by_user).
 
-        return region
+    Для страницы посадок вместо get_user_region + get_plantings_json_by_user.
+    Возвращает None, если пользователь не найден.
+    """
+    pool = get_pool()
+
+    return await pool.fetchval(
+        f"""
+        SELECT json_build_object(
+            'region', u.region,
+            'plantings', COALESCE(
+                (
+                    SELECT json_agg({_PLANTING_JSON_SQL} ORDER BY created_at)
+                    FROM user_plantings
+                    WHERE user_id = u.id
+                ),
+                '[]'::json
+            )
+        )::text
+        FROM users u
+        WHERE u.id = $1
+        """,
+        user_id,
+    )
 
 
 def _row_to_dict(row) -> dict:
     """
-    Преобразовать asyncpg.Record в dict с правильными именами полей для API.
-    """
-    return {
-        "id": str(row["id"]),
-        "userId": row["user_id"],
-        "cultureType": row["culture_type"],
-        "variety": row["variety"],
-        "fruitingStart": row["fruiting_start"].isoformat() if row["fruiting_start"] else None,
-        "fruitingEnd": row["fruiting_end"].isoformat() if row["fruiting_end"] else None,
-        "createdAt": row["created_at"].isoformat() if row["created_at"] else None,
-        "updatedAt": row["updated_at"].isoformat() if row["updated_at"] else None,
-    }
+    Преобразовать asyncpg.Record в dict для API.
+
+    Колонки уже названы и отформатированы в SQL (_PLANTING_API_COLUMNS_SQL).
+    """
+    return dict(row)
@@ -2,7 +2,39 @@
 
 from typing import Optional  # username / first_name / last_name могут быть None
 
-from src.services.db.pool import get_pool  # Берём функцию, которая отдаёт пул подключений
+from src.services.db.pool import acquire, get_pool  # Пул подключений / соединение текущего блока
+
+
+# Поиск пользователя или создание — одним запросом. INSERT выполняется,
+# только если пользователя нет: для существующих (почти все вызовы)
+# запрос ничего не пишет, в отличие от ON CONFLICT DO UPDATE.
+# ON CONFLICT DO NOTHING — на случай одновременного создания: тогда
+# запрос ничего не вернёт, и id читается повторным SELECT.
+_GET_OR_CREATE_USER_SQL = """
+    WITH existing AS (
+        SELECT id
+        FROM users
+        WHERE telegram_user_id = $1
+    ),
+    ins AS (
+        INSERT INTO users (telegram_user_id, username, first_name, last_name)
+        SELECT $1, $2, $3, $4
+        WHERE NOT EXISTS (SELECT 1 FROM existing)
+        ON CONFLICT (telegram_user_id) DO NOTHING
+        RETURNING id
+    )
+    SELECT id FROM existing
+    UNION ALL
+    SELECT id FROM ins
+"""
+
+_GET_USER_ID_SQL = "SELECT id FROM users WHERE telegram_user_id = $1"
+
+# Запрос каждого апдейта — прогревается на соединениях пула
+# (см. pool._init_connection)
+WARMUP_SQLS = (
+    _GET_OR_CREATE_USER_SQL,
+)
 
 
 async def get_or_create_user(
@@ -15,40 +47,21 @@ async def get_or_create_user(
     Ищет пользователя по telegram_user_id, если нет — создаёт.
     Возвращает внутренний users.id.
     """
-    # Получаем пул подключений
-    pool = get_pool()
-
-    # Через пул получаем соединение с БД (conn) и работаем внутри контекстного менеджера
-    async with pool.acquire() as conn:
-        # Пробуем найти пользователя по telegram_user_id
-        row = await conn.fetchrow(
-            """
-            SELECT id
-            FROM users
-            WHERE telegram_user_id = $1
-            """,
-            telegram_user_id,  # Подставляем $1
-        )
-
-        # Если пользователь уже существует — возвращаем его id
-        if row is not None:
-            return row["id"]
-
-        # Если не нашли — создаём нового пользователя
-        row = await conn.fetchrow(
-            """
-            INSERT INTO users (telegram_user_id, username, first_name, last_name)
-            VALUES ($1, $2, $3, $4)
-            RETURNING id
-            """,
+    # Получаем соединение с БД (conn): своё из пула или уже взятое блоком acquire()
+    async with acquire() as conn:
+        user_id = await conn.fetchval(
+            _GET_OR_CREATE_USER_SQL,
             telegram_user_id,  # $1 — telegram_user_id
             username,          # $2 — username
             first_name,        # $3 — first_name
             last_name,         # $4 — last_name
         )
 
-        # Возвращаем id только что созданной записи
-        return row["id"]
+        # Пользователя одновременно создал другой запрос — читаем его id
+        if user_id is None:
+            user_id = await conn.fetchval(_GET_USER_ID_SQL, telegram_user_id)
+
+        return user_id
 
 
 async def count_all_users() -> int:
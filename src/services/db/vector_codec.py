@@ -0,0 +1,118 @@
+# src/services/db/vector_codec.py
+
+"""
+Бинарные кодеки asyncpg для типов pgvector `vector` и `halfvec`.
+
+Без кодека эмбеддинг приходится передавать строкой "[0.123456,...]" —
+1536 чисел форматируются в Python, а PostgreSQL парсит ~20 КБ текста.
+С кодеком вектор уходит в бинарном формате pgvector
+(int16 dim, int16 unused, dim × float32 big-endian) — 6 КБ без форматирования,
+halfvec — то же с float16, 3 КБ.
+Бинарный формат также нужен для COPY (copy_records_to_table).
+"""
+
+import logging
+import math
+import struct
+import sys
+from array import array
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">HH")
+_SWAP_BYTES = sys.byteorder == "little"
+
+
+def normalize_vector(embedding: Optional[Iterable[float]], dim: int) -> array:
+    """
+    Приводит эмбеддинг к размерности dim и единичной длине, возвращает array('f').
+
+    array('f', ...) конвертирует числа одним проходом на C, обрезка и
+    дополнение нулями — срезом/extend, без поэлементного цикла в Python.
+
+    Единичная длина нужна поиску по скалярному произведению (<#>, schema_21):
+    для нормированных векторов оно даёт то же ранжирование и расстояние, что
+    и косинус. Эмбеддинги OpenAI уже нормированы, но после обрезки
+    (например, 3072 -> 1536) длина меняется.
+    """
+    if embedding is None:
+        return array("f", bytes(4 * dim))
+
+    arr = array("f", embedding)
+    n = len(arr)
+    if n > dim:
+        # Обрезаем лишнее
+        del arr[dim:]
+    elif n < dim:
+        # Дополняем нулями
+        arr.frombytes(bytes(4 * (dim - n)))
+
+    # Нормируем (math.hypot считает норму на C); нулевой вектор оставляем как есть
+    norm = math.hypot(*arr)
+    if norm > 0 and abs(norm - 1.0) > 1e-4:
+        arr = array("f", [x / norm for x in arr])
+    return arr
+
+
+def _encode_vector(value: Iterable[float]) -> bytes:
+    arr = array("f", value)
+    if _SWAP_BYTES:
+        arr.byteswap()
+    return _HEADER.pack(len(arr), 0) + arr.tobytes()
+
+
+def _decode_vector(data: bytes) -> List[float]:
+    dim, _ = _HEADER.unpack_from(data)
+    arr = array("f")
+    arr.frombytes(data[_HEADER.size:_HEADER.size + 4 * dim])
+    if _SWAP_BYTES:
+        arr.byteswap()
+    return arr.tolist()
+
+
+@lru_cache(maxsize=8)
+def _halfvec_struct(dim: int) -> struct.Struct:
+    """Скомпилированный формат dim × float16 big-endian (размерностей в проекте одна-две)."""
+    return struct.Struct(f">{dim}e")
+
+
+def _encode_halfvec(value: Iterable[float]) -> bytes:
+    # array/list/tuple передаются в pack как есть, без копии в tuple
+    values: Sequence[float] = value if isinstance(value, (array, list, tuple)) else tuple(value)
+    return _HEADER.pack(len(values), 0) + _halfvec_struct(len(values)).pack(*values)
+
+
+def _decode_halfvec(data: bytes) -> List[float]:
+    dim, _ = _HEADER.unpack_from(data)
+    return list(_halfvec_struct(dim).unpack_from(data, _HEADER.size))
+
+
+_CODECS = (
+    ("vector", _encode_vector, _decode_vector),
+    ("halfvec", _encode_halfvec, _decode_halfvec),
+)
+
+
+async def register_vector_codec(conn: asyncpg.Connection) -> None:
+    """
+    Регистрирует кодеки vector и halfvec на соединении (вызывается из init пула).
+
+    После регистрации параметр с типом vector/halfvec принимает
+    последовательность float, а такие колонки возвращаются списком float.
+    """
+    for type_name, encoder, decoder in _CODECS:
+        try:
+            await conn.set_type_codec(
+                type_name,
+                schema="public",
+                encoder=encoder,
+                decoder=decoder,
+                format="binary",
+            )
+        except ValueError as e:
+            # Расширение pgvector не установлено (или версия без halfvec)
+            logger.warning(f"[vector_codec] Кодек {type_name} не зарегистрирован: {e}")
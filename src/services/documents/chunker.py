@@ -1,15 +1,18 @@
 # src/services/documents/chunker.py
 
-from typing import List, Dict
+from bisect import bisect_right
+from typing import Dict, Iterator, List, Optional, Sequence
 
 
-def chunk_text(
+def iter_chunks(
     text: str,
     chunk_size: int = 800,
     overlap: int = 200,
-) -> List[Dict[str, any]]:
+) -> Iterator[Dict[str, any]]:
     """
-    Разбивает текст на фрагменты фиксированного размера с перекрытием.
+    Разбивает текст на фрагменты фиксированного размера с перекрытием,
+    отдавая их по одному (генератор): вызывающий код может обрабатывать
+    фрагменты пачками, не держа в памяти весь список.
 
     Параметры:
         text: Исходный текст для разбивки
@@ -17,46 +20,87 @@ def chunk_text(
         overlap: Размер перекрытия между фрагментами в символах (по умолчанию 200)
 
     Возвращает:
-        Список словарей с полями:
+        Словари с полями:
             - chunk_index: Порядковый номер фрагмента (с 0)
             - chunk_text: Текст фрагмента
             - chunk_size: Реальный размер фрагмента
             - start_pos: Позиция начала в исходном тексте
             - end_pos: Позиция конца в исходном тексте
     """
-    if not text or len(text.strip()) == 0:
-        return []
+    # isspace() проверяет строку без создания копии, в отличие от strip()
+    if not text or text.isspace():
+        return
 
-    chunks = []
-    start = 0
     chunk_index = 0
     text_length = len(text)
 
-    while start < text_length:
+    # Сдвиг между началами фрагментов: (chunk_size - overlap).
+    # Если overlap >= chunk_size, то сдвиг будет минимальным (1 символ)
+    step = max(1, chunk_size - overlap)
+
+    # Фрагменты, начинающиеся не дальше last_full_start, целиком помещаются
+    # в текст: конец для них — start + chunk_size, без вызова min() на каждом шаге
+    last_full_start = text_length - chunk_size
+
+    # Начала фрагментов — арифметическая прогрессия, перебираем её range()
+    for start in range(0, text_length, step):
         # Вычисляем конец текущего фрагмента
-        end = min(start + chunk_size, text_length)
+        end = start + chunk_size if start <= last_full_start else text_length
 
         # Извлекаем фрагмент
         chunk_text = text[start:end]
 
-        # Пропускаем пустые фрагменты
-        if chunk_text.strip():
-            chunks.append({
-                "chunk_index": chunk_index,
-                "chunk_text": chunk_text,
-                "chunk_size": len(chunk_text),
-                "start_pos": start,
-                "end_pos": end,
-            })
-            chunk_index += 1
-
-        # Сдвигаемся на (chunk_size - overlap)
-        # Если overlap >= chunk_size, то сдвиг будет минимальным (1 символ)
-        step = max(1, chunk_size - overlap)
-        start += step
-
-        # Защита от бесконечного цикла: если мы в конце текста, выходим
-        if start >= text_length:
-            break
-
-    return chunks
+        # Пропускаем пустые фрагменты (только пробельные символы).
+        # isspace() не копирует строку и останавливается на первом
+        # непробельном символе — для обычного текста это O(1), поэтому
+        # отдельный индекс непробельных позиций не нужен
+        if chunk_text.isspace():
+            continue
+
+        yield {
+            "chunk_index": chunk_index,
+            "chunk_text": chunk_text,
+            "chunk_size": end - start,
+            "start_pos": start,
+            "end_pos": end,
+        }
+        chunk_index += 1
+
+
+def chunk_text(
+    text: str,
+    chunk_size: int = 800,
+    overlap: int = 200,
+) -> List[Dict[str, any]]:
+    """
+    Разбивает текст на фрагменты фиксированного размера с перекрытием.
+
+    То же, что iter_chunks, но возвращает готовый список.
+    """
+    return list(iter_chunks(text, chunk_size=chunk_size, overlap=overlap))
+
+
+def iter_chunks_with_pages(
+    text: str,
+    page_ends: Sequence[int],
+    page_numbers: Sequence[int],
+    chunk_size: int = 800,
+    overlap: int = 200,
+) -> Iterator[Dict[str, any]]:
+    """
+    То же, что iter_chunks, но каждый фрагмент дополнительно содержит
+    page_number — страницу, на которую приходится его начало.
+
+    Параметры:
+        page_ends: Конец каждой страницы в text (по возрастанию)
+        page_numbers: Номера страниц в том же порядке
+
+    Страница ищется бинарным поиском по page_ends; позиция за последней
+    страницей даёт page_number=None.
+    """
+    page_count = len(page_ends)
+    for chunk in iter_chunks(text, chunk_size=chunk_size, overlap=overlap):
+        page_index = bisect_right(page_ends, chunk["start_pos"])
+        page_number: Optional[int] = page_numbers[page_index] if page_index < page_count else None
+        chunk["page_number"] = page_number
+        yield chunk
@@ -13,30 +13,38 @@
 """
 
 import hashlib
+import importlib.util
+import logging
+import mmap
 import os
-from pathlib import Path
+import random
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict, deque
+from itertools import accumulate, islice
 from typing import Optional, Dict, List
 import asyncio
 import time
 
-try:
-    from pypdf import PdfReader
-except ImportError:
-    PdfReader = None
-
 import subprocess
 
+logger = logging.getLogger(__name__)
+
 # Поддерживаемые форматы файлов
 SUPPORTED_EXTENSIONS = {'.pdf', '.txt', '.md', '.docx', '.doc'}
 
-from src.services.documents.chunker import chunk_text
+from src.services.documents.chunker import iter_chunks_with_pages
 from src.services.llm.embeddings_llm import get_text_embedding, get_batch_embeddings_with_usage
 from src.services.db.documents_repo import (
     document_insert,
     document_update_status,
     document_exists_by_hash,
 )
-from src.services.db.document_chunks_repo import chunks_bulk_insert
+from src.services.db.document_chunks_repo import (
+    VECTOR_DIM,
+    chunk_record,
+    chunks_insert_records,
+    chunks_delete_by_document,
+)
 from src.services.llm.core_llm import calculate_embedding_cost
 
 # Максимальный размер файла в байтах (100 МБ)
@@ -48,22 +56,94 @@ MIN_TEXT_LENGTH = 50
 # Размер батча для генерации embeddings
 EMBEDDING_BATCH_SIZE = 20
 
+# Пауза перед повтором запроса embeddings (сек): минимальная и предельная
+EMBEDDING_RETRY_BASE_DELAY = 1.0
+EMBEDDING_RETRY_MAX_DELAY = 20.0
+
+# Извлечение текста PDF: с какого числа страниц делить документ между
+# процессами и сколько процессов в пуле
+PDF_PARALLEL_MIN_PAGES = 16
+PDF_WORKERS = os.cpu_count() or 1
+
+# С какого размера TXT/MD файл читается через mmap (см. _read_text_file)
+TXT_MMAP_MIN_BYTES = 4 * 1024 * 1024
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+
+# Нулевой эмбеддинг для батча, который не удалось получить: один общий
+# неизменяемый кортеж на все тексты вместо отдельного списка на каждый
+_ZERO_EMBEDDING = (0.0,) * VECTOR_DIM
+
+# Сколько запросов embeddings выполняется одновременно. Ограничивает
+# нагрузку на OpenAI API вместо паузы между батчами.
+EMBEDDING_CONCURRENCY = 3
+
+# Для скольких последних уникальных текстов чанков помнится запрошенный
+# embedding: повторы (колонтитулы, оглавление, дублирующиеся абзацы)
+# не отправляются в API повторно. Окно ограничивает память на больших документах.
+EMBEDDING_DEDUP_WINDOW = 256
+
+# Сколько чанков с embeddings накапливается перед записью в БД.
+# Ограничивает память на больших документах; не меньше COPY_MIN_CHUNKS,
+# чтобы chunks_insert_records загружал пачку через COPY.
+CHUNK_INSERT_BATCH_SIZE = 100
+
 
 def compute_file_hash(file_path: str) -> str:
     """
     Вычисляет SHA256-хеш файла.
+
+    hashlib.file_digest читает файл и считает хеш в C (OpenSSL) большими
+    блоками, без цикла чтения/update в Python.
     """
-    sha256 = hashlib.sha256()
     with open(file_path, "rb") as f:
-        while chunk := f.read(8192):
-            sha256.update(chunk)
-    return sha256.hexdigest()
+        return hashlib.file_digest(f, "sha256").hexdigest()
 
 
-def extract_text_from_pdf(file_path: str) -> Dict[str, any]:
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> List[tuple]:
+    """
+    Извлекает текст страниц [start, stop) PDF (выполняется в процессе пула).
+
+    Возвращает [(номер страницы, текст или None при ошибке), ...].
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    result = []
+    for page_index in range(start, stop):
+        page_num = page_index + 1
+        try:
+            result.append((page_num, reader.pages[page_index].extract_text() or ""))
+        except Exception as e:
+            logger.warning("[extract_text_from_pdf] Error extracting page %s: %s", page_num, e)
+            result.append((page_num, None))
+    return result
+
+
+def _count_pdf_pages(file_path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(file_path).pages)
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """Пул процессов для извлечения текста PDF (создаётся при первом использовании)."""
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _pdf_pool
+
+
+async def extract_text_from_pdf(file_path: str) -> Dict[str, any]:
     """
     Извлекает текст из PDF постранично.
 
+    page.extract_text() в pypdf — чистый Python и занимает до сотен мс на
+    страницу, поэтому извлечение не выполняется в event loop: небольшие PDF
+    обрабатываются в потоке, большие (от PDF_PARALLEL_MIN_PAGES страниц)
+    делятся на диапазоны страниц по процессам пула. Каждый процесс открывает
+    PDF один раз на свой диапазон.
+
     Возвращает:
         {
             "full_text": str,  # весь текст
@@ -71,7 +151,9 @@ def extract_text_from_pdf(file_path: str) -> Dict[str, any]:
             "error": Optional[str]
         }
     """
-    if PdfReader is None:
+    # Только проверка наличия pypdf, без импорта: сам pypdf импортируется
+    # в рабочих функциях (_count_pdf_pages / _extract_pdf_pages)
+    if importlib.util.find_spec("pypdf") is None:
         return {
             "full_text": "",
             "pages": [],
@@ -79,30 +161,38 @@ def extract_text_from_pdf(file_path: str) -> Dict[str, any]:
         }
 
     try:
-        reader = PdfReader(file_path)
+        n_pages = await asyncio.to_thread(_count_pdf_pages, file_path)
+
+        if n_pages < PDF_PARALLEL_MIN_PAGES or PDF_WORKERS < 2:
+            extracted = await asyncio.to_thread(_extract_pdf_pages, file_path, 0, n_pages)
+        else:
+            loop = asyncio.get_running_loop()
+            pool = _get_pdf_pool()
+            step = -(-n_pages // PDF_WORKERS)  # ceil: по диапазону на процесс
+            parts = await asyncio.gather(*(
+                loop.run_in_executor(pool, _extract_pdf_pages, file_path, start, min(start + step, n_pages))
+                for start in range(0, n_pages, step)
+            ))
+            extracted = [page for part in parts for page in part]
+
         pages = []
         full_text_parts = []
-
-        for page_num, page in enumerate(reader.pages, start=1):
-            try:
-                page_text = page.extract_text() or ""
-                pages.append({
-                    "page_number": page_num,
-                    "text": page_text,
-                })
+        # Конец каждой страницы в full_text — для определения страницы чанка
+        # по позиции (chunker.iter_chunks_with_pages)
+        page_ends = []
+        offset = 0
+        for page_num, page_text in extracted:
+            pages.append({"page_number": page_num, "text": page_text or ""})
+            # Страницы с ошибкой извлечения в full_text не попадают
+            if page_text is not None:
                 full_text_parts.append(page_text)
-            except Exception as e:
-                print(f"[extract_text_from_pdf] Error extracting page {page_num}: {e}")
-                pages.append({
-                    "page_number": page_num,
-                    "text": "",
-                })
-
-        full_text = "\n".join(full_text_parts)
+                offset += len(page_text) + 1  # вместе с разделителем "\n" после страницы
+            page_ends.append(offset)
 
         return {
-            "full_text": full_text,
+            "full_text": "\n".join(full_text_parts),
             "pages": pages,
+            "page_ends": page_ends,
             "error": None
         }
 
@@ -114,13 +204,35 @@ def extract_text_from_pdf(file_path: str) -> Dict[str, any]:
         }
 
 
+def _read_text_file(file_path: str, encoding: str) -> str:
+    """
+    Читает текстовый файл целиком в строку.
+
+    f.read() в текстовом режиме держит в памяти и байты файла, и строку.
+    Большие файлы (от TXT_MMAP_MIN_BYTES) отображаются в память через mmap
+    и декодируются из него напрямую: байты остаются в page cache,
+    отдельной копии в памяти процесса нет.
+    """
+    if os.path.getsize(file_path) < TXT_MMAP_MIN_BYTES:
+        with open(file_path, "r", encoding=encoding) as f:
+            return f.read()
+
+    with open(file_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = str(mm, encoding)
+
+    # Текстовый режим open() приводит переводы строк к "\n" — делаем так же
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
 def extract_text_from_txt(file_path: str) -> Dict[str, any]:
     """
     Извлекает текст из TXT или MD файла.
     """
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            full_text = f.read()
+        full_text = _read_text_file(file_path, "utf-8")
 
         return {
             "full_text": full_text,
@@ -130,8 +242,7 @@ def extract_text_from_txt(file_path: str) -> Dict[str, any]:
     except UnicodeDecodeError:
         # Попробуем другую кодировку
         try:
-            with open(file_path, "r", encoding="cp1251") as f:
-                full_text = f.read()
+            full_text = _read_text_file(file_path, "cp1251")
             return {
                 "full_text": full_text,
                 "pages": [{"page_number": 1, "text": full_text}],
@@ -194,28 +305,21 @@ def extract_text_from_doc(file_path: str) -> Dict[str, any]:
     - Docker: apt-get install antiword
     """
     try:
-        # Пробуем antiword
+        # Пробуем antiword. Маппинг UTF-8.txt (входит в пакет antiword)
+        # задаёт кодировку вывода явно — иначе она зависит от локали
+        # окружения, и кириллицу пришлось бы угадывать перебором кодировок
         result = subprocess.run(
-            ["antiword", file_path],
+            ["antiword", "-m", "UTF-8.txt", file_path],
             capture_output=True,
             timeout=60
         )
 
         if result.returncode == 0:
-            # Пробуем разные кодировки
-            for encoding in ["utf-8", "cp1251", "latin-1"]:
-                try:
-                    full_text = result.stdout.decode(encoding)
-                    return {
-                        "full_text": full_text,
-                        "pages": [{"page_number": 1, "text": full_text}],
-                        "error": None
-                    }
-                except UnicodeDecodeError:
-                    continue
-
-            # Если ничего не подошло, используем latin-1 с заменой
-            full_text = result.stdout.decode("latin-1", errors="replace")
+            try:
+                full_text = result.stdout.decode("utf-8")
+            except UnicodeDecodeError:
+                # Сборка antiword без UTF-8 вывода — текст в однобайтовой кодировке
+                full_text = result.stdout.decode("cp1251", errors="replace")
             return {
                 "full_text": full_text,
                 "pages": [{"page_number": 1, "text": full_text}],
@@ -249,27 +353,36 @@ def extract_text_from_doc(file_path: str) -> Dict[str, any]:
         }
 
 
-def extract_text_from_file(file_path: str) -> Dict[str, any]:
+# Извлечение текста по расширению файла для форматов, которые разбираются
+# в потоке (PDF обрабатывается отдельно — см. extract_text_from_pdf)
+_THREAD_EXTRACTORS = {
+    ".txt": extract_text_from_txt,
+    ".md": extract_text_from_txt,
+    ".docx": extract_text_from_docx,
+    ".doc": extract_text_from_doc,
+}
+
+
+async def extract_text_from_file(file_path: str) -> Dict[str, any]:
     """
     Извлекает текст из файла в зависимости от его расширения.
     Поддерживаемые форматы: PDF, TXT, MD, DOCX, DOC
+
+    Чтение и разбор файла выполняются вне event loop (поток или пул процессов).
     """
-    ext = Path(file_path).suffix.lower()
+    ext = os.path.splitext(file_path)[1].lower()
 
     if ext == ".pdf":
-        return extract_text_from_pdf(file_path)
-    elif ext in (".txt", ".md"):
-        return extract_text_from_txt(file_path)
-    elif ext == ".docx":
-        return extract_text_from_docx(file_path)
-    elif ext == ".doc":
-        return extract_text_from_doc(file_path)
-    else:
+        return await extract_text_from_pdf(file_path)
+
+    extractor = _THREAD_EXTRACTORS.get(ext)
+    if extractor is None:
         return {
             "full_text": "",
             "pages": [],
             "error": f"Unsupported file format: {ext}. Supported: PDF, TXT, MD, DOCX, DOC"
         }
+    return await asyncio.to_thread(extractor, file_path)
 
 
 async def generate_embeddings_batch_with_tokens(texts: List[str]) -> tuple[List[List[float]], int, str]:
@@ -284,7 +397,7 @@ async def generate_embeddings_batch_with_tokens(texts: List[str]) -> tuple[List[
         return [], 0, settings.openai_embeddings_model
 
     max_retries = 3
-    retry_delay = 1
+    retry_delay = EMBEDDING_RETRY_BASE_DELAY
 
     for attempt in range(max_retries):
         try:
@@ -292,17 +405,22 @@ async def generate_embeddings_batch_with_tokens(texts: List[str]) -> tuple[List[
             return embeddings, tokens, model
         except Exception as e:
             if attempt < max_retries - 1:
-                print(f"[generate_embeddings_batch] Retry {attempt + 1}/{max_retries} after error: {e}")
+                logger.warning("[generate_embeddings_batch] Retry %s/%s after error: %s", attempt + 1, max_retries, e)
+                # Decorrelated jitter: параллельные загрузки документов
+                # не повторяют запросы к API одновременно
+                retry_delay = min(
+                    EMBEDDING_RETRY_MAX_DELAY,
+                    random.uniform(EMBEDDING_RETRY_BASE_DELAY, retry_delay * 3),
+                )
                 await asyncio.sleep(retry_delay)
-                retry_delay *= 2
             else:
-                print(f"[generate_embeddings_batch] Failed after {max_retries} attempts: {e}")
+                logger.error("[generate_embeddings_batch] Failed after %s attempts: %s", max_retries, e)
                 # В случае полной неудачи возвращаем нулевые векторы
                 from src.config import settings
-                return [[0.0] * 1536 for _ in texts], 0, settings.openai_embeddings_model
+                return [_ZERO_EMBEDDING] * len(texts), 0, settings.openai_embeddings_model
 
     from src.config import settings
-    return [[0.0] * 1536 for _ in texts], 0, settings.openai_embeddings_model
+    return [_ZERO_EMBEDDING] * len(texts), 0, settings.openai_embeddings_model
 
 
 async def generate_embeddings_batch(texts: List[str]) -> List[List[float]]:
@@ -318,6 +436,7 @@ async def process_document(
     category: Optional[str] = None,
     subcategory: Optional[str] = None,
     force_update: bool = False,
+    file_hash: Optional[str] = None,
 ) -> Dict[str, any]:
     """
     Обрабатывает документ: извлекает текст, разбивает на чанки,
@@ -330,6 +449,8 @@ async def process_document(
         category: Категория консультации (УСТАРЕЛО, оставлено для совместимости)
         subcategory: Культура растения (например, "малина общая", "клубника летняя")
         force_update: Если True, перезаписывает существующий документ
+        file_hash: SHA256 файла, если уже известен вызывающему (например,
+            посчитан по загруженным байтам) — тогда файл не читается лишний раз
 
     Возвращает:
         {
@@ -361,12 +482,13 @@ async def process_document(
         result["error"] = "File is empty"
         return result
 
-    # 3. Вычисление хеша
-    try:
-        file_hash = compute_file_hash(file_path)
-    except Exception as e:
-        result["error"] = f"Failed to compute hash: {e}"
-        return result
+    # 3. Вычисление хеша (в потоке: hashlib отпускает GIL, event loop не блокируется)
+    if file_hash is None:
+        try:
+            file_hash = await asyncio.to_thread(compute_file_hash, file_path)
+        except Exception as e:
+            result["error"] = f"Failed to compute hash: {e}"
+            return result
 
     # 4. Проверка дубликата
     if not force_update:
@@ -377,9 +499,9 @@ async def process_document(
 
     # 5. Извлечение текста из файла
     filename = os.path.basename(file_path)
-    print(f"[process_document] Processing: {filename}")
+    logger.info("[process_document] Processing: %s", filename)
 
-    extraction_result = extract_text_from_file(file_path)
+    extraction_result = await extract_text_from_file(file_path)
     if extraction_result["error"]:
         result["error"] = f"Text extraction failed: {extraction_result['error']}"
         return result
@@ -392,7 +514,11 @@ async def process_document(
         result["error"] = f"Extracted text too short: {len(full_text)} chars (min {MIN_TEXT_LENGTH})"
         return result
 
-    # 7. Создание записи в documents (статус 'processing')
+    # 7. Создание записи в documents (статус 'processing').
+    # Документ создаётся выключенным: чанки пишутся пачками по ходу обработки
+    # и получают document_active=FALSE (триггер schema_18), поэтому
+    # недообработанный документ не попадает в поиск. Включается он при
+    # переходе в 'completed'.
     try:
         document_id = await document_insert(
             filename=filename,
@@ -402,131 +528,219 @@ async def process_document(
             category=category or "общая_информация",
             subcategory=subcategory,
             processing_status="processing",
+            is_active=False,
         )
-        print(f"[process_document] Created document record ID: {document_id}")
+        logger.info("[process_document] Created document record ID: %s", document_id)
     except Exception as e:
         result["error"] = f"Failed to insert document: {e}"
         return result
 
-    # 8. Разбивка на чанки
-    try:
-        chunks = chunk_text(full_text, chunk_size=800, overlap=200)
-        print(f"[process_document] Created {len(chunks)} chunks")
-    except Exception as e:
-        await document_update_status(
-            document_id,
-            status="failed",
-            error=f"Chunking failed: {e}"
-        )
-        result["error"] = f"Chunking failed: {e}"
-        return result
-
-    if len(chunks) == 0:
-        await document_update_status(
-            document_id,
-            status="failed",
-            error="No chunks generated"
-        )
-        result["error"] = "No chunks generated"
-        return result
-
-    # 9. Определение номера страницы для каждого чанка (упрощенная логика)
-    # Для более точного определения нужна более сложная логика
-    chunk_data_list = []
-    for chunk_info in chunks:
-        # Упрощенно: пытаемся определить страницу по позиции в тексте
-        page_number = None
-        cumulative_length = 0
-        for page in pages:
-            page_text_len = len(page["text"])
-            if chunk_info["start_pos"] >= cumulative_length and chunk_info["start_pos"] < cumulative_length + page_text_len:
-                page_number = page["page_number"]
-                break
-            cumulative_length += page_text_len
-
-        chunk_data_list.append({
-            "chunk_index": chunk_info["chunk_index"],
-            "chunk_text": chunk_info["chunk_text"],
-            "chunk_size": chunk_info["chunk_size"],
-            "page_number": page_number,
-        })
-
     # Убедимся что category не None
     category = category or "общая_информация"
 
-    # 10. Генерация embeddings батчами с подсчётом токенов
-    try:
-        print(f"[process_document] Generating embeddings for {len(chunk_data_list)} chunks...")
-        all_embeddings = []
-        total_tokens = 0
-        embedding_model = None
-
-        for i in range(0, len(chunk_data_list), EMBEDDING_BATCH_SIZE):
-            batch = chunk_data_list[i:i + EMBEDDING_BATCH_SIZE]
-            batch_texts = [c["chunk_text"] for c in batch]
+    # 8-12. Разбивка на чанки, генерация embeddings и вставка в БД — потоком:
+    # чанки берутся из генератора пачками по EMBEDDING_BATCH_SIZE, получают
+    # embeddings и копятся до CHUNK_INSERT_BATCH_SIZE, после чего пишутся
+    # в БД. В памяти не бывает всех чанков документа с embeddings сразу.
+    #
+    # Чанки копятся готовыми записями chunk_record и пишутся бинарным COPY.
+    #
+    # Этапы перекрываются: одновременно выполняются до EMBEDDING_CONCURRENCY
+    # запросов embeddings и вставка предыдущей пачки в БД.
+
+    # Номер страницы чанка определяется по концам страниц в full_text:
+    # PDF возвращает их сам (с учётом разделителей и пропущенных страниц),
+    # для одностраничных форматов это длина текста
+    page_ends = extraction_result.get("page_ends") or list(accumulate(len(page["text"]) for page in pages))
+    page_numbers = [page["page_number"] for page in pages]
+
+    chunk_iter = iter_chunks_with_pages(
+        full_text,
+        page_ends,
+        page_numbers,
+        chunk_size=800,
+        overlap=200,
+    )
+    # (батч чанков, источники embeddings по чанкам, задача embeddings или None) в порядке запуска
+    pending_embeddings = deque()
+    # Текст чанка -> (задача, индекс в её результате) для недавних текстов:
+    # повторяющийся текст не отправляется в API повторно
+    embedding_sources = OrderedDict()
+    duplicate_count = 0
+    insert_task = None            # вставка в работе (не больше одной)
+    insert_task_size = 0
+    chunks_for_db = []
+    chunks_count = 0
+    inserted_count = 0
+    insert_started = False
+    total_tokens = 0
+    embedding_model = None
+    error = None
+
+    logger.info(
+        "[process_document] Generating embeddings in batches of %s, %s in parallel...",
+        EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY,
+    )
+
+    while True:
+        # Держим в работе до EMBEDDING_CONCURRENCY запросов embeddings
+        while len(pending_embeddings) < EMBEDDING_CONCURRENCY:
+            try:
+                batch = list(islice(chunk_iter, EMBEDDING_BATCH_SIZE))
+            except Exception as e:
+                error = f"Chunking failed: {e}"
+                break
+            if not batch:
+                break
 
-            print(f"[process_document] Processing batch {i // EMBEDDING_BATCH_SIZE + 1}/{(len(chunk_data_list) + EMBEDDING_BATCH_SIZE - 1) // EMBEDDING_BATCH_SIZE}")
+            # Источник embedding для каждого чанка: уже запрошенный текст
+            # (задача, индекс) или новый текст этого батча (None, индекс)
+            new_texts = {}
+            sources = []
+            for chunk_info in batch:
+                text = chunk_info["chunk_text"]
+                source = embedding_sources.get(text)
+                if source is not None:
+                    embedding_sources.move_to_end(text)
+                    duplicate_count += 1
+                elif text in new_texts:
+                    source = (None, new_texts[text])
+                    duplicate_count += 1
+                else:
+                    source = (None, len(new_texts))
+                    new_texts[text] = len(new_texts)
+                sources.append(source)
+
+            embedding_task = None
+            if new_texts:
+                embedding_task = asyncio.create_task(generate_embeddings_batch_with_tokens(list(new_texts)))
+                for text, index in new_texts.items():
+                    embedding_sources[text] = (embedding_task, index)
+                while len(embedding_sources) > EMBEDDING_DEDUP_WINDOW:
+                    embedding_sources.popitem(last=False)
+
+            pending_embeddings.append((batch, sources, embedding_task))
+
+        if error is not None or not pending_embeddings:
+            break
+
+        batch, sources, embedding_task = pending_embeddings.popleft()
+        if embedding_task is not None:
+            try:
+                _, batch_tokens, batch_model = await embedding_task
+            except Exception as e:
+                error = f"Embedding generation failed: {e}"
+                break
 
-            batch_embeddings, batch_tokens, batch_model = await generate_embeddings_batch_with_tokens(batch_texts)
-            all_embeddings.extend(batch_embeddings)
             total_tokens += batch_tokens
             embedding_model = batch_model  # Берём модель из последнего batch (все одинаковые)
+            logger.debug("[process_document] Embedded batch of %s chunks (%s tokens)", len(batch), batch_tokens)
+
+        for chunk_info, (source_task, index) in zip(batch, sources):
+            # Задачи более ранних батчей уже завершены: батчи разбираются по порядку запуска
+            embedding = (source_task or embedding_task).result()[0][index]
+            # Сразу кортеж для COPY (порядок колонок — chunk_record), без промежуточного dict
+            chunks_for_db.append(chunk_record(
+                document_id,
+                chunk_info["chunk_index"],
+                chunk_info["chunk_text"],
+                chunk_info["chunk_size"],
+                chunk_info["page_number"],
+                embedding,
+                category,
+                subcategory,
+            ))
+        chunks_count += len(batch)
+
+        if len(chunks_for_db) >= CHUNK_INSERT_BATCH_SIZE:
+            # Дожидаемся предыдущей вставки и запускаем следующую в фоне —
+            # она идёт, пока ждём ответы OpenAI
+            if insert_task is not None:
+                try:
+                    await insert_task
+                except Exception as e:
+                    error = f"Chunk insertion failed: {e}"
+                    insert_task = None
+                    break
+                inserted_count += insert_task_size
+            insert_task = asyncio.create_task(chunks_insert_records(chunks_for_db))
+            insert_task_size = len(chunks_for_db)
+            insert_started = True
+            chunks_for_db = []
+
+    if error is not None:
+        # Останавливаем запросы embeddings, которые уже не нужны
+        pending_tasks = [task for _, _, task in pending_embeddings if task is not None]
+        for task in pending_tasks:
+            task.cancel()
+        await asyncio.gather(*pending_tasks, return_exceptions=True)
+    pending_embeddings.clear()
+    embedding_sources.clear()
+
+    # Последняя фоновая вставка должна завершиться в любом случае
+    # (при ошибке — до удаления частично записанных чанков)
+    if insert_task is not None:
+        try:
+            await insert_task
+            inserted_count += insert_task_size
+        except Exception as e:
+            if error is None:
+                error = f"Chunk insertion failed: {e}"
 
-            # Небольшая задержка между батчами для избежания rate limits
-            if i + EMBEDDING_BATCH_SIZE < len(chunk_data_list):
-                await asyncio.sleep(0.5)
+    # Остаток последней пачки
+    if error is None and chunks_for_db:
+        insert_started = True
+        try:
+            await chunks_insert_records(chunks_for_db)
+            inserted_count += len(chunks_for_db)
+        except Exception as e:
+            error = f"Chunk insertion failed: {e}"
+    chunks_for_db = []
 
-        # Расчёт стоимости по реальной модели из API
-        embedding_cost = calculate_embedding_cost(embedding_model, total_tokens)
-        print(f"[process_document] Generated {len(all_embeddings)} embeddings, {total_tokens} tokens, model: {embedding_model}, cost: ${embedding_cost:.6f}")
+    if error is None and chunks_count == 0:
+        error = "No chunks generated"
 
-    except Exception as e:
+    if error is not None:
+        # Документ загружается целиком или никак: убираем уже записанные чанки
+        if insert_started:
+            try:
+                await chunks_delete_by_document(document_id)
+            except Exception as e:
+                logger.error("[process_document] Failed to delete partial chunks: %s", e)
         await document_update_status(
             document_id,
             status="failed",
-            error=f"Embedding generation failed: {e}"
+            error=error
         )
-        result["error"] = f"Embedding generation failed: {e}"
+        result["error"] = error
         return result
 
-    # 11. Подготовка данных для bulk insert
-    chunks_for_db = []
-    for chunk_data, embedding in zip(chunk_data_list, all_embeddings):
-        chunks_for_db.append({
-            "document_id": document_id,
-            "chunk_index": chunk_data["chunk_index"],
-            "chunk_text": chunk_data["chunk_text"],
-            "chunk_size": chunk_data["chunk_size"],
-            "page_number": chunk_data["page_number"],
-            "embedding": embedding,
-            "category": category,
-            "subcategory": subcategory,
-        })
-
-    # 12. Массовая вставка чанков в БД
-    try:
-        await chunks_bulk_insert(chunks_for_db)
-        print(f"[process_document] Inserted {len(chunks_for_db)} chunks into DB")
-    except Exception as e:
-        await document_update_status(
-            document_id,
-            status="failed",
-            error=f"Chunk insertion failed: {e}"
+    if duplicate_count:
+        logger.info(
+            "[process_document] Reused embeddings for %s of %s chunks (duplicate text)",
+            duplicate_count, chunks_count,
         )
-        result["error"] = f"Chunk insertion failed: {e}"
-        return result
 
-    # 13. Обновление статуса документа на 'completed' с токенами, стоимостью и моделью
+    # Расчёт стоимости по реальной модели из API
+    embedding_cost = calculate_embedding_cost(embedding_model, total_tokens)
+    logger.info(
+        "[process_document] Inserted %s chunks, %s tokens, model: %s, cost: $%.6f",
+        inserted_count, total_tokens, embedding_model, embedding_cost,
+    )
+
+    # 13. Обновление статуса документа на 'completed' с токенами, стоимостью
+    # и моделью; документ (и его чанки) включается в поиск
     try:
         await document_update_status(
             document_id,
             status="completed",
-            total_chunks=len(chunks_for_db),
+            total_chunks=inserted_count,
             embedding_tokens=total_tokens,
             embedding_cost_usd=embedding_cost,
             embedding_model=embedding_model,
+            is_active=True,
         )
-        print(f"[process_document] Document {document_id} processing completed")
+        logger.info("[process_document] Document %s processing completed", document_id)
     except Exception as e:
         result["error"] = f"Failed to update document status: {e}"
         return result
@@ -534,7 +748,7 @@ async def process_document(
     # 14. Успех
     result["success"] = True
     result["document_id"] = document_id
-    result["chunks_count"] = len(chunks_for_db)
+    result["chunks_count"] = inserted_count
 
     return result
 
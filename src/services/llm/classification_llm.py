@@ -17,13 +17,40 @@
       и используется отдельно при формировании category_guess.
 """
 
-from typing import Dict, List, Tuple
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
 import re
+import sys
 
 from src.services.llm.core_llm import create_chat_completion, create_chat_completion_with_usage, calculate_cost
 from src.config import settings                                # Настройки проекта (модель и т.п.)
 from src.services.db.kb_repo import kb_get_distinct_subcategories  # Живой список культур из базы знаний
 
+logger = logging.getLogger(__name__)
+
+
+# Служебные ответы классификатора культур (не конкретная культура)
+_SPECIAL_GENERAL = sys.intern("общая информация")
+_SPECIAL_UNKNOWN = sys.intern("не определено")
+_SPECIALS = frozenset((_SPECIAL_GENERAL, _SPECIAL_UNKNOWN))
+# Служебные ответы в конце списка культур промпта
+_SPECIALS_FOR_PROMPT = (_SPECIAL_GENERAL, _SPECIAL_UNKNOWN)
+
+
+# Шаблоны и таблица замены для _cleanup_llm_answer — компилируются один раз.
+# Переводы строк, markdown (* и _) и кавычки заменяются пробелом одним
+# проходом translate; лишние пробелы потом схлопываются.
+_CLEANUP_TRANSLATION = str.maketrans({ch: " " for ch in "\r\n*_\"'`«»"})
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_SENTENCE_END_RE = re.compile(r"[\.!\?]")
+_NON_LETTER_RE = re.compile(r"[^a-zA-Zа-яА-ЯёЁ\s\-]")
+_WHITESPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+
 
 def _cleanup_llm_answer(raw: str) -> str:
     """
@@ -40,23 +67,13 @@ def _cleanup_llm_answer(raw: str) -> str:
     if not raw:
         return ""
 
-    text = raw.replace("\r", " ").replace("\n", " ")
-    text = re.sub(r"<[^>]+>", " ", text)
-    text = (
-        text.replace("**", " ")
-        .replace("__", " ")
-        .replace('"', " ")
-        .replace("'", " ")
-        .replace("`", " ")
-        .replace("«", " ")
-        .replace("»", " ")
-    )
+    text = raw.translate(_CLEANUP_TRANSLATION)
+    text = _HTML_TAG_RE.sub(" ", text)
 
-    parts = re.split(r"[\.!\?]", text, maxsplit=1)
-    text = parts[0] if parts else text
+    text = _SENTENCE_END_RE.split(text, maxsplit=1)[0]
 
-    text = re.sub(r"[^a-zA-Zа-яА-ЯёЁ\s\-]", " ", text)
-    text = re.sub(r"\s+", " ", text)
+    text = _NON_LETTER_RE.sub(" ", text)
+    text = _WHITESPACE_RE.sub(" ", text)
 
     text = text.strip()
     if len(text) > 200:
@@ -65,6 +82,10 @@ def _cleanup_llm_answer(raw: str) -> str:
     return text.lower()
 
 
+# Результат зависит только от текста; в одном вызове detect_culture_name
+# (быстрый путь и разбор ответа LLM) и в соседних вызовах по тому же вопросу
+# он нужен несколько раз — кэш избавляет от повторного сканирования
+@lru_cache(maxsize=256)
 def _keyword_fallback(raw_text: str) -> str:
     """
     Запасная классификация по ключевым словам в исходном вопросе.
@@ -82,8 +103,33 @@ def _keyword_fallback(raw_text: str) -> str:
     text = raw_text.lower()
     candidates: set[str] = set()
 
+    # Каждое ключевое слово ищется в тексте один раз: признаки культур и
+    # типов (летняя/ремонтантная) считаются заранее и дальше переиспользуются.
+    # "ус" покрывает "усы"/"усов", "куст" — "кустарник".
+    is_strawberry = "клубник" in text or "земляник" in text
+    is_raspberry = "малин" in text
+    is_currant = "смородин" in text
+    is_blueberry = "голубик" in text
+    is_honeysuckle = "жимолост" in text
+    is_gooseberry = "крыжовник" in text
+    # Ежевика (с учетом возможных опечаток)
+    is_blackberry = "ежевик" in text or "ежив" in text or "ежов" in text
+    has_culture_word = (
+        is_strawberry or is_raspberry or is_currant or is_blueberry
+        or is_honeysuckle or is_gooseberry or is_blackberry
+    )
+
+    has_summer = "летн" in text or "традицион" in text or "обычн" in text
+    has_nsd = "нсд" in text or "nsd" in text
+    has_remontant = "ремонтант" in text or has_nsd
+
+    # Особый случай: НСД/ремонтантная/летняя БЕЗ упоминания культуры
+    if not has_culture_word and (has_summer or has_remontant):
+        # Если есть типовые слова, но нет культуры - общая информация
+        return "общая информация"
+
     # Специальные термины для клубники
-    if "фриго" in text or "ус" in text or "усы" in text or "усов" in text or "виктори" in text:
+    if "фриго" in text or "ус" in text or "виктори" in text:
         candidates.add("клубника общая")
 
     # Специальные термины для малины
@@ -111,12 +157,12 @@ def _keyword_fallback(raw_text: str) -> str:
         candidates.add("малина летняя")
 
     # Клубника / земляника
-    if "клубник" in text or "земляник" in text:
+    if is_strawberry:
         # ИЗМЕНЕНО: Проверяем летнюю/обычную ПЕРВОЙ (выше приоритет)
-        if "летн" in text or "традицион" in text or "обычн" in text or "июньск" in text:
+        if has_summer or "июньск" in text:
             candidates.add("клубника летняя")
         # Проверяем ремонтантную ВТОРОЙ
-        elif "ремонтант" in text or ("нсд" in text or "nsd" in text) or "нейтральн" in text:
+        elif has_remontant or "нейтральн" in text:
             # НСД = нейтрального светового дня = ремонтантная
             candidates.add("клубника ремонтантная")
         else:
@@ -124,46 +170,38 @@ def _keyword_fallback(raw_text: str) -> str:
             candidates.add("клубника общая")
 
     # Малина
-    if "малин" in text:
+    if is_raspberry:
         # ИЗМЕНЕНО: Проверяем летнюю/обычную ПЕРВОЙ (выше приоритет)
-        if "летн" in text or "традицион" in text or "обычн" in text:
+        if has_summer:
             candidates.add("малина летняя")
         # Проверяем ремонтантную ВТОРОЙ
-        elif "ремонтант" in text or ("нсд" in text or "nsd" in text):
+        elif has_remontant:
             candidates.add("малина ремонтантная")
         else:
             candidates.add("малина общая")
 
     # Смородина (единая категория)
-    if "смородин" in text:
+    if is_currant:
         candidates.add("смородина")
 
     # Голубика
-    if "голубик" in text:
+    if is_blueberry:
         candidates.add("голубика")
 
     # Жимолость
-    if "жимолост" in text:
+    if is_honeysuckle:
         candidates.add("жимолость")
 
     # Крыжовник
-    if "крыжовник" in text:
+    if is_gooseberry:
         candidates.add("крыжовник")
 
-    # Ежевика (с учетом возможных опечаток)
-    if "ежевик" in text or "ежив" in text or "ежов" in text:
+    if is_blackberry:
         candidates.add("ежевика")
 
-    # Особый случай: НСД/ремонтантная/летняя БЕЗ упоминания культуры
-    has_culture_word = any(word in text for word in ["клубник", "земляник", "малин", "смородин", "голубик", "жимолост", "крыжовник", "ежевик", "ежив", "ежов"])
-    if not has_culture_word:
-        if any(word in text for word in ["ремонтант", "нсд", "nsd", "летн", "обычн", "традицион"]):
-            # Если есть типовые слова, но нет культуры - общая информация
-            return "общая информация"
-
     # Несколько культур → общая информация (общий совет сразу по нескольким)
     if len(candidates) > 1:
-        print(f"[_keyword_fallback] multiple candidates={candidates!r} -> 'общая информация'")
+        logger.debug("[_keyword_fallback] multiple candidates=%r -> 'общая информация'", candidates)
         return "общая информация"
 
     # Одна культура
@@ -173,41 +211,153 @@ def _keyword_fallback(raw_text: str) -> str:
     # Нет конкретных культур, но явно про ягоды/кустарники → общая информация
     # ВАЖНО: проверяем только если НЕ нашли культуру выше
     if len(candidates) == 0:
-        if "ягод" in text or "кустарник" in text or "куст" in text:
+        if "ягод" in text or "куст" in text:
             return "общая информация"
 
     # Вообще не про ягоды
     return "не определено"
 
 
-async def detect_culture_name(text: str) -> Tuple[str, float, int]:
-    """
-    Определяет КУЛЬТУРУ по тексту вопроса с помощью LLM.
+# Частые варианты ответа LLM -> нормальное название культуры.
+# Порядок важен: берётся первый ключ, входящий в ответ подстрокой.
+_CULTURE_MAPPING: Dict[str, str] = {
+    # Клубника ремонтантная (включает НСД - нейтрального дня)
+    "клубника ремонтантная": "клубника ремонтантная",
+    "клубника нсд": "клубника ремонтантная",
+    "клубника nsd": "клубника ремонтантная",
+    "клубника нейтрального дня": "клубника ремонтантная",
+    "клубника нейтрального света": "клубника ремонтантная",
+    "земляника ремонтантная": "клубника ремонтантная",
+    "земляника нсд": "клубника ремонтантная",
+    "земляника нейтрального дня": "клубника ремонтантная",
+    "ремонтантная клубника": "клубника ремонтантная",
+    "ремонтантная земляника": "клубника ремонтантная",
+
+    # Клубника летняя
+    "клубника летняя": "клубника летняя",
+    "клубника обычная": "клубника летняя",
+    "клубника традиционная": "клубника летняя",
+    "клубника июньская": "клубника летняя",
+    "земляника летняя": "клубника летняя",
+    "земляника традиционная": "клубника летняя",
+    "июньская клубника": "клубника летняя",
+
+    # Клубника без уточнения (общая)
+    "клубника садовая": "клубника общая",
+    "земляника садовая": "клубника общая",
+    "земляника": "клубника общая",
+    "клубника": "клубника общая",
+    "виктория": "клубника общая",
+
+    # Малина ремонтантная (приоритет выше)
+    "малина ремонтантная": "малина ремонтантная",
+    "малина нсд": "малина ремонтантная",
+    "малина nsd": "малина ремонтантная",
+    "ремонтантная малина": "малина ремонтантная",
+
+    # Малина летняя
+    "малина летняя": "малина летняя",
+    "малина обычная": "малина летняя",
+    "малина традиционная": "малина летняя",
+    "летняя малина": "малина летняя",
+    "обычная малина": "малина летняя",
+
+    # Малина без уточнения (общая)
+    "малина": "малина общая",
+
+    # Смородина (единая)
+    "смородина": "смородина",
+    "смородина черная": "смородина",
+    "смородина красная": "смородина",
+    "смородина белая": "смородина",
+    "чёрная смородина": "смородина",
+    "красная смородина": "смородина",
+    "белая смородина": "смородина",
+    "черная смородина": "смородина",
+    "черная": "смородина",
+    "красная": "смородина",
+    "белая": "смородина",
 
-    Контракт:
-        - возвращает кортеж (culture, cost_usd, tokens):
-          - culture: КРАТКОЕ название культуры (в нормальном виде),
-            например: "малина", "голубика", "клубника садовая";
-            либо "общая информация" — если вопрос общий для нескольких культур;
-            либо "не определено" — если понять, про что речь, нельзя.
-          - cost_usd: стоимость LLM вызова в USD
-          - tokens: общее количество токенов
+    # Голубика
+    "голубика": "голубика",
 
-    Функция НЕ трогает тип консультации (питание/посадка и т.п.).
+    # Жимолость
+    "жимолость": "жимолость",
+    "жимолость съедобная": "жимолость",
+
+    # Крыжовник
+    "крыжовник": "крыжовник",
+
+    # Ежевика
+    "ежевика": "ежевика",
+
+    # Специальные значения
+    "общая информация": "общая информация",
+    "не определено": "не определено",
+}
+
+
+# Основы названий культур (с частыми опечатками) — по группе на культуру
+_CULTURE_NAME_STEMS = (
+    ("клубник", "земляник"),
+    ("малин",),
+    ("смородин",),
+    ("голубик",),
+    ("жимолост",),
+    ("крыжовник",),
+    ("ежевик", "ежив", "ежов"),
+)
+
+# Вопросы не длиннее этого (в символах) могут классифицироваться без LLM
+KEYWORD_SHORTCUT_MAX_LEN = 200
+
+
+def _keyword_shortcut(raw_text: str) -> Optional[str]:
     """
-    raw_text = text or ""
+    Культура по ключевым словам, если она однозначна и LLM не нужен.
 
-    # Тянем список КУЛЬТУР из базы знаний.
-    # Он используется как ПОДСКАЗКА модели, а не как жёсткий список допустимых значений.
-    db_cultures: List[str] = await kb_get_distinct_subcategories(limit=200)
-    specials = ["общая информация", "не определено"]
+    Срабатывает только для короткого вопроса без "и"/"или", в котором
+    прямо названа ровно одна культура, и _keyword_fallback вернул
+    конкретную культуру. Косвенные признаки (сорта, "усы", "поросль")
+    без названия культуры сюда не проходят — их разбирает LLM.
+    Возвращает None, если вопрос нужно отдать LLM.
+    """
+    if not raw_text or len(raw_text) > KEYWORD_SHORTCUT_MAX_LEN:
+        return None
+
+    text = raw_text.lower()
+    if {"и", "или"} & set(_WORD_RE.findall(text)):
+        return None
+
+    named_cultures = sum(1 for stems in _CULTURE_NAME_STEMS if any(stem in text for stem in stems))
+    if named_cultures != 1:
+        return None
+
+    culture = _keyword_fallback(raw_text)
+    if culture in _SPECIALS:
+        return None
+    return culture
 
+
+# Кэш результатов detect_culture_name: (системный промпт, нормализованный
+# текст вопроса) -> культура; самые давние записи вытесняются
+CULTURE_CACHE_SIZE = 1024
+_CULTURE_CACHE: OrderedDict[Tuple[str, str], str] = OrderedDict()
+
+
+# Системные промпты классификаторов зависят только от списка культур из
+# базы знаний, а он меняется редко (и сам кэшируется в kb_repo): системное
+# сообщение собирается один раз на список, а не на каждый вопрос, и один и
+# тот же dict передаётся в каждый запрос (клиент OpenAI его не изменяет).
+@lru_cache(maxsize=4)
+def _culture_system_message(db_cultures: Tuple[str, ...]) -> Dict[str, str]:
+    """Системное сообщение detect_culture_name для данного списка культур."""
     if db_cultures:
         # Культуры из БД + служебные значения
-        cultures_for_prompt = [*db_cultures, *specials]
+        cultures_for_prompt = [*db_cultures, *_SPECIALS_FOR_PROMPT]
     else:
         # Если БД ещё пустая — даём только служебные варианты
-        cultures_for_prompt = specials
+        cultures_for_prompt = _SPECIALS_FOR_PROMPT
 
     categories_list_str = "\n".join(f"- {name}" for name in cultures_for_prompt)
 
@@ -245,199 +395,337 @@ async def detect_culture_name(text: str) -> Tuple[str, float, int]:
         "     Если культура явно названа, игнорируй общие слова ('кустики', 'ягоды', 'растения')\n"
         "     и возвращай КОНКРЕТНУЮ культуру!\n"
     )
+    return {"role": "system", "content": system_prompt}
 
-    messages = [
-        {
-            "role": "system",
-            "content": system_prompt,
-        },
-        {
-            "role": "user",
-            "content": (
-                "Текст вопроса пользователя по ягодным растениям:\n\n"
-                f"{raw_text}\n\n"
-                "Верни ТОЛЬКО одну строку — краткое название культуры\n"
-                "или фразу: общая информация / не определено."
-            ),
-        },
-    ]
 
-    try:
-        response = await create_chat_completion_with_usage(
-            messages=messages,
-            model=settings.openai_model,
-            temperature=0.0,
+async def detect_culture_name(text: str) -> Tuple[str, float, int]:
+    """
+    Определяет КУЛЬТУРУ по тексту вопроса с помощью LLM.
+
+    Контракт:
+        - возвращает кортеж (culture, cost_usd, tokens):
+          - culture: КРАТКОЕ название культуры (в нормальном виде),
+            например: "малина", "голубика", "клубника садовая";
+            либо "общая информация" — если вопрос общий для нескольких культур;
+            либо "не определено" — если понять, про что речь, нельзя.
+          - cost_usd: стоимость LLM вызова в USD
+          - tokens: общее количество токенов
+
+    Функция НЕ трогает тип консультации (питание/посадка и т.п.).
+    """
+    raw_text = text or ""
+
+    # Культура прямо названа в коротком вопросе — запрос к LLM не нужен
+    shortcut_culture = _keyword_shortcut(raw_text)
+    if shortcut_culture is not None:
+        logger.debug(
+            "[detect_culture_name][SHORTCUT] text=%r "
+            "-> culture=%r",
+            raw_text, shortcut_culture,
         )
+        return shortcut_culture, 0.0, 0
 
-        # Рассчитываем стоимость
-        cost_usd = calculate_cost(
-            model=response["model"],
-            prompt_tokens=response["prompt_tokens"],
-            completion_tokens=response["completion_tokens"],
+    # Тянем список КУЛЬТУР из базы знаний.
+    # Он используется как ПОДСКАЗКА модели, а не как жёсткий список допустимых значений.
+    db_cultures: List[str] = await kb_get_distinct_subcategories(limit=200)
+    system_message = _culture_system_message(tuple(db_cultures))
+
+    # Тот же вопрос при том же промпте (temperature=0) даёт тот же ответ —
+    # повтор отдаём из кэша, без запроса к LLM (стоимость и токены — 0)
+    cache_key = (system_message["content"], " ".join(raw_text.lower().split()))
+    cached_culture = _CULTURE_CACHE.get(cache_key)
+    if cached_culture is not None:
+        _CULTURE_CACHE.move_to_end(cache_key)
+        return cached_culture, 0.0, 0
+
+    culture, cost_usd, tokens = await _classify_culture(raw_text, system_message)
+
+    # Кэшируем только ответы модели (tokens > 0; при ошибке API ответ — из
+    # keyword_fallback) и только определённую культуру
+    if tokens and culture != _SPECIAL_UNKNOWN:
+        _CULTURE_CACHE[cache_key] = culture
+        while len(_CULTURE_CACHE) > CULTURE_CACHE_SIZE:
+            _CULTURE_CACHE.popitem(last=False)
+
+    return culture, cost_usd, tokens
+
+
+# Пакетирование запросов detect_culture_name: вопросы, пришедшие в пределах
+# CULTURE_BATCH_WAIT секунд (но не больше CULTURE_BATCH_MAX_SIZE), уходят
+# в LLM одним запросом со списком вопросов — системный промпт (основная
+# часть токенов) оплачивается один раз на пакет. Одиночный вопрос
+# отправляется обычным запросом.
+CULTURE_BATCH_MAX_SIZE = 16
+CULTURE_BATCH_WAIT = 0.05
+
+# Ожидающие вопросы: (текст, системное сообщение, future ответа)
+_culture_batch: List[Tuple[str, Dict[str, str], asyncio.Future]] = []
+_culture_batch_timer: Optional[asyncio.TimerHandle] = None
+# Ссылки на запущенные пакеты, чтобы задачи не собрал GC до завершения
+_culture_batch_tasks: set = set()
+
+
+def _culture_user_message(raw_text: str) -> Dict[str, str]:
+    return {
+        "role": "user",
+        "content": (
+            "Текст вопроса пользователя по ягодным растениям:\n\n"
+            f"{raw_text}\n\n"
+            "Верни ТОЛЬКО одну строку — краткое название культуры\n"
+            "или фразу: общая информация / не определено."
+        ),
+    }
+
+
+def _culture_batch_user_message(raw_texts: List[str]) -> Dict[str, str]:
+    questions = "\n\n".join(f"{i}) {text}" for i, text in enumerate(raw_texts, start=1))
+    return {
+        "role": "user",
+        "content": (
+            "Ниже пронумерованы тексты вопросов пользователей по ягодным растениям.\n"
+            "Для КАЖДОГО вопроса отдельно определи культуру по тем же правилам.\n\n"
+            f"{questions}\n\n"
+            f"Верни ТОЛЬКО JSON-массив из {len(raw_texts)} строк — по одной на вопрос, "
+            "в том же порядке: краткое название культуры\n"
+            "или фразу: общая информация / не определено.\n"
+            'Пример: ["малина летняя", "не определено"]'
+        ),
+    }
+
+
+def _parse_batch_answers(raw: str, expected: int) -> Optional[List[str]]:
+    """JSON-массив ответов пакета; None, если формат или количество не совпали."""
+    start, end = raw.find("["), raw.rfind("]")
+    if start == -1 or end < start:
+        return None
+    try:
+        answers = json.loads(raw[start:end + 1])
+    except ValueError:
+        return None
+    if (
+        not isinstance(answers, list)
+        or len(answers) != expected
+        or not all(isinstance(answer, str) for answer in answers)
+    ):
+        return None
+    return answers
+
+
+async def _complete_culture(messages: List[Dict[str, str]]) -> Tuple[str, float, int]:
+    """Один запрос к LLM: (текст ответа, стоимость USD, токены)."""
+    response = await create_chat_completion_with_usage(
+        messages=messages,
+        model=settings.openai_model,
+        temperature=0.0,
+    )
+
+    # Рассчитываем стоимость
+    cost_usd = calculate_cost(
+        model=response["model"],
+        prompt_tokens=response["prompt_tokens"],
+        completion_tokens=response["completion_tokens"],
+    )
+    return response.get("content", ""), cost_usd, response["total_tokens"]
+
+
+async def _answer_single(raw_text: str, system_message: Dict[str, str], future: asyncio.Future) -> None:
+    try:
+        result = await _complete_culture([system_message, _culture_user_message(raw_text)])
+    except Exception as e:
+        if not future.done():
+            future.set_exception(e)
+        return
+    if not future.done():
+        future.set_result(result)
+
+
+async def _answer_batch(system_message: Dict[str, str], items: List[Tuple[str, asyncio.Future]]) -> None:
+    """Отвечает на пакет вопросов с общим системным сообщением."""
+    if len(items) == 1:
+        raw_text, future = items[0]
+        await _answer_single(raw_text, system_message, future)
+        return
+
+    raw_texts = [raw_text for raw_text, _ in items]
+    try:
+        raw, cost_usd, tokens = await _complete_culture(
+            [system_message, _culture_batch_user_message(raw_texts)]
         )
-        tokens = response["total_tokens"]
+    except Exception as e:
+        for _, future in items:
+            if not future.done():
+                future.set_exception(e)
+        return
+
+    answers = _parse_batch_answers(raw or "", len(items))
+    if answers is None:
+        # Модель нарушила формат — спрашиваем каждый вопрос отдельно
+        logger.warning("[detect_culture_name][BATCH_FALLBACK] size=%s raw=%r", len(items), raw)
+        await asyncio.gather(*(
+            _answer_single(raw_text, system_message, future) for raw_text, future in items
+        ))
+        return
+
+    # Стоимость и токены пакета делятся между вопросами поровну
+    n = len(items)
+    for i, (answer, (_, future)) in enumerate(zip(answers, items)):
+        item_tokens = tokens // n + (1 if i < tokens % n else 0)
+        if not future.done():
+            future.set_result((answer, cost_usd / n, item_tokens))
+
+
+async def _run_culture_batch(batch: List[Tuple[str, Dict[str, str], asyncio.Future]]) -> None:
+    # Пакет делится по системному сообщению (меняется только со списком культур)
+    groups: Dict[int, Tuple[Dict[str, str], List[Tuple[str, asyncio.Future]]]] = {}
+    for raw_text, system_message, future in batch:
+        groups.setdefault(id(system_message), (system_message, []))[1].append((raw_text, future))
+    await asyncio.gather(*(
+        _answer_batch(system_message, items) for system_message, items in groups.values()
+    ))
+
+
+def _flush_culture_batch() -> None:
+    """Отправляет накопленные вопросы одним пакетом."""
+    global _culture_batch, _culture_batch_timer
+    if _culture_batch_timer is not None:
+        _culture_batch_timer.cancel()
+        _culture_batch_timer = None
+
+    batch, _culture_batch = _culture_batch, []
+    if not batch:
+        return
+    task = asyncio.get_running_loop().create_task(_run_culture_batch(batch))
+    _culture_batch_tasks.add(task)
+    task.add_done_callback(_culture_batch_tasks.discard)
+
+
+def _enqueue_culture_request(raw_text: str, system_message: Dict[str, str]) -> asyncio.Future:
+    """
+    Ставит вопрос detect_culture_name в текущий пакет и возвращает future
+    ответа LLM: (текст ответа, стоимость USD, токены).
+
+    Пакет уходит по заполнении или через CULTURE_BATCH_WAIT секунд
+    после первого вопроса.
+    """
+    global _culture_batch_timer
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    _culture_batch.append((raw_text, system_message, future))
+
+    if len(_culture_batch) >= CULTURE_BATCH_MAX_SIZE:
+        _flush_culture_batch()
+    elif _culture_batch_timer is None:
+        _culture_batch_timer = loop.call_later(CULTURE_BATCH_WAIT, _flush_culture_batch)
+
+    return future
+
+
+async def _classify_culture(raw_text: str, system_message: Dict[str, str]) -> Tuple[str, float, int]:
+    """Запрос к LLM (через общий пакет запросов) и разбор ответа для detect_culture_name."""
+    answer_future = _enqueue_culture_request(raw_text, system_message)
+
+    # Результат по ключевым словам не зависит от ответа LLM: считаем его
+    # один раз, пока запрос ждёт отправки пакета, и используем ниже везде,
+    # где нужен запасной вариант
+    keyword_culture = _keyword_fallback(raw_text)
+
+    try:
+        llm_answer, cost_usd, tokens = await answer_future
 
-        llm_answer = response.get("content", "")
         raw = (llm_answer or "").strip()
         if not raw:
-            print(f"[detect_culture_name][EMPTY] text={raw_text!r} -> raw=''")
-            fallback_culture = _keyword_fallback(raw_text)
-            print(
-                f"[detect_culture_name][EMPTY_FALLBACK] text={raw_text!r} "
-                f"-> keyword_fallback={fallback_culture!r}"
+            logger.debug("[detect_culture_name][EMPTY] text=%r -> raw=''", raw_text)
+            fallback_culture = keyword_culture
+            logger.debug(
+                "[detect_culture_name][EMPTY_FALLBACK] text=%r "
+                "-> keyword_fallback=%r",
+                raw_text, fallback_culture,
             )
             return fallback_culture, cost_usd, tokens
 
         normalized = _cleanup_llm_answer(raw)
 
-        print(
-            f"[detect_culture_name][RAW] text={raw_text!r} "
-            f"-> llm_raw={raw!r} -> normalized={normalized!r}"
+        logger.debug(
+            "[detect_culture_name][RAW] text=%r "
+            "-> llm_raw=%r -> normalized=%r",
+            raw_text, raw, normalized,
         )
 
-        specials_set = {"общая информация", "не определено"}
-
         # 1. Если модель честно вернула "общая информация" или "не определено"
-        if normalized in specials_set:
-            print(
-                f"[detect_culture_name][DECISION_LLM_SPECIAL] culture={normalized!r} "
-                f"for text={raw_text!r}"
+        if normalized in _SPECIALS:
+            logger.debug(
+                "[detect_culture_name][DECISION_LLM_SPECIAL] culture=%r "
+                "for text=%r",
+                normalized, raw_text,
             )
             # Пробуем улучшить через keyword_fallback:
             # если он дал КОНКРЕТНУЮ культуру — используем её.
-            keyword_culture = _keyword_fallback(raw_text)
             # ВАЖНО: если keyword нашел конкретную культуру (не спец-значение), используем её
-            if keyword_culture not in ("не определено", "общая информация"):
-                print(
-                    f"[detect_culture_name][KEYWORD_OVERRIDE] text={raw_text!r} "
-                    f"llm={normalized!r} -> keyword={keyword_culture!r}"
+            if keyword_culture not in _SPECIALS:
+                logger.debug(
+                    "[detect_culture_name][KEYWORD_OVERRIDE] text=%r "
+                    "llm=%r -> keyword=%r",
+                    raw_text, normalized, keyword_culture,
                 )
                 return keyword_culture, cost_usd, tokens
             return normalized, cost_usd, tokens
 
-        # 2. Маппинг частых вариантов к нормальным названиям
-        mapping: Dict[str, str] = {
-            # Клубника ремонтантная (включает НСД - нейтрального дня)
-            "клубника ремонтантная": "клубника ремонтантная",
-            "клубника нсд": "клубника ремонтантная",
-            "клубника nsd": "клубника ремонтантная",
-            "клубника нейтрального дня": "клубника ремонтантная",
-            "клубника нейтрального света": "клубника ремонтантная",
-            "земляника ремонтантная": "клубника ремонтантная",
-            "земляника нсд": "клубника ремонтантная",
-            "земляника нейтрального дня": "клубника ремонтантная",
-            "ремонтантная клубника": "клубника ремонтантная",
-            "ремонтантная земляника": "клубника ремонтантная",
-
-            # Клубника летняя
-            "клубника летняя": "клубника летняя",
-            "клубника обычная": "клубника летняя",
-            "клубника традиционная": "клубника летняя",
-            "клубника июньская": "клубника летняя",
-            "земляника летняя": "клубника летняя",
-            "земляника традиционная": "клубника летняя",
-            "июньская клубника": "клубника летняя",
-
-            # Клубника без уточнения (общая)
-            "клубника садовая": "клубника общая",
-            "земляника садовая": "клубника общая",
-            "земляника": "клубника общая",
-            "клубника": "клубника общая",
-            "виктория": "клубника общая",
-
-            # Малина ремонтантная (приоритет выше)
-            "малина ремонтантная": "малина ремонтантная",
-            "малина нсд": "малина ремонтантная",
-            "малина nsd": "малина ремонтантная",
-            "ремонтантная малина": "малина ремонтантная",
-
-            # Малина летняя
-            "малина летняя": "малина летняя",
-            "малина обычная": "малина летняя",
-            "малина традиционная": "малина летняя",
-            "летняя малина": "малина летняя",
-            "обычная малина": "малина летняя",
-
-            # Малина без уточнения (общая)
-            "малина": "малина общая",
-
-            # Смородина (единая)
-            "смородина": "смородина",
-            "смородина черная": "смородина",
-            "смородина красная": "смородина",
-            "смородина белая": "смородина",
-            "чёрная смородина": "смородина",
-            "красная смородина": "смородина",
-            "белая смородина": "смородина",
-            "черная смородина": "смородина",
-            "черная": "смородина",
-            "красная": "смородина",
-            "белая": "смородина",
-
-            # Голубика
-            "голубика": "голубика",
-
-            # Жимолость
-            "жимолость": "жимолость",
-            "жимолость съедобная": "жимолость",
-
-            # Крыжовник
-            "крыжовник": "крыжовник",
-
-            # Ежевика
-            "ежевика": "ежевика",
-
-            # Специальные значения
-            "общая информация": "общая информация",
-            "не определено": "не определено",
-        }
+        # 2. Маппинг частых вариантов к нормальным названиям.
+        # Точное совпадение — одним поиском в словаре (для ключей оно даёт
+        # то же, что и перебор); иначе первый ключ, входящий подстрокой
+        if normalized in _CULTURE_MAPPING:
+            matched_key = normalized
+        else:
+            matched_key = next((key for key in _CULTURE_MAPPING if key in normalized), None)
 
         culture = normalized
-        for key, value in mapping.items():
-            if key in normalized:
-                culture = value
-                print(
-                    f"[detect_culture_name][MAP] text={raw_text!r} "
-                    f"-> normalized={normalized!r} -> culture={culture!r}"
-                )
-                break
+        if matched_key is not None:
+            culture = _CULTURE_MAPPING[matched_key]
+            logger.debug(
+                "[detect_culture_name][MAP] text=%r "
+                "-> normalized=%r -> culture=%r",
+                raw_text, normalized, culture,
+            )
 
         # 3. Попробуем keyword_fallback — ТОЛЬКО если маппинг не дал конкретной культуры
         # ИЗМЕНЕНО: не переопределяем culture, если она уже специфична
-        if culture in ("общая информация", "не определено"):
-            keyword_culture = _keyword_fallback(raw_text)
-            if keyword_culture not in ("не определено", "общая информация"):
-                print(
-                    f"[detect_culture_name][KEYWORD_HELP] text={raw_text!r} "
-                    f"-> llm_culture={culture!r} -> keyword_culture={keyword_culture!r}"
+        if culture in _SPECIALS:
+            if keyword_culture not in _SPECIALS:
+                logger.debug(
+                    "[detect_culture_name][KEYWORD_HELP] text=%r "
+                    "-> llm_culture=%r -> keyword_culture=%r",
+                    raw_text, culture, keyword_culture,
                 )
                 culture = keyword_culture
 
         # 4. Если получилось 1–4 слова — принимаем как культуру
         words = culture.split()
-        if 0 < len(words) <= 4 and culture not in specials_set:
+        if 0 < len(words) <= 4 and culture not in _SPECIALS:
             final = " ".join(words).strip()
-            print(
-                f"[detect_culture_name][ACCEPTED] text={raw_text!r} "
-                f"-> culture={final!r}"
+            logger.debug(
+                "[detect_culture_name][ACCEPTED] text=%r "
+                "-> culture=%r",
+                raw_text, final,
             )
             return final, cost_usd, tokens
 
         # 5. Если мы сюда дошли, culture либо пустая/странная, либо спец-значение.
         #    В этом случае уже делегируем keyword_fallback окончательно.
-        final_fallback = _keyword_fallback(raw_text)
-        print(
-            f"[detect_culture_name][FINAL_FALLBACK] text={raw_text!r} "
-            f"-> culture={culture!r} -> final={final_fallback!r}"
+        final_fallback = keyword_culture
+        logger.debug(
+            "[detect_culture_name][FINAL_FALLBACK] text=%r "
+            "-> culture=%r -> final=%r",
+            raw_text, culture, final_fallback,
         )
         return final_fallback, cost_usd, tokens
 
     except Exception as e:
-        print(f"[detect_culture_name][ERROR] {e} | text={raw_text!r}")
-        fallback_culture = _keyword_fallback(raw_text)
-        print(
-            f"[detect_culture_name][ERROR_FALLBACK] text={raw_text!r} "
-            f"-> keyword_fallback={fallback_culture!r}"
+        logger.error("[detect_culture_name][ERROR] %s | text=%r", e, raw_text)
+        fallback_culture = keyword_culture
+        logger.warning(
+            "[detect_culture_name][ERROR_FALLBACK] text=%r "
+            "-> keyword_fallback=%r",
+            raw_text, fallback_culture,
         )
         return fallback_culture, 0.0, 0
 
@@ -505,28 +793,9 @@ def _keyword_category_fallback(raw_text: str) -> str:
     return "не определена"
 
 
-async def detect_category_and_culture(text: str) -> tuple[str, str, float, int]:
-    """
-    Определяет КАТЕГОРИЮ консультации И КУЛЬТУРУ из текста вопроса.
-
-    Использует единый вызов LLM для определения обоих параметров,
-    с fallback на keyword-based классификацию.
-
-    Args:
-        text: Текст вопроса пользователя
-
-    Returns:
-        tuple[category, culture, cost_usd, tokens] where:
-        - category: "питание растений", "посадка и уход", "защита растений",
-                   "улучшение почвы", "подбор сорта", "другая тема" или "не определена"
-        - culture: "клубника летняя", "малина общая", "не определено", etc.
-        - cost_usd: стоимость LLM вызова в USD
-        - tokens: общее количество токенов
-    """
-    import json
-
-    raw_text = text or ""
-
+@lru_cache(maxsize=4)
+def _category_culture_system_message(db_cultures: Tuple[str, ...]) -> Dict[str, str]:
+    """Системное сообщение detect_category_and_culture для данного списка культур."""
     # Категории для промпта
     categories = [
         "питание растений",
@@ -537,14 +806,10 @@ async def detect_category_and_culture(text: str) -> tuple[str, str, float, int]:
         "другая тема"
     ]
 
-    # Культуры из БД
-    db_cultures: List[str] = await kb_get_distinct_subcategories(limit=200)
-    specials = ["общая информация", "не определено"]
-
     if db_cultures:
-        cultures_for_prompt = [*db_cultures, *specials]
+        cultures_for_prompt = [*db_cultures, *_SPECIALS_FOR_PROMPT]
     else:
-        cultures_for_prompt = specials
+        cultures_for_prompt = _SPECIALS_FOR_PROMPT
 
     categories_str = "\n".join(f"   - {cat}" for cat in categories)
     cultures_str = "\n".join(f"   - {cult}" for cult in cultures_for_prompt[:30])  # Первые 30 для экономии токенов
@@ -591,12 +856,35 @@ async def detect_category_and_culture(text: str) -> tuple[str, str, float, int]:
         '{"category": "название категории", "culture": "название культуры"}\n\n'
         "БЕЗ комментариев, БЕЗ дополнительного текста!"
     )
+    return {"role": "system", "content": system_prompt}
+
+
+async def detect_category_and_culture(text: str) -> tuple[str, str, float, int]:
+    """
+    Определяет КАТЕГОРИЮ консультации И КУЛЬТУРУ из текста вопроса.
+
+    Использует единый вызов LLM для определения обоих параметров,
+    с fallback на keyword-based классификацию.
+
+    Args:
+        text: Текст вопроса пользователя
+
+    Returns:
+        tuple[category, culture, cost_usd, tokens] where:
+        - category: "питание растений", "посадка и уход", "защита растений",
+                   "улучшение почвы", "подбор сорта", "другая тема" или "не определена"
+        - culture: "клубника летняя", "малина общая", "не определено", etc.
+        - cost_usd: стоимость LLM вызова в USD
+        - tokens: общее количество токенов
+    """
+    raw_text = text or ""
+
+    # Культуры из БД
+    db_cultures: List[str] = await kb_get_distinct_subcategories(limit=200)
+    system_message = _category_culture_system_message(tuple(db_cultures))
 
     messages = [
-        {
-            "role": "system",
-            "content": system_prompt,
-        },
+        system_message,
         {
             "role": "user",
             "content": f"Вопрос: {raw_text}",
@@ -620,12 +908,13 @@ async def detect_category_and_culture(text: str) -> tuple[str, str, float, int]:
 
         raw = (response.get("content", "") or "").strip()
         if not raw:
-            print(f"[detect_category_and_culture][EMPTY] text={raw_text!r}")
+            logger.debug("[detect_category_and_culture][EMPTY] text=%r", raw_text)
             category = _keyword_category_fallback(raw_text)
             culture = _keyword_fallback(raw_text)
-            print(
-                f"[detect_category_and_culture][FALLBACK] "
-                f"category={category!r}, culture={culture!r}"
+            logger.debug(
+                "[detect_category_and_culture][FALLBACK] "
+                "category=%r, culture=%r",
+                category, culture,
             )
             return (category, culture, cost_usd, tokens)
 
@@ -689,42 +978,51 @@ async def detect_category_and_culture(text: str) -> tuple[str, str, float, int]:
             keyword_culture = _keyword_fallback(raw_text)
 
             # Если culture не нашлась в маппинге или неопределена, используем keyword
-            if culture in ("общая информация", "не определено", ""):
-                if keyword_culture not in ("не определено", "общая информация"):
-                    print(f"[detect_category_and_culture][KEYWORD_OVERRIDE_VAGUE] "
-                          f"LLM={culture!r} -> keyword={keyword_culture!r}")
+            if not culture or culture in _SPECIALS:
+                if keyword_culture not in _SPECIALS:
+                    logger.debug(
+                        "[detect_category_and_culture][KEYWORD_OVERRIDE_VAGUE] "
+                        "LLM=%r -> keyword=%r",
+                        culture, keyword_culture,
+                    )
                     culture = keyword_culture
             # Если keyword нашел КОНКРЕТНУЮ культуру, а LLM вернул другую - предпочитаем keyword
-            elif keyword_culture not in ("не определено", "общая информация", culture):
-                print(f"[detect_category_and_culture][KEYWORD_CORRECTION] "
-                      f"LLM={culture!r} -> keyword={keyword_culture!r} (возможно опечатка)")
+            elif keyword_culture not in _SPECIALS and keyword_culture != culture:
+                logger.debug(
+                    "[detect_category_and_culture][KEYWORD_CORRECTION] "
+                    "LLM=%r -> keyword=%r (возможно опечатка)",
+                    culture, keyword_culture,
+                )
                 culture = keyword_culture
 
-            print(
-                f"[detect_category_and_culture][SUCCESS] text={raw_text!r} "
-                f"-> category={category!r}, culture={culture!r}"
+            logger.debug(
+                "[detect_category_and_culture][SUCCESS] text=%r "
+                "-> category=%r, culture=%r",
+                raw_text, category, culture,
             )
 
             return (category, culture, cost_usd, tokens)
 
         except json.JSONDecodeError as je:
-            print(f"[detect_category_and_culture][JSON_ERROR] {je} | raw={raw!r}")
+            logger.warning("[detect_category_and_culture][JSON_ERROR] %s | raw=%r", je, raw)
             # Fallback на keyword detection
             category = _keyword_category_fallback(raw_text)
             culture = _keyword_fallback(raw_text)
-            print(
-                f"[detect_category_and_culture][KEYWORD_FALLBACK] "
-                f"category={category!r}, culture={culture!r}"
+            logger.debug(
+                "[detect_category_and_culture][KEYWORD_FALLBACK] "
+                "category=%r, culture=%r",
+                category, culture,
             )
             return (category, culture, cost_usd, tokens)
 
     except Exception as e:
-        print(f"[detect_category_and_culture][ERROR] {e} | text={raw_text!r}")
+        logger.error("[detect_category_and_culture][ERROR] %s | text=%r", e, raw_text)
         category = _keyword_category_fallback(raw_text)
         culture = _keyword_fallback(raw_text)
-        print(
-            f"[detect_category_and_culture][ERROR_FALLBACK] "
-            f"category={category!r}, culture={culture!r}"
+        logger.warning(
+            "[detect_category_and_culture][ERROR_FALLBACK] "
+            "category=%r, culture=%r",
+            category, culture,
         )
         return (category, culture, 0.0, 0)
 
@@ -828,15 +1126,16 @@ async def compare_topics_for_change(
         else:
             decision = "unclear"
 
-        print(
-            f"[compare_topics_for_change] "
-            f"old=({old_category!r}, {old_culture!r}), "
-            f"new={new_question[:50]!r}... -> {decision!r}"
+        logger.debug(
+            "[compare_topics_for_change] "
+            "old=(%r, %r), "
+            "new=%r... -> %r",
+            old_category, old_culture, new_question[:50], decision,
         )
 
         return decision, cost_usd, tokens
 
     except Exception as e:
-        print(f"[compare_topics_for_change][ERROR] {e}")
+        logger.error("[compare_topics_for_change][ERROR] %s", e)
         # При ошибке возвращаем "unclear" - остаемся на той же теме
         return "unclear", 0.0, 0
@@ -1,10 +1,31 @@
 # src/services/llm/embeddings_llm.py
 
+import base64
+import sys
+from array import array
 from typing import List, Tuple, Dict, Any
 
 from src.services.llm.core_llm import get_client  # Берём клиента OpenAI
 from src.config import settings                   # Настройки (модель эмбеддингов)
 
+_SWAP_BYTES = sys.byteorder == "big"
+
+
+def _decode_base64_embedding(data) -> array:
+    """
+    Эмбеддинг из ответа с encoding_format="base64": float32 little-endian
+    -> array('f') без промежуточного списка Python float.
+
+    Совместимые с OpenAI API серверы могут игнорировать encoding_format
+    и вернуть список чисел — он тоже приводится к array('f').
+    """
+    if not isinstance(data, str):
+        return array("f", data)
+    embedding = array("f", base64.b64decode(data))
+    if _SWAP_BYTES:
+        embedding.byteswap()
+    return embedding
+
 
 async def get_text_embedding(text: str) -> List[float]:
     """
@@ -57,15 +78,20 @@ async def get_text_embedding_with_usage(text: str) -> Tuple[List[float], int, st
     return embedding, tokens, model
 
 
-async def get_batch_embeddings_with_usage(texts: List[str]) -> Tuple[List[List[float]], int, str]:
+async def get_batch_embeddings_with_usage(texts: List[str]) -> Tuple[List[array], int, str]:
     """
     Считает эмбеддинги для списка текстов за один запрос и возвращает общее количество токенов и модель.
 
+    Эмбеддинги запрашиваются в base64 и разбираются сразу в array('f')
+    (4 байта на число). Без явного encoding_format клиент OpenAI сам
+    раскодирует base64 в список Python float — 1536 объектов на эмбеддинг,
+    а при загрузке документа их в памяти сотни.
+
     Параметры:
         texts — список строк.
 
     Возвращает:
-        Tuple[List[List[float]], int, str] — (список эмбеддингов, общее количество токенов, модель).
+        Tuple[List[array], int, str] — (список эмбеддингов array('f'), общее количество токенов, модель).
     """
     if not texts:
         return [], 0, settings.openai_embeddings_model
@@ -75,12 +101,13 @@ async def get_batch_embeddings_with_usage(texts: List[str]) -> Tuple[List[List[f
     response = await client.embeddings.create(
         model=settings.openai_embeddings_model,
         input=texts,
+        encoding_format="base64",
     )
 
     # Сортируем по индексу, т.к. API может вернуть в другом порядке
     embeddings = [None] * len(texts)
     for item in response.data:
-        embeddings[item.index] = item.embedding
+        embeddings[item.index] = _decode_base64_embedding(item.embedding)
 
     tokens = response.usage.total_tokens if response.usage else 0
     model = response.model  # Реальная модель из API
@@ -0,0 +1,103 @@
+"""
+Smoke-тест одобрения кандидата модерации (moderation_approve) на живой БД.
+
+Создаёт тестового пользователя и кандидата в moderation_queue, одобряет его
+и проверяет, что запись knowledge_base создана, а кандидат перешёл в
+'approved'. Повторное одобрение должно вернуть None. В конце тестовые
+записи удаляются.
+"""
+
+import asyncio
+from src.services.db.pool import init_db_pool, close_db_pool, get_pool
+from src.services.db.users_repo import get_or_create_user
+from src.services.db.kb_repo import KB_VECTOR_DIM
+from src.services.db.moderation_repo import (
+    moderation_add,
+    moderation_approve,
+    moderation_get_by_id,
+)
+
+# Telegram ID, который не может принадлежать реальному пользователю
+TEST_TELEGRAM_ID = -777000001
+TEST_QUESTION = "smoke-test moderation_approve: вопрос"
+
+
+async def test_moderation_approve():
+    """Одобрение реальной записи moderation_queue."""
+
+    print("="*60)
+    print("ТЕСТ: moderation_approve на реальной записи")
+    print("="*60)
+
+    pool = get_pool()
+    user_id = await get_or_create_user(TEST_TELEGRAM_ID, "smoke_test", None, None)
+
+    await moderation_add(
+        user_id=user_id,
+        topic_id=None,
+        question=TEST_QUESTION,
+        answer="smoke-test moderation_approve: ответ",
+        category_guess="малина",
+    )
+    async with pool.acquire() as conn:
+        item_id = await conn.fetchval(
+            """
+            SELECT id FROM moderation_queue
+            WHERE user_id = $1 AND question = $2
+            ORDER BY id DESC
+            LIMIT 1;
+            """,
+            user_id,
+            TEST_QUESTION,
+        )
+
+    kb_id = None
+    try:
+        kb_id = await moderation_approve(
+            item_id,
+            category="питание растений",
+            subcategory="малина",
+            question=TEST_QUESTION,
+            answer="smoke-test moderation_approve: ответ",
+            embedding=[0.0] * KB_VECTOR_DIM,
+            admin_id=None,
+        )
+        print(f"Кандидат #{item_id} → knowledge_base #{kb_id}")
+        assert kb_id is not None, "moderation_approve не вернул kb_id"
+
+        row = await moderation_get_by_id(item_id)
+        assert row["status"] == "approved", f"Статус: {row['status']}"
+        assert row["kb_id"] == kb_id, f"kb_id: {row['kb_id']} != {kb_id}"
+
+        # Повторное одобрение уже обработанной записи ничего не добавляет
+        again = await moderation_approve(
+            item_id,
+            category="питание растений",
+            subcategory="малина",
+            question=TEST_QUESTION,
+            answer="smoke-test moderation_approve: ответ",
+            embedding=[0.0] * KB_VECTOR_DIM,
+        )
+        assert again is None, f"Повторное одобрение вернуло {again}"
+
+        print("OK: запись одобрена, повторное одобрение пропущено")
+    finally:
+        async with pool.acquire() as conn:
+            await conn.execute("DELETE FROM moderation_queue WHERE id = $1;", item_id)
+            if kb_id is not None:
+                await conn.execute("DELETE FROM knowledge_base WHERE id = $1;", kb_id)
+    print()
+
+
+async def main():
+    """Главная функция с инициализацией БД."""
+    await init_db_pool()
+
+    try:
+        await test_moderation_approve()
+    finally:
+        await close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
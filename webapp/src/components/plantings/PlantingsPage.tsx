@@ -19,8 +19,7 @@ export function PlantingsPage() {
     plantings,
     region,
     isLoading,
-    fetchPlantings,
-    fetchRegion,
+    fetchGarden,
     setRegion,
   } = usePlantingsStore();
   const { medium, light, success } = useTelegramHaptic();
@@ -28,10 +27,10 @@ export function PlantingsPage() {
   // Загружаем данные при открытии
   useEffect(() => {
     if (isPlantingsPageOpen) {
-      fetchPlantings();
-      fetchRegion();
+      // Регион и посадки — один запрос
+      fetchGarden();
     }
-  }, [isPlantingsPageOpen, fetchPlantings, fetchRegion]);
+  }, [isPlantingsPageOpen, fetchGarden]);
 
   // BackButton закрывает страницу
   useTelegramBackButton(() => {
@@ -190,6 +190,13 @@ class ApiService {
     return this.request<{ region: Region | null }>('/api/user/region');
   }
 
+  /**
+   * Получить регион и посадки пользователя одним запросом
+   */
+  async getGarden(): Promise<{ region: Region | null; plantings: UserPlanting[] }> {
+    return this.request<{ region: Region | null; plantings: UserPlanting[] }>('/api/user/garden');
+  }
+
   /**
    * Обновить регион пользователя
    */
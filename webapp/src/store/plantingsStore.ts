@@ -37,6 +37,7 @@ interface PlantingsStore {
   updatePlanting: (id: string, data: UpdatePlantingData) => Promise<void>;
   deletePlanting: (id: string) => Promise<void>;
   fetchRegion: () => Promise<void>;
+  fetchGarden: () => Promise<void>;
   setRegion: (region: Region) => Promise<void>;
   clearError: () => void;
 
@@ -135,6 +136,21 @@ const createApiStore = (
     }
   },
 
+  fetchGarden: async () => {
+    set(() => ({ isLoading: true, error: null }));
+    try {
+      const { region, plantings } = await api.getGarden();
+      set(() => ({ region, plantings }));
+    } catch (error) {
+      console.error('Failed to fetch garden:', error);
+      set(() => ({
+        error: error instanceof Error ? error.message : 'Failed to fetch plantings',
+      }));
+    } finally {
+      set(() => ({ isLoading: false }));
+    }
+  },
+
   setRegion: async (region) => {
     try {
       await api.updateRegion(region);
@@ -215,6 +231,10 @@ const createLocalStore = (
     // В локальном режиме данные уже в store через persist
   },
 
+  fetchGarden: async () => {
+    // В локальном режиме данные уже в store через persist
+  },
+
   setRegion: async (region) => {
     set(() => ({ region }));
   },